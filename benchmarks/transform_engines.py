@@ -0,0 +1,226 @@
+"""Compares the pandas and arrow transform engines on runtime and memory.
+
+Generates synthetic source tables shaped like the totesys extracts, checks
+that both engines produce identical output, then runs each engine in its own
+process and reports, per transform, the best wall time over several
+repeats, the peak resident memory added while it runs (sampled from
+/proc, so Linux only) and the size of its output.
+
+Usage:
+    PYTHONPATH=. python -m benchmarks.transform_engines --rows 500000
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import threading
+import time
+import gc
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.transform_utils import arrow_engine
+from src.transform_utils.dim_counterparty import util_dim_counterparty
+from src.transform_utils.dim_currency import util_dim_currency
+from src.transform_utils.dim_staff import util_dim_staff
+from src.transform_utils.dim_transaction import util_dim_transaction
+from src.transform_utils.fact_payment import util_fact_payment
+from src.transform_utils.fact_purchase_order import util_fact_purchase_order
+from src.transform_utils.fact_sales_order import util_fact_sales_order
+
+ENGINES = {
+    "pandas": {
+        "dim_staff": (util_dim_staff, ["staff", "department"]),
+        "dim_counterparty": (util_dim_counterparty, ["counterparty", "address"]),
+        "dim_currency": (util_dim_currency, ["currency"]),
+        "dim_transaction": (util_dim_transaction, ["transaction"]),
+        "fact_sales_order": (util_fact_sales_order, ["sales_order"]),
+        "fact_purchase_order": (util_fact_purchase_order, ["purchase_order"]),
+        "fact_payment": (util_fact_payment, ["payment"]),
+    },
+    "arrow": {
+        "dim_staff": (arrow_engine.arrow_dim_staff, ["staff", "department"]),
+        "dim_counterparty": (arrow_engine.arrow_dim_counterparty, ["counterparty", "address"]),
+        "dim_currency": (arrow_engine.arrow_dim_currency, ["currency"]),
+        "dim_transaction": (arrow_engine.arrow_dim_transaction, ["transaction"]),
+        "fact_sales_order": (arrow_engine.arrow_fact_sales_order, ["sales_order"]),
+        "fact_purchase_order": (arrow_engine.arrow_fact_purchase_order, ["purchase_order"]),
+        "fact_payment": (arrow_engine.arrow_fact_payment, ["payment"]),
+    },
+}
+
+
+def source_tables(rows, seed=0):
+    """Builds source tables with the types the schema sidecar gives them."""
+    rng = np.random.default_rng(seed)
+    small = max(rows // 100, 10)
+
+    def ids(n):
+        return pa.array(np.arange(1, n + 1))
+
+    def integers(high, n=rows):
+        return pa.array(rng.integers(1, high, n))
+
+    def timestamps(n=rows):
+        offsets = rng.integers(0, 3 * 365 * 24 * 3600 * 1000, n)
+        return pa.array(np.datetime64('2022-11-03T14:20:52.186') + offsets.astype('timedelta64[ms]')).cast(pa.timestamp('us'))
+
+    def dates(n=rows):
+        days = np.datetime64('2022-11-03') + rng.integers(0, 3 * 365, n).astype('timedelta64[D]')
+        return pa.array(days.astype(str))
+
+    def strings(prefix, n):
+        return pa.array([f"{prefix} {i}" for i in range(n)])
+
+    optional_ids = rng.integers(1, rows, rows).astype(float)
+    optional_ids[rng.random(rows) < 0.5] = np.nan
+    return {
+        "staff": pa.table({
+            "staff_id": ids(small), "first_name": strings("first", small), "last_name": strings("last", small),
+            "email_address": strings("email", small), "department_id": integers(12, small),
+        }),
+        "department": pa.table({
+            "department_id": ids(10), "department_name": strings("department", 10), "location": strings("location", 10),
+        }),
+        "counterparty": pa.table({
+            "counterparty_id": ids(small), "counterparty_legal_name": strings("name", small),
+            "legal_address_id": integers(small, small),
+        }),
+        "address": pa.table({
+            "address_id": ids(small), **{column: strings(column, small) for column in arrow_engine.ADDRESS_COLUMNS[1:]},
+            "created_at": timestamps(small), "last_updated": timestamps(small),
+        }),
+        "currency": pa.table({"currency_id": ids(3), "currency_code": ["GBP", "USD", "EUR"]}),
+        "transaction": pa.table({
+            "transaction_id": ids(rows), "transaction_type": pa.array(np.where(rng.random(rows) < 0.5, "SALE", "PURCHASE")),
+            "sales_order_id": pa.array(optional_ids, from_pandas=True).cast(pa.int64()),
+            "purchase_order_id": pa.array(optional_ids[::-1], from_pandas=True).cast(pa.int64()),
+        }),
+        "sales_order": pa.table({
+            "sales_order_id": ids(rows), "created_at": timestamps(), "last_updated": timestamps(),
+            "staff_id": integers(small), "counterparty_id": integers(small), "units_sold": integers(100000),
+            "unit_price": pa.array(rng.integers(100, 100000, rows) / 1000), "currency_id": integers(4),
+            "design_id": integers(small), "agreed_payment_date": dates(), "agreed_delivery_date": dates(),
+            "agreed_delivery_location_id": integers(small),
+        }),
+        "purchase_order": pa.table({
+            "purchase_order_id": ids(rows), "created_at": timestamps(), "last_updated": timestamps(),
+            "staff_id": integers(small), "counterparty_id": integers(small), "item_code": strings("item", rows),
+            "item_quantity": integers(1000), "item_unit_price": pa.array(rng.random(rows) * 1000),
+            "currency_id": integers(4), "agreed_delivery_date": dates(), "agreed_payment_date": dates(),
+            "agreed_delivery_location_id": integers(small),
+        }),
+        "payment": pa.table({
+            "payment_id": ids(rows), "created_at": timestamps(), "last_updated": timestamps(),
+            "transaction_id": ids(rows), "counterparty_id": integers(small),
+            "payment_amount": pa.array(rng.random(rows) * 100000), "currency_id": integers(4),
+            "payment_type_id": integers(5), "paid": pa.array(rng.random(rows) < 0.5), "payment_date": dates(),
+        }),
+    }
+
+def engine_inputs(engine, tables):
+    if engine == "pandas":
+        return {name: table.to_pandas() for name, table in tables.items()}
+    return tables
+
+def run_engine(engine, inputs):
+    return {
+        output: util(*[inputs[table] for table in sources])
+        for output, (util, sources) in ENGINES[engine].items()
+    }
+
+def check_outputs(tables):
+    """Raises AssertionError if the engines' outputs differ."""
+    pandas_outputs = run_engine("pandas", engine_inputs("pandas", tables))
+    arrow_outputs = run_engine("arrow", engine_inputs("arrow", tables))
+    for output, df in pandas_outputs.items():
+        expected = pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(None)
+        assert arrow_outputs[output].equals(expected), f"{output} differs between engines"
+
+class PeakRss:
+    """Samples this process's resident set size while in use and records the peak."""
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+def current_rss():
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize()
+
+def output_bytes(output):
+    if isinstance(output, pa.Table):
+        return output.nbytes
+    return int(output.memory_usage(deep=True, index=False).sum())
+
+def measure(engine, rows, repeats):
+    """Runs one engine in this process and returns its timings and memory."""
+    inputs = engine_inputs(engine, source_tables(rows))
+    timings, peaks, sizes = {}, {}, {}
+    for _ in range(repeats):
+        for output, (util, sources) in ENGINES[engine].items():
+            gc.collect()
+            pa.default_memory_pool().release_unused()
+            baseline = current_rss()
+            with PeakRss() as rss:
+                start = time.perf_counter()
+                result = util(*[inputs[table] for table in sources])
+                elapsed = time.perf_counter() - start
+            timings[output] = min(timings.get(output, elapsed), elapsed)
+            peaks[output] = max(peaks.get(output, 0), rss.peak - baseline)
+            sizes[output] = output_bytes(result)
+            del result
+    return {"seconds": timings, "peak_mb": {k: v / 2**20 for k, v in peaks.items()},
+            "output_mb": {k: v / 2**20 for k, v in sizes.items()}}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000, help="rows in each fact source table")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--engine", choices=list(ENGINES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.engine:
+        print(json.dumps(measure(args.engine, args.rows, args.repeats)))
+        return
+
+    check_outputs(source_tables(min(args.rows, 20000)))
+    print("outputs identical: yes")
+    results = {}
+    for engine in ENGINES:
+        child = subprocess.run(
+            [sys.executable, "-m", "benchmarks.transform_engines", "--engine", engine,
+             "--rows", str(args.rows), "--repeats", str(args.repeats)],
+            check=True, capture_output=True, text=True,
+        )
+        results[engine] = json.loads(child.stdout)
+
+    for metric, title in (("seconds", f"best of {args.repeats} runs (seconds)"),
+                          ("peak_mb", "peak resident memory added while transforming (MB)"),
+                          ("output_mb", "size of the output (MB)")):
+        table = pd.DataFrame({engine: result[metric] for engine, result in results.items()})
+        table.loc["total"] = table.sum()
+        table["pandas/arrow"] = table["pandas"] / table["arrow"]
+        print(f"\n{title}, {args.rows} fact rows")
+        print(table.round(4).to_string())
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,21 @@
 import boto3
 import os
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, Tuple
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import threading
+import time
 from botocore.client import BaseClient
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+CREDENTIAL_TTL_SECONDS = 900
+
+_credential_cache: Dict[str, Any] = {}
+_credential_cache_lock = threading.Lock()
+
 
 def fetch_credentials(secrets_client: BaseClient, secret_name: str) -> Dict[str, Any]:
     """Fetches database credentials from AWS Secrets Manager
@@ -50,6 +58,48 @@ def fetch_credentials(secrets_client: BaseClient, secret_name: str) -> Dict[str,
         raise e
 
 
+def fetch_credentials_cached(
+    secrets_client: BaseClient, secret_name: str, ttl: float = CREDENTIAL_TTL_SECONDS
+) -> Dict[str, Any]:
+    """Fetches credentials from AWS Secrets Manager, caching them for `ttl` seconds.
+
+    The cache lives at module level, so in a warm lambda container Secrets
+    Manager is only called once per `ttl` rather than on every invocation.
+
+    Args:
+        secrets_client (boto3.client): Pre-initialized boto3 Secrets Manager client.
+        secret_name (str): Name of the Secrets Manager secret.
+        ttl (float): Number of seconds a fetched secret is reused for.
+
+    Returns:
+        Dict[str, Any]: Dictionary of database credentials, as returned by
+                        `fetch_credentials`.
+
+    Raises:
+        Exception: If the secret has to be fetched and fetching fails.
+    """
+    with _credential_cache_lock:
+        cached = _credential_cache.get(secret_name)
+        if cached and time.monotonic() - cached[0] < ttl:
+            return cached[1]
+        credentials = fetch_credentials(secrets_client, secret_name)
+        _credential_cache[secret_name] = (time.monotonic(), credentials)
+        return credentials
+
+
+def clear_credential_cache(secret_name: str = None) -> None:
+    """Forgets cached credentials, e.g. after they were rejected as rotated.
+
+    Args:
+        secret_name (str): Secret to forget. Defaults to forgetting all secrets.
+    """
+    with _credential_cache_lock:
+        if secret_name is None:
+            _credential_cache.clear()
+        else:
+            _credential_cache.pop(secret_name, None)
+
+
 def export_db_creds_to_env(
     credentials: Dict[str, Any], expected_keys: List[str]
 ) -> None:
@@ -97,4 +147,166 @@ def export_db_creds_to_env(
     except Exception as e:
         error_message = f"An unexpected error occurred while exporting credentials to environment variables: {e}"
         logger.error(error_message)
-        raise Exception(error_message)
\ No newline at end of file
+        raise Exception(error_message)
+
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+
+class S3MultipartWriter:
+    """Binary file-like object that streams writes into an S3 object.
+
+    Bytes written are buffered in memory and sent as multipart upload parts
+    once `part_size` bytes have accumulated, so peak memory is bounded by the
+    part size rather than the object size. If fewer than `part_size` bytes are
+    written in total, a single `put_object` call is made on close instead.
+
+    Used as a context manager, the upload is completed on a clean exit and
+    aborted if an exception is raised.
+
+    Args:
+        s3_client (BaseClient): Boto3 S3 client.
+        bucket (str): Name of the destination bucket.
+        key (str): Key of the destination object.
+        part_size (int): Size in bytes of each uploaded part. Must be at least
+                         5 MiB, the S3 minimum for every part except the last.
+
+    Raises:
+        ValueError: If `part_size` is below the S3 minimum part size.
+    """
+
+    def __init__(
+        self, s3_client: BaseClient, bucket: str, key: str, part_size: int = DEFAULT_PART_SIZE
+    ) -> None:
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size must be at least {MIN_PART_SIZE} bytes.")
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.closed = False
+        self._buffer = bytearray()
+        self._position = 0
+        self._upload_id = None
+        self._parts = []
+
+    def __enter__(self) -> "S3MultipartWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def write(self, data: bytes) -> int:
+        """Buffers `data`, uploading full parts as they become available."""
+        if self.closed:
+            raise ValueError("Cannot write to a closed S3MultipartWriter.")
+        self._buffer.extend(data)
+        self._position += len(data)
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[: self.part_size]))
+            del self._buffer[: self.part_size]
+        return len(data)
+
+    def close(self) -> None:
+        """Uploads any remaining bytes and completes the upload."""
+        if self.closed:
+            return
+        try:
+            if self._upload_id is None:
+                self.s3_client.put_object(
+                    Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer)
+                )
+            else:
+                if self._buffer:
+                    self._upload_part(bytes(self._buffer))
+                self.s3_client.complete_multipart_upload(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=self._upload_id,
+                    MultipartUpload={"Parts": self._parts},
+                )
+            logger.info(f"Successfully uploaded s3://{self.bucket}/{self.key}")
+        except Exception as e:
+            logger.error(f"Error completing upload to s3://{self.bucket}/{self.key}: {e}")
+            self.abort()
+            raise e
+        finally:
+            self._buffer = bytearray()
+            self.closed = True
+
+    def abort(self) -> None:
+        """Discards buffered bytes and aborts any in-progress multipart upload."""
+        if self._upload_id is not None:
+            self.s3_client.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id
+            )
+            self._upload_id = None
+        self._buffer = bytearray()
+        self.closed = True
+
+    def _upload_part(self, body: bytes) -> None:
+        if self._upload_id is None:
+            response = self.s3_client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key
+            )
+            self._upload_id = response["UploadId"]
+        part_number = len(self._parts) + 1
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+
+def available_cpus() -> int:
+    """Returns the number of CPUs this process may run on (the Lambda's vCPUs)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def run_concurrently(
+    tasks: Dict[str, Callable[[], Any]], max_workers: int = None
+) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+    """Runs independent tasks on a thread pool and collects their outcomes.
+
+    A task that raises does not stop the others; its exception is returned
+    instead of a result.
+
+    Args:
+        tasks (Dict[str, Callable[[], Any]]): Zero-argument callables by name.
+        max_workers (int): Maximum number of tasks run at once. Defaults to
+                           `available_cpus()`.
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, Exception]]: Results of the tasks that
+            succeeded and exceptions of those that failed, each keyed by task
+            name in the order the tasks were given.
+    """
+    results, errors = {}, {}
+    if not tasks:
+        return results, errors
+    with ThreadPoolExecutor(max_workers=max_workers or available_cpus()) as executor:
+        futures = {name: executor.submit(task) for name, task in tasks.items()}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            errors[name] = e
+    return results, errors
@@ -0,0 +1,181 @@
+from pg8000.native import literal
+from decimal import Decimal
+import json
+import re
+
+DEFAULT_SLOT_NAME = 'totes_ingest'
+DEFAULT_MAX_CHANGES = 100000
+OUTPUT_PLUGIN = 'wal2json'
+
+
+def ensure_replication_slot(conn, slot_name: str = DEFAULT_SLOT_NAME) -> bool:
+    """Creates a logical replication slot using wal2json if it does not exist.
+
+    The source database must run with `wal_level=logical` and have the wal2json
+    output plugin available. Once the slot exists, PostgreSQL keeps every
+    change made after that point until it is consumed with `advance_slot`.
+
+    Args:
+        conn: Database connection object with a `run` method.
+        slot_name: Name of the replication slot.
+
+    Returns:
+        bool: True if the slot was created, False if it already existed.
+
+    Raises:
+        Exception: If the slot cannot be looked up or created.
+    """
+    try:
+        existing = conn.run(f"SELECT 1 FROM pg_replication_slots WHERE slot_name = {literal(slot_name)};")
+        if existing:
+            return False
+        conn.run(f"SELECT * FROM pg_create_logical_replication_slot({literal(slot_name)}, {literal(OUTPUT_PLUGIN)});")
+        return True
+    except Exception as e:
+        raise Exception(f"Error creating replication slot: {e}") from e
+
+def peek_changes(conn, slot_name: str = DEFAULT_SLOT_NAME, tables=None, max_changes: int = DEFAULT_MAX_CHANGES) -> list:
+    """Reads pending change events from a replication slot without consuming them.
+
+    Changes are decoded by wal2json (format version 2), one JSON document per
+    inserted, updated or deleted row plus one for each transaction's begin
+    ('B') and commit ('C'), with column type OIDs included. Reading
+    stops at the first transaction boundary after `max_changes` rows, so
+    every returned batch holds whole transactions. The slot is not moved on
+    until `advance_slot` is called, so changes are not lost if saving them
+    fails.
+
+    Args:
+        conn: Database connection object with a `run` method.
+        slot_name: Name of the replication slot.
+        tables: Optional list of table names in the public schema to read
+            changes for. Defaults to all tables.
+        max_changes: Approximate maximum number of change rows to read.
+
+    Returns:
+        list: `[lsn, change]` pairs in commit order, where `change` is the
+            decoded wal2json document.
+
+    Raises:
+        Exception: If the changes cannot be read.
+    """
+    options = ["'format-version', '2'", "'include-type-oids', '1'"]
+    if tables:
+        options.append(f"'add-tables', {literal(','.join(f'public.{table}' for table in tables))}")
+    try:
+        rows = conn.run(
+            f"SELECT lsn::text, data FROM pg_logical_slot_peek_changes("
+            f"{literal(slot_name)}, NULL, {int(max_changes)}, {', '.join(options)});"
+        )
+    except Exception as e:
+        raise Exception(f"Error reading replication slot: {e}") from e
+    # numerics are parsed as Decimal so they keep every digit
+    return [[lsn, json.loads(data, parse_float=Decimal)] for lsn, data in rows]
+
+def advance_slot(conn, lsn: str, slot_name: str = DEFAULT_SLOT_NAME):
+    """Marks every change up to and including `lsn` as consumed.
+
+    Passing the LSN of a batch's final commit ('C') row ensures none of the
+    batch's transactions are decoded again.
+
+    Args:
+        conn: Database connection object with a `run` method.
+        lsn: Log sequence number of the last change that was saved.
+        slot_name: Name of the replication slot.
+
+    Raises:
+        Exception: If the slot cannot be advanced.
+    """
+    try:
+        conn.run(f"SELECT * FROM pg_replication_slot_advance({literal(slot_name)}, {literal(lsn)}::pg_lsn);")
+    except Exception as e:
+        raise Exception(f"Error advancing replication slot: {e}") from e
+
+def group_changes_by_table(changes) -> tuple:
+    """Batches change events into per-table data in the extraction format.
+
+    Inserts and updates are collected as the new row images, with only the
+    latest image kept for each `<table>_id`, matching what a `last_updated`
+    poll would have returned. Deletes are collected separately as the
+    replica identity (primary key) columns of the deleted rows. Both use the
+    `{'headers', 'body', 'types', 'type_modifiers'}` dictionaries returned by
+    `get_recent_additions`, so they can be written by any of the ingestion
+    output formats.
+
+    Values are matched to headers by column name, as events may list columns
+    in any order. wal2json leaves unchanged TOASTed columns out of an update,
+    so a column missing from an event is taken from an earlier image of the
+    same row in the batch, or from the old row image wal2json sends for
+    tables with REPLICA IDENTITY FULL.
+
+    Args:
+        changes (list): `[lsn, change]` pairs as returned by `peek_changes`.
+
+    Returns:
+        tuple: `(upserts, deletes)`, each a dictionary of table names mapped to
+            data dictionaries. A row deleted after being changed in the same
+            batch appears only in `deletes`.
+
+    Raises:
+        ValueError: If a row is missing a column that no earlier image of it
+            in the batch has, e.g. an unchanged TOASTed column of a table
+            without REPLICA IDENTITY FULL.
+    """
+    upserts, deletes = {}, {}
+    for _, change in changes:
+        action, table = change.get("action"), change.get("table")
+        if action in ("I", "U"):
+            data = upserts.setdefault(table, _empty_table())
+            values = _add_row_columns(data, change["columns"])
+            old_values = {column["name"]: column.get("value") for column in change.get("identity", [])}
+            key = _row_key(table, values)
+            data["rows"][key] = {**old_values, **data["rows"].get(key, {}), **values}
+        elif action == "D":
+            data = deletes.setdefault(table, _empty_table())
+            values = _add_row_columns(data, change["identity"])
+            key = _row_key(table, values)
+            upserts.get(table, {"rows": {}})["rows"].pop(key, None)
+            data["rows"][key] = values
+    return _finalise(upserts), _finalise(deletes)
+
+def _empty_table() -> dict:
+    return {"headers": [], "types": [], "type_modifiers": [], "rows": {}}
+
+def _add_row_columns(data, columns) -> dict:
+    for column in columns:
+        if column["name"] not in data["headers"]:
+            data["headers"].append(column["name"])
+            data["types"].append(column.get("typeoid"))
+            data["type_modifiers"].append(_type_modifier(column.get("type", "")))
+    return {column["name"]: column.get("value") for column in columns}
+
+def _type_modifier(type_name):
+    # wal2json names a numeric column's type with its precision and scale,
+    # e.g. 'numeric(10,2)'; encode them as PostgreSQL does for pg8000.
+    match = re.fullmatch(r"numeric\((\d+)(?:,(\d+))?\)", type_name)
+    if not match:
+        return None
+    precision, scale = int(match.group(1)), int(match.group(2) or 0)
+    return ((precision << 16) | scale) + 4
+
+def _row_key(table, values):
+    key_column = f"{table}_id"
+    if key_column in values:
+        return values[key_column]
+    return json.dumps(values, sort_keys=True, default=str)
+
+def _finalise(tables) -> dict:
+    finalised = {}
+    for table, data in tables.items():
+        if not data["rows"]:
+            continue
+        for values in data["rows"].values():
+            missing = [name for name in data["headers"] if name not in values]
+            if missing:
+                raise ValueError(
+                    f"Change to {table} is missing columns {', '.join(missing)}; "
+                    f"set REPLICA IDENTITY FULL on {table} so unchanged TOASTed values are sent with the old row image"
+                )
+        body = [[values[name] for name in data["headers"]] for values in data["rows"].values()]
+        finalised[table] = {"headers": data["headers"], "body": body, "types": data["types"], "type_modifiers": data["type_modifiers"]}
+    return finalised
@@ -1,8 +1,14 @@
 from pg8000.native import Connection, identifier, literal
 import os
 from botocore.exceptions import ClientError
+from contextlib import contextmanager
+import logging
+import queue
+import threading
 import time
 
+DEFAULT_BATCH_SIZE = 10000
+
 
 def create_connection() -> Connection:
     """Creates a database connection using environment variables
@@ -41,7 +47,119 @@ def close_db_connection(conn):
     """
     conn.close()
 
-def get_recent_additions(conn, tablename: str, updatedate: str, time_now: str) -> dict:
+class ConnectionPool:
+    """A small, bounded pool of database connections.
+
+    Connections are opened lazily with `connection_factory` the first time
+    they are needed, up to `max_size` at once, and reused afterwards. A
+    connection is only ever handed to one caller at a time, so each worker
+    thread gets its own connection. If the caller raises while holding a
+    connection it is closed and discarded rather than returned to the pool.
+
+    Args:
+        max_size (int): Maximum number of connections open at once. This caps
+            how many concurrent queries are sent to the database.
+        connection_factory (callable): Zero-argument callable returning a new
+            connection. Defaults to `create_connection`.
+        check_liveness (bool): When True, idle connections are checked with
+            `is_connection_alive` before being handed out and replaced if they
+            have dropped. Use this when the pool outlives a single run, e.g.
+            across warm lambda invocations. Defaults to False.
+
+    Raises:
+        ValueError: If `max_size` is not a positive integer.
+    """
+
+    def __init__(self, max_size: int = 4, connection_factory=create_connection, check_liveness: bool = False):
+        if not isinstance(max_size, int) or max_size <= 0:
+            raise ValueError("max_size must be a positive integer")
+        self.max_size = max_size
+        self.connection_factory = connection_factory
+        self.check_liveness = check_liveness
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    @contextmanager
+    def acquire(self):
+        """Borrows a connection from the pool, blocking until one is free.
+
+        Yields:
+            Connection: A connection for the exclusive use of the caller.
+        """
+        self._slots.acquire()
+        conn = None
+        try:
+            conn = self._take_idle()
+            if conn is None:
+                conn = self.connection_factory()
+            yield conn
+        except BaseException:
+            if conn is not None:
+                self._discard(conn)
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._idle.put(conn)
+            self._slots.release()
+
+    def close_all(self):
+        """Closes every idle connection held by the pool."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def _take_idle(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return None
+            if not self.check_liveness or is_connection_alive(conn):
+                return conn
+            self._discard(conn)
+
+    def _discard(self, conn):
+        try:
+            close_db_connection(conn)
+        except Exception:
+            pass
+
+def is_connection_alive(conn) -> bool:
+    """Checks whether a connection can still run queries.
+
+    Args:
+        conn: Database connection object with a `run` method.
+
+    Returns:
+        bool: True if a trivial query succeeds, False otherwise.
+    """
+    try:
+        conn.run("SELECT 1;")
+        return True
+    except Exception:
+        return False
+
+def select_list(columns=None, required=()) -> str:
+    """Builds the column list of a SELECT statement.
+
+    Args:
+        columns: Column names to select, or None for all columns.
+        required: Column names added to `columns` if missing, e.g. keys the
+            caller needs to read back.
+
+    Returns:
+        str: '*', or the quoted column names separated by commas.
+    """
+    if not columns:
+        return '*'
+    names = list(columns) + [name for name in required if name not in columns]
+    return ', '.join(identifier(name) for name in names)
+
+def get_recent_additions(conn, tablename: str, updatedate: str, time_now: str, columns=None) -> dict:
     """Retrieves recent data from a table within a time range.
 
     Executes a SQL query to fetch data from `tablename` where `last_updated`
@@ -52,21 +170,165 @@ def get_recent_additions(conn, tablename: str, updatedate: str, time_now: str) -
         tablename: Table name to query. **Caution: Vulnerable to SQL injection. Sanitize input.**
         updatedate: Start timestamp (inclusive). Database compatible format.
         time_now: End timestamp (inclusive). Database compatible format.
+        columns: Optional list of column names to select. Defaults to all
+            columns.
 
     Returns:
-        dict: Dictionary with 'headers' (list of column names) and 'body' (query data).
+        dict: Dictionary with 'headers' (list of column names), 'body' (query data),
+            'types' (list of PostgreSQL type OIDs, one per column) and
+            'type_modifiers' (their type modifiers, e.g. a numeric's precision
+            and scale).
 
     Raises:
         Exception: If database query or column retrieval fails.
     """
     try:
-        data = conn.run(f'SELECT * FROM {identifier(tablename)} WHERE last_updated BETWEEN \'{updatedate}\' AND \'{time_now}\';')
+        data = conn.run(f'SELECT {select_list(columns)} FROM {identifier(tablename)} WHERE last_updated BETWEEN \'{updatedate}\' AND \'{time_now}\';')
         columns_info = conn.columns
         headers = [col["name"] for col in columns_info]
-        return {'headers':headers, 'body':data}
+        types = [col.get("type_oid") for col in columns_info]
+        type_modifiers = [col.get("type_modifier") for col in columns_info]
+        return {'headers':headers, 'body':data, 'types':types, 'type_modifiers':type_modifiers}
     except Exception as e:
         raise Exception(f"Error fetching recent additions: {e}") from e
-    
+
+def get_recent_additions_batched(conn, tablename: str, updatedate: str, time_now: str, batch_size: int = DEFAULT_BATCH_SIZE, columns=None):
+    """Streams recent data from a table in fixed-size batches.
+
+    Declares a named server-side cursor over the same query as
+    `get_recent_additions` and fetches `batch_size` rows at a time, so only
+    one batch is held in memory at once. The cursor lives inside its own
+    transaction, which is committed once the cursor is exhausted and rolled
+    back if fetching fails or the generator is closed early. Callers should
+    close the generator themselves when they stop early, before the
+    connection is returned or reused, rather than leave it to garbage
+    collection. A failed rollback is logged, not raised, so it cannot hide
+    the error that caused it.
+
+    Args:
+        conn: Database connection object with `run` and `columns` methods.
+        tablename: Table name to query.
+        updatedate: Start timestamp (inclusive). Database compatible format.
+        time_now: End timestamp (inclusive). Database compatible format.
+        batch_size: Number of rows fetched from the cursor per batch.
+        columns: Optional list of column names to select. Defaults to all
+            columns.
+
+    Yields:
+        dict: Dictionary with 'headers' (list of column names), 'body' (list
+            of at most `batch_size` rows), 'types' and 'type_modifiers' as
+            returned by `get_recent_additions`. Empty batches are not yielded.
+
+    Raises:
+        ValueError: If `batch_size` is not a positive integer.
+        Exception: If declaring the cursor or fetching a batch fails.
+    """
+    if not isinstance(batch_size, int) or batch_size <= 0:
+        raise ValueError("batch_size must be a positive integer")
+
+    cursor_name = identifier(f"{tablename}_cursor")
+    completed = False
+    try:
+        conn.run("BEGIN;")
+        conn.run(f'DECLARE {cursor_name} NO SCROLL CURSOR FOR SELECT {select_list(columns)} FROM {identifier(tablename)} WHERE last_updated BETWEEN {literal(updatedate)} AND {literal(time_now)};')
+        while True:
+            rows = conn.run(f'FETCH FORWARD {batch_size} FROM {cursor_name};')
+            if not rows:
+                break
+            headers = [col["name"] for col in conn.columns]
+            types = [col.get("type_oid") for col in conn.columns]
+            type_modifiers = [col.get("type_modifier") for col in conn.columns]
+            yield {'headers': headers, 'body': rows, 'types': types, 'type_modifiers': type_modifiers}
+        completed = True
+    except Exception as e:
+        raise Exception(f"Error fetching recent additions: {e}") from e
+    finally:
+        if completed:
+            conn.run("COMMIT;")
+        else:
+            try:
+                conn.run("ROLLBACK;")
+            except Exception as e:
+                logging.warning(f"Could not roll back cursor over {tablename}: {e}")
+
+def get_recent_additions_keyset(conn, tablename: str, primary_key: str, updatedate: str, time_now: str, chunk_size: int = DEFAULT_BATCH_SIZE, after=None, columns=None):
+    """Streams recent data from a table in chunks using keyset pagination.
+
+    Rows with `last_updated` between `updatedate` and `time_now` are read in
+    `(last_updated, primary_key)` order, `chunk_size` rows per query. Each
+    query starts just after the last key of the previous chunk, so every chunk
+    is a short, independent query and extraction can be resumed from any
+    chunk boundary by passing that chunk's `last_key` as `after`.
+
+    Args:
+        conn: Database connection object with `run` and `columns` methods.
+        tablename: Table name to query.
+        primary_key: Name of the table's unique key column, used to break ties
+            between rows with the same `last_updated`.
+        updatedate: Start timestamp (inclusive). Database compatible format.
+        time_now: End timestamp (inclusive). Database compatible format.
+        chunk_size: Maximum number of rows per chunk.
+        after: Optional `[last_updated, primary_key]` pair; only rows after this
+            key are returned.
+        columns: Optional list of column names to select. `last_updated` and
+            `primary_key` are always included. Defaults to all columns.
+
+    Yields:
+        dict: Dictionary with 'headers', 'body', 'types' and 'type_modifiers'
+            as returned by `get_recent_additions`, plus 'last_key', the
+            `[last_updated, primary_key]` pair of the chunk's final row.
+
+    Raises:
+        ValueError: If `chunk_size` is not a positive integer.
+        Exception: If a query fails.
+    """
+    if not isinstance(chunk_size, int) or chunk_size <= 0:
+        raise ValueError("chunk_size must be a positive integer")
+
+    table = identifier(tablename)
+    key_column = identifier(primary_key)
+    order_by = f'ORDER BY last_updated, {key_column} LIMIT {chunk_size}'
+    while True:
+        if after is None:
+            condition = f'last_updated BETWEEN {literal(updatedate)} AND {literal(time_now)}'
+        else:
+            condition = f'last_updated <= {literal(time_now)} AND (last_updated, {key_column}) > ({literal(after[0])}, {literal(after[1])})'
+        try:
+            rows = conn.run(f'SELECT {select_list(columns, required=("last_updated", primary_key))} FROM {table} WHERE {condition} {order_by};')
+            headers = [col["name"] for col in conn.columns]
+            types = [col.get("type_oid") for col in conn.columns]
+            type_modifiers = [col.get("type_modifier") for col in conn.columns]
+        except Exception as e:
+            raise Exception(f"Error fetching recent additions: {e}") from e
+        if not rows:
+            return
+        last_row = rows[-1]
+        after = [last_row[headers.index('last_updated')], last_row[headers.index(primary_key)]]
+        yield {'headers': headers, 'body': rows, 'types': types, 'type_modifiers': type_modifiers, 'last_key': after}
+        if len(rows) < chunk_size:
+            return
+
+def has_recent_additions(conn, tablename: str, updatedate: str, time_now: str) -> bool:
+    """Checks whether any rows in a table were updated within a time range.
+
+    Args:
+        conn: Database connection object with a `run` method.
+        tablename: Table name to query.
+        updatedate: Start timestamp (inclusive). Database compatible format.
+        time_now: End timestamp (inclusive). Database compatible format.
+
+    Returns:
+        bool: True if at least one row has `last_updated` in the range.
+
+    Raises:
+        Exception: If the database query fails.
+    """
+    try:
+        rows = conn.run(f'SELECT EXISTS (SELECT 1 FROM {identifier(tablename)} WHERE last_updated BETWEEN {literal(updatedate)} AND {literal(time_now)});')
+        return bool(rows[0][0])
+    except Exception as e:
+        raise Exception(f"Error checking recent additions: {e}") from e
+
 def get_last_upload_date(secretsclient):
     """Retrieves the date of the last ingestion which is stored inside a secret.
 
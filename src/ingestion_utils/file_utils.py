@@ -1,38 +1,385 @@
 import csv
+import gzip
+import io
+from collections.abc import Iterator
+from decimal import Decimal
+
+# Logical column types for the PostgreSQL type OIDs found in the source
+# database. Columns of any other type are written as strings.
+PG_TYPE_NAMES = {
+    16: 'bool',
+    20: 'int64',
+    21: 'int64',
+    23: 'int64',
+    700: 'float64',
+    701: 'float64',
+    1700: 'float64',
+    25: 'string',
+    1042: 'string',
+    1043: 'string',
+    1082: 'date',
+    1083: 'time',
+    1114: 'timestamp',
+    1184: 'timestamptz',
+}
+NUMERIC_OID = 1700
 
 def data_to_csv(data, table_name):
     """Writes data dictionary to a CSV file.
 
     Extracts 'headers' and 'body' from the input data dictionary and writes
-    them to a CSV file named '{table_name}.csv'.
+    them to a CSV file named '{table_name}.csv'. `data` may also be an iterator
+    of such dictionaries (e.g. from `get_recent_additions_batched`), in which
+    case each batch is written as it arrives and the headers are taken from
+    the first batch.
 
     Args:
-        data (dict): A dictionary containing 'headers' (list of column names)
-                     and 'body' (list of lists representing rows of data).
+        data (dict or Iterator[dict]): A dictionary containing 'headers' (list of
+                     column names) and 'body' (list of lists representing rows of
+                     data), or an iterator of such dictionaries.
         table_name (str): The name to use for the CSV file (without extension).
 
+    Returns:
+        int: The number of data rows written (excluding the header row).
+
     Raises:
         TypeError: If `data` is not a dictionary or if 'headers' or 'body' keys are missing.
         ValueError: If 'headers' or 'body' are not lists.
         IOError: If there is an error writing to the CSV file.
     """
+    return data_to_file(data, table_name, 'csv')
+
+def data_to_file(data, table_name, output_format='csv'):
+    """Writes data to a local file in the given output format.
+
+    The file is written to '/tmp/{table_name}{extension}', where the extension
+    is taken from `OUTPUT_FORMATS`.
+
+    Args:
+        data (dict or Iterator[dict]): See `data_to_csv`.
+        table_name (str): The name to use for the file (without extension).
+        output_format (str): One of the keys of `OUTPUT_FORMATS`. Defaults to 'csv'.
+
+    Returns:
+        int: The number of data rows written.
+
+    Raises:
+        TypeError: If `data` is not a dictionary or an iterator.
+        ValueError: If `data` is malformed or `output_format` is not supported.
+        IOError: If there is an error writing to the file.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    if not isinstance(data, Iterator):
+        validate_data(data)
+    extension, write = OUTPUT_FORMATS[output_format]
+    try:
+        with open(f'/tmp/{table_name}{extension}', 'wb') as local_file:
+            return write(data, local_file)
+    except IOError as e:
+        raise IOError(f"Error writing to {output_format.upper()} file: {e}") from e
+
+def write_csv(data, fileobj):
+    """Encodes data as UTF-8 CSV into a binary file-like object.
+
+    Each batch is encoded in memory and written to `fileobj` in one call, so
+    the destination can be a local file or a streaming upload such as
+    `helpers.S3MultipartWriter`, and only one batch is held at a time.
+
+    Args:
+        data (dict or Iterator[dict]): A dictionary containing 'headers' and
+                     'body', or an iterator of such dictionaries.
+        fileobj: Binary file-like object with a `write` method.
+
+    Returns:
+        int: The number of data rows written (excluding the header row).
+
+    Raises:
+        TypeError: If `data` is not a dictionary or an iterator.
+        ValueError: If 'headers' or 'body' are missing or are not lists.
+    """
+    rows_written = 0
+    headers_written = False
+    text_buffer = io.StringIO()
+    writer = csv.writer(text_buffer)
+    for batch in iter_batches(data):
+        if not headers_written:
+            writer.writerow(batch['headers'])
+            headers_written = True
+        writer.writerows(batch['body'])
+        rows_written += len(batch['body'])
+        fileobj.write(text_buffer.getvalue().encode('utf-8'))
+        text_buffer.seek(0)
+        text_buffer.truncate()
+    return rows_written
+
+def write_csv_gzip(data, fileobj):
+    """Encodes data as gzip-compressed CSV into a binary file-like object.
+
+    Compression happens as each batch is written, so the compressed stream can
+    be fed straight into a streaming upload.
+
+    Args:
+        data (dict or Iterator[dict]): See `write_csv`.
+        fileobj: Binary file-like object with a `write` method. It is left open.
+
+    Returns:
+        int: The number of data rows written (excluding the header row).
+    """
+    with gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=6, mtime=0) as compressed:
+        return write_csv(data, compressed)
+
+def write_csv_zstd(data, fileobj):
+    """Encodes data as zstd-compressed CSV into a binary file-like object.
+
+    Args:
+        data (dict or Iterator[dict]): See `write_csv`.
+        fileobj: Binary file-like object with a `write` method. It is left open.
+
+    Returns:
+        int: The number of data rows written (excluding the header row).
+    """
+    import pyarrow as pa
+
+    sink = pa.PythonFile(_KeepOpen(fileobj), mode='w')
+    with pa.CompressedOutputStream(sink, 'zstd') as compressed:
+        return write_csv(data, compressed)
+
+class _KeepOpen:
+    """Passes writes through to `fileobj` but ignores `close`, so a wrapping
+    stream can be closed to flush its trailer without closing `fileobj`."""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self.closed = False
+
+    def write(self, data):
+        return self._fileobj.write(data)
+
+    def tell(self):
+        return self._fileobj.tell()
+
+    def flush(self):
+        self._fileobj.flush()
+
+    def close(self):
+        self.closed = True
+
+def write_parquet(data, fileobj):
+    """Writes data as a zstd-compressed Parquet file, one row group per batch.
+
+    Column types come from the 'types' (PostgreSQL type OIDs) and
+    'type_modifiers' of the first batch (see `arrow_schema`), so timestamps,
+    dates and numerics keep their types instead of
+    being flattened to text. Nothing is written if there are no rows.
+
+    Args:
+        data (dict or Iterator[dict]): See `write_csv`.
+        fileobj: Binary file-like object with `write` and `tell` methods.
+
+    Returns:
+        int: The number of data rows written.
+    """
+    import pyarrow.parquet as pq
+
+    return _write_arrow_batches(
+        data, lambda schema: pq.ParquetWriter(fileobj, schema, compression='zstd')
+    )
+
+def write_arrow(data, fileobj):
+    """Writes data as a zstd-compressed Arrow IPC file, one record batch per batch.
+
+    Args:
+        data (dict or Iterator[dict]): See `write_csv`.
+        fileobj: Binary file-like object with `write` and `tell` methods.
+
+    Returns:
+        int: The number of data rows written.
+    """
+    import pyarrow as pa
+
+    options = pa.ipc.IpcWriteOptions(compression='zstd')
+    return _write_arrow_batches(
+        data, lambda schema: pa.ipc.new_file(fileobj, schema, options=options)
+    )
+
+def arrow_schema(headers, types, type_modifiers=None):
+    """Builds a pyarrow schema from column names and PostgreSQL type OIDs.
+
+    Numeric columns become decimals with the precision and scale from their
+    type modifier, so amounts keep every digit. A numeric declared without
+    them has no fixed scale and is kept as a string, as in a CSV extract.
+
+    Args:
+        headers (list): Column names.
+        types (list): PostgreSQL type OIDs, one per column. Unknown or missing
+            OIDs map to strings.
+        type_modifiers (list): PostgreSQL type modifiers, one per column.
+            Defaults to None.
+
+    Returns:
+        pyarrow.Schema: The schema for the extracted table.
+    """
+    import pyarrow as pa
+
+    arrow_types = {
+        'bool': pa.bool_(),
+        'int64': pa.int64(),
+        'float64': pa.float64(),
+        'string': pa.string(),
+        'date': pa.date32(),
+        'time': pa.time64('us'),
+        'timestamp': pa.timestamp('us'),
+        'timestamptz': pa.timestamp('us', tz='UTC'),
+    }
+    type_modifiers = type_modifiers or [None] * len(headers)
+    return pa.schema([
+        (name, numeric_type(type_modifier) if type_oid == NUMERIC_OID else arrow_types[PG_TYPE_NAMES.get(type_oid, 'string')])
+        for name, type_oid, type_modifier in zip(headers, types, type_modifiers)
+    ])
+
+def numeric_type(type_modifier):
+    """Returns the pyarrow type for a PostgreSQL numeric with the given type modifier.
+
+    Args:
+        type_modifier (int): The column's type modifier, `((precision << 16) |
+            scale) + 4`, or -1 or None if it has no precision.
+
+    Returns:
+        pyarrow.DataType: A decimal of that precision and scale, or a string
+            if there is none or it does not fit a decimal256.
+    """
+    import pyarrow as pa
+
+    if type_modifier is None or type_modifier < 4:
+        return pa.string()
+    precision, scale = ((type_modifier - 4) >> 16) & 0xffff, (type_modifier - 4) & 0xffff
+    if not 0 < precision <= 76 or scale > precision:
+        return pa.string()
+    return pa.decimal128(precision, scale) if precision <= 38 else pa.decimal256(precision, scale)
+
+def _write_arrow_batches(data, open_writer):
+    rows_written = 0
+    writer = None
+    schema = None
+    try:
+        for batch in iter_batches(data):
+            if writer is None:
+                types = batch.get('types') or [None] * len(batch['headers'])
+                schema = arrow_schema(batch['headers'], types, batch.get('type_modifiers'))
+                writer = open_writer(schema)
+            writer.write_table(_batch_to_arrow(batch['body'], schema))
+            rows_written += len(batch['body'])
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows_written
+
+def _batch_to_arrow(rows, schema):
+    import pyarrow as pa
+
+    columns = list(zip(*rows)) if rows else [[] for _ in schema]
+    arrays = []
+    for values, field in zip(columns, schema):
+        if pa.types.is_floating(field.type):
+            # numeric columns arrive as Decimal, which pyarrow will not
+            # convert straight to double
+            arrays.append(pa.array(values).cast(field.type))
+        elif pa.types.is_decimal(field.type):
+            arrays.append(pa.array([None if value is None else Decimal(str(value)) for value in values], type=field.type))
+        elif pa.types.is_string(field.type):
+            arrays.append(pa.array([None if value is None else str(value) for value in values], type=field.type))
+        elif pa.types.is_temporal(field.type) and any(isinstance(value, str) for value in values):
+            # change capture (wal2json) sends dates, times and timestamps as text
+            arrays.append(_temporal_from_text(values, field.type))
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+def _temporal_from_text(values, arrow_type):
+    import datetime
+    import pyarrow as pa
+
+    if pa.types.is_time(arrow_type):
+        # pyarrow cannot cast strings to times
+        return pa.array(
+            [datetime.time.fromisoformat(value) if isinstance(value, str) else value for value in values],
+            type=arrow_type,
+        )
+    return pa.array([None if value is None else str(value) for value in values], type=pa.string()).cast(arrow_type)
+
+def iter_batches(data):
+    """Returns `data` as an iterable of batches.
+
+    Args:
+        data (dict or Iterator[dict]): A single data dictionary, or an iterator
+            of them.
+
+    Returns:
+        Iterable[dict]: The batches to write.
+
+    Raises:
+        TypeError: If `data` is not a dictionary or an iterator.
+        ValueError: If 'headers' or 'body' are missing or are not lists.
+    """
+    if isinstance(data, Iterator):
+        return data
+    validate_data(data)
+    return [data]
+
+def validate_data(data):
+    """Checks that `data` is a dictionary with list 'headers' and 'body' values.
+
+    Args:
+        data (dict): The extracted table data to validate.
+
+    Raises:
+        TypeError: If `data` is not a dictionary.
+        ValueError: If 'headers' or 'body' are missing or are not lists.
+    """
     if not isinstance(data, dict):
         raise TypeError("Input 'data' must be a dictionary.")
     if 'headers' not in data or 'body' not in data:
         raise ValueError("Input 'data' dictionary must contain 'headers' and 'body' keys.")
     if not isinstance(data['headers'], list) or not isinstance(data['body'], list):
         raise ValueError("'headers' and 'body' in 'data' must be lists.")
-
-    body = data['body']
-    headers = data['headers']
-    try:
-        with open(f'/tmp/{table_name}.csv', 'w', newline='') as local_file:
-            writer = csv.writer(local_file)
-            writer.writerow(headers)
-            writer.writerows(body)
-    except IOError as e:
-        raise IOError(f"Error writing to CSV file: {e}") from e
     
+def schema_sidecar(headers, types):
+    """Describes the columns of an extract for its schema sidecar file.
+
+    The sidecar is stored next to CSV extracts as '<key>.schema.json' so the
+    transform stage can parse them with explicit types instead of inferring
+    them.
+
+    Args:
+        headers (list): Column names.
+        types (list): PostgreSQL type OIDs, one per column.
+
+    Returns:
+        dict: `{"columns": [{"name", "type_oid", "type"}, ...]}`, where 'type'
+            is the logical type from `PG_TYPE_NAMES` ('string' if unknown).
+    """
+    types = types or [None] * len(headers)
+    return {"columns": [
+        {"name": name, "type_oid": type_oid, "type": PG_TYPE_NAMES.get(type_oid, 'string')}
+        for name, type_oid in zip(headers, types)
+    ]}
+
+def record_schema(data, schema):
+    """Passes the batches of `data` through, recording their schema.
+
+    Args:
+        data (dict or Iterator[dict]): See `write_csv`.
+        schema (dict): Filled in with the `schema_sidecar` of the first batch.
+
+    Yields:
+        dict: The batches of `data`, unchanged.
+    """
+    for batch in iter_batches(data):
+        if not schema:
+            schema.update(schema_sidecar(batch['headers'], batch.get('types')))
+        yield batch
+
 def get_current_time(time_object):
     """Formats the given time object into a timestamp and filepath structure.
 
@@ -52,4 +399,14 @@ def get_current_time(time_object):
     date = '-'.join([str(number).rjust(2,'0') for number in timenow[:3]])
     hours = ':'.join([str(number).rjust(2,'0') for number in timenow[3:]])
     timestamp = f'{date} {hours}'
-    return {'secret':timestamp, 'filepath': '/'.join(map(str,timenow[:-1]))}
\ No newline at end of file
+    return {'secret':timestamp, 'filepath': '/'.join(map(str,timenow[:-1]))}
+
+SCHEMA_SUFFIX = '.schema.json'
+
+OUTPUT_FORMATS = {
+    'csv': ('.csv', write_csv),
+    'csv.gz': ('.csv.gz', write_csv_gzip),
+    'csv.zst': ('.csv.zst', write_csv_zstd),
+    'parquet': ('.parquet', write_parquet),
+    'arrow': ('.arrow', write_arrow),
+}
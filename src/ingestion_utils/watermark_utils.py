@@ -0,0 +1,237 @@
+import json
+import os
+import threading
+from botocore.exceptions import ClientError
+
+DEFAULT_WATERMARK = '2020-01-01 00:00:00'
+MAX_WRITE_ATTEMPTS = 5
+
+
+class WatermarkConflictError(Exception):
+    """Raised when the stored state changed between reading and writing it."""
+
+
+class WatermarkStore:
+    """Keeps a separate high-water mark (last extracted timestamp) per table.
+
+    The state is a single JSON document of the form
+    `{"watermarks": {"sales_order": "2025-03-06 22:51:00", ...}, "checkpoints": {...}}`,
+    where a checkpoint records how far an unfinished chunked extraction of a
+    table got so the next run can resume it. Every update
+    re-reads the document, changes only the entries for one table and writes it
+    back conditionally, retrying if another writer got there first, so tables
+    advance independently and concurrent updates are never lost.
+
+    Subclasses provide `_read` and `_write` for a particular backend.
+    """
+
+    def __init__(self):
+        self._state = None
+        self._lock = threading.Lock()
+
+    def get(self, table, default=DEFAULT_WATERMARK):
+        """Returns the watermark for `table`, or `default` if it has none.
+
+        Args:
+            table (str): Name of the source table.
+            default (str): Value returned when no watermark is stored.
+
+        Returns:
+            str: Timestamp in the form 'YYYY-MM-DD HH:MM:SS'.
+        """
+        if self._state is None:
+            self.load()
+        return self._state["watermarks"].get(table, default)
+
+    def set(self, table, watermark):
+        """Advances the watermark for `table` and persists it.
+
+        Args:
+            table (str): Name of the source table.
+            watermark (str): Timestamp in the form 'YYYY-MM-DD HH:MM:SS'.
+
+        Raises:
+            Exception: If the state cannot be written after several attempts.
+        """
+        def update(state):
+            state["watermarks"][table] = watermark
+            state["checkpoints"].pop(table, None)
+
+        self._update(update)
+
+    def get_checkpoint(self, table):
+        """Returns the checkpoint of an unfinished extraction of `table`.
+
+        Args:
+            table (str): Name of the source table.
+
+        Returns:
+            dict: The checkpoint stored by `set_checkpoint`, or None.
+        """
+        if self._state is None:
+            self.load()
+        return self._state["checkpoints"].get(table)
+
+    def set_checkpoint(self, table, checkpoint):
+        """Records progress of an extraction of `table` that is not yet complete.
+
+        The checkpoint is cleared when the table's watermark is next advanced
+        with `set`.
+
+        Args:
+            table (str): Name of the source table.
+            checkpoint (dict): JSON-serialisable progress information.
+        """
+        def update(state):
+            state["checkpoints"][table] = checkpoint
+
+        self._update(update)
+
+    def load(self):
+        """Reloads the state from the backend, discarding any cached copy."""
+        state, _ = self._read()
+        self._state = state
+        return state
+
+    def _update(self, mutate):
+        with self._lock:
+            for _ in range(MAX_WRITE_ATTEMPTS):
+                state, version = self._read()
+                mutate(state)
+                try:
+                    self._write(state, version)
+                    self._state = state
+                    return
+                except WatermarkConflictError:
+                    continue
+            raise Exception(
+                f"Error putting watermarks: state changed on every one of {MAX_WRITE_ATTEMPTS} attempts"
+            )
+
+    @staticmethod
+    def _empty_state():
+        return {"watermarks": {}, "checkpoints": {}}
+
+    @staticmethod
+    def _parse(contents):
+        state = json.loads(contents)
+        state.setdefault("watermarks", {})
+        state.setdefault("checkpoints", {})
+        return state
+
+    def _read(self):
+        """Returns `(state, version)`, where version identifies the stored copy."""
+        raise NotImplementedError
+
+    def _write(self, state, version):
+        """Writes `state` if the stored copy still matches `version`.
+
+        Raises:
+            WatermarkConflictError: If the stored copy has changed.
+        """
+        raise NotImplementedError
+
+
+class S3WatermarkStore(WatermarkStore):
+    """Watermark store backed by a JSON object in S3.
+
+    Writes use `If-Match` with the ETag seen on read (or `If-None-Match: *`
+    when the object does not exist yet), so S3 rejects a write that would
+    overwrite a concurrent update.
+
+    Args:
+        s3_client: Boto3 S3 client.
+        bucket (str): Bucket holding the state object.
+        key (str): Key of the state object.
+    """
+
+    def __init__(self, s3_client, bucket, key='_state/watermarks.json'):
+        super().__init__()
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+
+    def _read(self):
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self.key)
+            return self._parse(response["Body"].read()), response["ETag"]
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "NoSuchKey":
+                return self._empty_state(), None
+            raise Exception(f"Error fetching watermarks: {e}") from e
+
+    def _write(self, state, version):
+        body = json.dumps(state, indent=2, sort_keys=True, default=str).encode("utf-8")
+        conditions = {"If-Match": version} if version else {"If-None-Match": "*"}
+        try:
+            put_object_conditionally(self.s3_client, self.bucket, self.key, body, conditions)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("PreconditionFailed", "ConditionalRequestConflict"):
+                raise WatermarkConflictError(str(e)) from e
+            raise Exception(f"Error putting watermarks: {e}") from e
+
+
+class LocalWatermarkStore(WatermarkStore):
+    """Watermark store backed by a local JSON file, for tests and local runs.
+
+    Args:
+        path (str): Path of the JSON file. Created on first write.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as state_file:
+                contents = state_file.read()
+        except FileNotFoundError:
+            return self._empty_state(), None
+        return self._parse(contents), contents
+
+    def _write(self, state, version):
+        try:
+            with open(self.path, "r") as state_file:
+                current = state_file.read()
+        except FileNotFoundError:
+            current = None
+        if current != version:
+            raise WatermarkConflictError(f"{self.path} changed since it was read")
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as state_file:
+            json.dump(state, state_file, indent=2, sort_keys=True, default=str)
+        os.replace(temp_path, self.path)
+
+
+def put_object_conditionally(s3_client, bucket, key, body, conditions):
+    """Puts an object with conditional-write headers such as `If-Match`.
+
+    The pinned botocore does not model the conditional-write parameters on
+    PutObject, so the headers are added to the signed request for this key
+    only.
+
+    Args:
+        s3_client: Boto3 S3 client.
+        bucket (str): Destination bucket.
+        key (str): Destination key.
+        body (bytes): Object contents.
+        conditions (dict): Header names and values, e.g. `{"If-Match": etag}`.
+
+    Returns:
+        dict: The PutObject response.
+
+    Raises:
+        ClientError: With code 'PreconditionFailed' if a condition does not hold.
+    """
+    def add_conditions(request, **kwargs):
+        if request.url.split("?")[0].endswith(key):
+            for header, value in conditions.items():
+                request.headers[header] = value
+
+    event_name = "before-sign.s3.PutObject"
+    s3_client.meta.events.register(event_name, add_conditions)
+    try:
+        return s3_client.put_object(Bucket=bucket, Key=key, Body=body)
+    finally:
+        s3_client.meta.events.unregister(event_name, add_conditions)
@@ -1,19 +1,52 @@
 import boto3
-from helpers import fetch_credentials, export_db_creds_to_env
-from ingestion_utils.file_utils import data_to_csv, get_current_time
-from ingestion_utils.database_utils import create_connection, close_db_connection, get_recent_additions, get_last_upload_date, put_last_upload_date
+from helpers import fetch_credentials_cached, clear_credential_cache, export_db_creds_to_env, S3MultipartWriter
+from ingestion_utils.file_utils import data_to_file, get_current_time, record_schema, schema_sidecar, OUTPUT_FORMATS, SCHEMA_SUFFIX
+from ingestion_utils.database_utils import ConnectionPool, create_connection, close_db_connection, get_recent_additions, get_recent_additions_batched, get_recent_additions_keyset, has_recent_additions, get_last_upload_date, put_last_upload_date
+from ingestion_utils.watermark_utils import S3WatermarkStore, DEFAULT_WATERMARK
+from ingestion_utils.cdc_utils import ensure_replication_slot, peek_changes, advance_slot, group_changes_by_table, DEFAULT_SLOT_NAME, DEFAULT_MAX_CHANGES
+from transform_utils.column_manifest import source_columns
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 import time
 import logging
+import json
 import os
 
 secret_client =  boto3.client("secretsmanager")
 s3_client = boto3.client("s3")
 bucket_name = os.environ["BUCKET_NAME"]
+extract_batch_size = int(os.environ.get("EXTRACT_BATCH_SIZE", "10000"))
+stream_upload = os.environ.get("STREAM_UPLOAD", "true").lower() == "true"
+extract_max_workers = int(os.environ.get("EXTRACT_MAX_WORKERS", "4"))
+output_format = os.environ.get("INGEST_OUTPUT_FORMAT", "csv")
+fact_chunk_size = int(os.environ.get("FACT_CHUNK_SIZE", "0")) or None
+ingest_mode = os.environ.get("INGEST_MODE", "poll")
+cdc_slot_name = os.environ.get("CDC_SLOT_NAME", DEFAULT_SLOT_NAME)
+cdc_max_changes = int(os.environ.get("CDC_MAX_CHANGES", str(DEFAULT_MAX_CHANGES)))
+
+# Tables joined together into a single dimension by the transform stage. When
+# any of them has changed, every table in the group is extracted in full so the
+# join sees complete inputs. With INCREMENTAL_JOINS=true only changed rows are
+# extracted, and the transform joins them against its own snapshot of the group;
+# enable it only once the transform lambda runs with INCREMENTAL_JOINS=true and
+# has saved its snapshots.
+incremental_joins = os.environ.get("INCREMENTAL_JOINS", "false").lower() == "true"
+join_groups = [] if incremental_joins else [["counterparty", "address"], ["staff", "department"]]
+
+# Kept at module level so connections stay open between warm invocations.
+connection_pool = ConnectionPool(max_size=extract_max_workers, connection_factory=lambda: get_connection(), check_liveness=True)
 
 def lambda_handler(event, context):
     """Handles the lambda function invocation.
 
     Extracts data from specified tables, saves it to CSV, and uploads to S3.
+    Every table is extracted incrementally from its own watermark, which is
+    advanced only once that table has been saved, and dimension tables
+    extracted in full are listed in 'full_tables'. Tables that fail are left
+    out and listed in 'failed_tables', with status code 207, while the others
+    are passed on. When INGEST_MODE is 'cdc',
+    changes are read from a logical replication slot with `save_changes_to_s3`
+    instead of polling each table.
 
     Args:
         event (dict): Event data passed to the lambda function. Must contain 'tables' key.
@@ -22,24 +55,40 @@ def lambda_handler(event, context):
     Returns:
         dict: Status code and message indicating success or failure.
     """
-    conn = None
+    pool = connection_pool
     try:
         fact_tables_to_ingest = event["fact_tables"]
         dim_tables_to_ingest = event["dim_tables"]
 
-        conn = get_connection()
-        last_date = get_last_run_date()
+        watermark_store = S3WatermarkStore(s3_client, bucket_name)
         time_now = time.gmtime()
         timestamp = get_current_time(time_now)
 
-        fact_keys = save_data_to_s3(conn, fact_tables_to_ingest, timestamp, last_date )
+        if ingest_mode == "cdc":
+            full_tables = []
+            with pool.acquire() as conn:
+                keys = save_changes_to_s3(conn, fact_tables_to_ingest + dim_tables_to_ingest, timestamp, s3_client=s3_client, slot_name=cdc_slot_name, max_changes=cdc_max_changes, output_format=output_format, groups=join_groups, column_manifest=source_columns, full_tables=full_tables)
+            logging.info(f"Change capture run successfully for tables: {sorted(keys)}")
+            return {
+                "status_code": 200,
+                "fact_tables": {table: key for table, key in keys.items() if table in fact_tables_to_ingest},
+                "dim_tables": {table: key for table, key in keys.items() if table in dim_tables_to_ingest},
+                "full_tables": [table for table in full_tables if table in dim_tables_to_ingest],
+            }
+
+        failed_tables = []
+        fact_dates = get_start_dates(pool, fact_tables_to_ingest, watermark_store, timestamp, default=get_last_run_date)
+        fact_keys = save_data_to_s3_concurrently(pool, fact_tables_to_ingest, timestamp, fact_dates, s3_client=s3_client, batch_size=extract_batch_size, stream_upload=stream_upload, watermark_store=watermark_store, output_format=output_format, chunk_size=fact_chunk_size, column_manifest=source_columns, failed_tables=failed_tables)
         logging.info(f"Extraction run successfully for fact tables: {fact_tables_to_ingest}")
-        dim_keys = save_data_to_s3(conn, dim_tables_to_ingest, timestamp)
+        dim_dates = get_start_dates(pool, dim_tables_to_ingest, watermark_store, timestamp, groups=join_groups)
+        dim_keys = save_data_to_s3_concurrently(pool, dim_tables_to_ingest, timestamp, dim_dates, s3_client=s3_client, batch_size=extract_batch_size, stream_upload=stream_upload, watermark_store=watermark_store, output_format=output_format, column_manifest=source_columns, failed_tables=failed_tables)
         logging.info(f"Extraction run successfully for dimension tables: {dim_tables_to_ingest}")
 
-        put_last_run_date(time_now)
-
-        return {"status_code": 200, "fact_tables": fact_keys, "dim_tables" : dim_keys}
+        full_tables = [table for table in dim_keys if dim_dates[table] == DEFAULT_WATERMARK]
+        if failed_tables:
+            logging.error(f"Extraction failed for tables: {failed_tables}")
+            return {"status_code": 207, "fact_tables": fact_keys, "dim_tables" : dim_keys, "full_tables": full_tables, "failed_tables": failed_tables}
+        return {"status_code": 200, "fact_tables": fact_keys, "dim_tables" : dim_keys, "full_tables": full_tables}
 
     except KeyError as ke:
         logging.error(f"Missing key in event: {ke}")
@@ -47,15 +96,14 @@ def lambda_handler(event, context):
     except Exception as e:
         logging.error(f"Extraction run failed: {e}")
         return {"status_code": 500, "body": f"Extraction run failed: {e}"} 
-    finally:
-        if conn:
-            close_db_connection(conn)
 
 def get_connection(secret_client = secret_client):
     """Creates a database connection using credentials from AWS secrets manager.
 
     Retrieves database credentials from the secrets manager. Exports these credentials
-    as environment variables, and then creates a database connection.
+    as environment variables, and then creates a database connection. Credentials
+    are cached for the life of the container; if connecting with cached credentials
+    fails they are fetched again once, in case the secret has been rotated.
 
     Args:
         secret_client (object): Client for accessing the secrets manager.
@@ -63,10 +111,15 @@ def get_connection(secret_client = secret_client):
     Returns:
         object: Database connection instance.
     """
-    db_creds = fetch_credentials(secret_client, secret_name="database_credentials")
-    export_db_creds_to_env(db_creds, ["username","password","port","host"])
-    conn = create_connection()
-    return conn
+    for attempt in range(2):
+        db_creds = fetch_credentials_cached(secret_client, secret_name="database_credentials")
+        export_db_creds_to_env(db_creds, ["username","password","port","host"])
+        try:
+            return create_connection()
+        except Exception:
+            if attempt:
+                raise
+            clear_credential_cache("database_credentials")
 
 def get_last_run_date(secret_client = secret_client):
     """Retrieves the timestamp of the last ingestion run.
@@ -102,7 +155,43 @@ def put_last_run_date(timeobject, secret_client = secret_client):
     """
     return put_last_upload_date(timeobject, secret_client)
 
-def save_data_to_s3(conn, tables_to_ingest, timestamp, last_date = "2020-01-01 00:00:00", s3_client=s3_client) -> dict:
+def get_start_dates(pool, tables, watermark_store, timestamp, default=DEFAULT_WATERMARK, groups=()) -> dict:
+    """Works out the timestamp each table should be extracted from.
+
+    Each table starts from its own watermark. For every group in `groups`, if
+    any table in the group has rows updated since its watermark, all tables in
+    the group start from `DEFAULT_WATERMARK` instead, i.e. are extracted in full.
+
+    Args:
+        pool (ConnectionPool): Pool supplying a connection for change checks.
+        tables (list): Tables to be extracted.
+        watermark_store (WatermarkStore): Store holding per-table watermarks.
+        timestamp (dict): Timestamp information for the current run.
+        default (str or callable): Start date for tables with no stored
+            watermark, or a zero-argument callable returning it, only called
+            if some table has no watermark.
+        groups (list): Lists of tables that must be extracted together.
+
+    Returns:
+        dict: Table names mapped to start timestamps.
+    """
+    start_dates = {table: watermark_store.get(table, None) for table in tables}
+    missing = [table for table, start_date in start_dates.items() if start_date is None]
+    if missing:
+        fallback = default() if callable(default) else default
+        start_dates.update({table: fallback for table in missing})
+    for group in groups:
+        members = [table for table in group if table in start_dates]
+        if not members:
+            continue
+        with pool.acquire() as conn:
+            changed = any(has_recent_additions(conn, table, start_dates[table], timestamp["secret"]) for table in members)
+        if changed:
+            for table in members:
+                start_dates[table] = DEFAULT_WATERMARK
+    return start_dates
+
+def save_data_to_s3(conn, tables_to_ingest, timestamp, last_date = "2020-01-01 00:00:00", s3_client=s3_client, batch_size=None, stream_upload=False, output_format="csv", column_manifest=None) -> dict:
     """Saves latest additions to database to S3 bucket as CSV files.
 
     Retrieves data from specified tables that have been updated since the given 
@@ -116,16 +205,292 @@ def save_data_to_s3(conn, tables_to_ingest, timestamp, last_date = "2020-01-01 0
         last_date (str): The timestamp for the last lambda handler run. Defaults
             to "2020-01-01 00:00:00".
         s3_client (object): Client for accessing the S3 bucket.
+        batch_size (int): When set, each table is streamed through a server-side
+            cursor in batches of this many rows instead of being fetched in one
+            query, so memory use is bounded by the batch size. Defaults to None.
+        stream_upload (bool): When True, rows are encoded to CSV in memory and
+            streamed into an S3 multipart upload as they arrive, instead of being
+            written to /tmp and uploaded afterwards. Defaults to False.
+        output_format (str): File format of the extracts, one of 'csv',
+            'parquet' or 'arrow'. The typed formats keep the source column
+            types so the transform stage does not have to infer them.
+            Defaults to 'csv'.
+        column_manifest (callable): Function returning the list of columns
+            to extract for a table name, or None to extract every column.
+            Defaults to None, extracting every column of every table.
 
     Returns:
         dict: A dictionary with table names as keys and file paths as values.
     """
     key_dict = {}
     for table in tables_to_ingest:
-        data = get_recent_additions(conn, tablename=table, updatedate=last_date, time_now=timestamp["secret"])
-        key = timestamp["filepath"] + '/' + table + '.csv'
-        if data["body"]:
-            data_to_csv(data, table_name=table)
-            s3_client.upload_file(f"/tmp/{table}.csv", bucket_name, key)
+        columns = column_manifest(table) if column_manifest else None
+        key = save_table_to_s3(conn, table, timestamp, last_date, s3_client=s3_client, batch_size=batch_size, stream_upload=stream_upload, output_format=output_format, columns=columns)
+        if key:
+            key_dict[table]=key
+    return key_dict
+
+def save_data_to_s3_concurrently(pool, tables_to_ingest, timestamp, last_date = "2020-01-01 00:00:00", s3_client=s3_client, batch_size=None, stream_upload=False, max_workers=None, watermark_store=None, output_format="csv", chunk_size=None, column_manifest=None, failed_tables=None) -> dict:
+    """Saves latest additions to database to S3 bucket, one table per worker thread.
+
+    Behaves like `save_data_to_s3`, but each table is extracted and uploaded on
+    its own worker thread using a connection borrowed from `pool`. The number
+    of tables extracted at once is capped by `max_workers` and by the size of
+    the pool, which limits the load placed on the source database.
+
+    When a `watermark_store` is given, each table's watermark is advanced to
+    the current run's timestamp as soon as that table has been saved. A table
+    that fails is logged and left out of the result instead of failing the
+    run, so it is picked up again next run without holding back the others.
+
+    Args:
+        pool (ConnectionPool): Pool supplying one connection per worker.
+        tables_to_ingest (list): A list of specified tables to be uploaded.
+        timestamp (dict): A dictionary containing timestamp information for the
+            current lambda handler run.
+        last_date (str or dict): The timestamp to extract from, either one for
+            every table or a dictionary of per-table timestamps. Defaults to
+            "2020-01-01 00:00:00".
+        s3_client (object): Client for accessing the S3 bucket.
+        batch_size (int): See `save_data_to_s3`. Defaults to None.
+        stream_upload (bool): See `save_data_to_s3`. Defaults to False.
+        output_format (str): See `save_data_to_s3`. Defaults to 'csv'.
+        max_workers (int): Maximum number of tables extracted at once. Defaults
+            to the size of the pool.
+        watermark_store (WatermarkStore): Store whose per-table watermarks are
+            advanced after each successful table. Defaults to None.
+        chunk_size (int): When set, each table is extracted with
+            `save_table_in_chunks` in chunks of this many rows, resuming any
+            extraction a previous run left unfinished. Requires a
+            `watermark_store` to hold the checkpoints. Defaults to None.
+        column_manifest (callable): See `save_data_to_s3`. Defaults to None.
+        failed_tables (list): When passed, the tables that failed with a
+            `watermark_store` are appended to it. Defaults to None.
+
+    Returns:
+        dict: A dictionary with table names as keys and file paths as values.
+
+    Raises:
+        Exception: Without a `watermark_store`, the first error raised while
+            extracting any table, once all workers have finished.
+    """
+    def worker(table):
+        table_last_date = last_date[table] if isinstance(last_date, dict) else last_date
+        columns = column_manifest(table) if column_manifest else None
+        with pool.acquire() as conn:
+            if chunk_size:
+                key = save_table_in_chunks(conn, table, timestamp, table_last_date, watermark_store, s3_client=s3_client, chunk_size=chunk_size, output_format=output_format, columns=columns)
+            else:
+                key = save_table_to_s3(conn, table, timestamp, table_last_date, s3_client=s3_client, batch_size=batch_size, stream_upload=stream_upload, output_format=output_format, columns=columns)
+        if watermark_store is not None:
+            watermark_store.set(table, timestamp["secret"])
+        return key
+
+    with ThreadPoolExecutor(max_workers=max_workers or pool.max_size) as executor:
+        futures = {table: executor.submit(worker, table) for table in tables_to_ingest}
+
+    key_dict = {}
+    for table, future in futures.items():
+        try:
+            key = future.result()
+        except Exception as e:
+            if watermark_store is None:
+                raise
+            logging.error(f"Extraction failed for {table}, watermark not advanced: {e}")
+            if failed_tables is not None:
+                failed_tables.append(table)
+            continue
+        if key:
             key_dict[table]=key
-    return key_dict
\ No newline at end of file
+    return key_dict
+
+def save_table_to_s3(conn, table, timestamp, last_date = "2020-01-01 00:00:00", s3_client=s3_client, batch_size=None, stream_upload=False, output_format="csv", columns=None):
+    """Saves latest additions to a single table to the S3 bucket.
+
+    Args:
+        conn (object): Database connection instance.
+        table (str): The table to be uploaded.
+        timestamp (dict): A dictionary containing timestamp information for the
+            current lambda handler run.
+        last_date (str): The timestamp for the last lambda handler run.
+        s3_client (object): Client for accessing the S3 bucket.
+        batch_size (int): See `save_data_to_s3`.
+        stream_upload (bool): See `save_data_to_s3`.
+        output_format (str): See `save_data_to_s3`.
+        columns (list): Columns to extract. Defaults to None, meaning all.
+
+    Returns:
+        str: The S3 key the table was written to, or None if there were no rows.
+    """
+    extension, _ = OUTPUT_FORMATS[output_format]
+    key = timestamp["filepath"] + '/' + table + extension
+    if batch_size:
+        batches = get_recent_additions_batched(conn, tablename=table, updatedate=last_date, time_now=timestamp["secret"], batch_size=batch_size, columns=columns)
+        # Closed here, on the caller's connection, rather than left to garbage
+        # collection after the connection may have gone back to the pool.
+        with closing(batches):
+            return save_batches_to_s3(batches, table, key, s3_client, stream_upload, output_format)
+    data = get_recent_additions(conn, tablename=table, updatedate=last_date, time_now=timestamp["secret"], columns=columns)
+    if not data["body"]:
+        return None
+    return save_batches_to_s3(data, table, key, s3_client, stream_upload, output_format)
+
+def save_batches_to_s3(data, table, key, s3_client=s3_client, stream_upload=False, output_format="csv"):
+    """Writes extracted rows to `key` in the S3 bucket, with their schema sidecar.
+
+    Args:
+        data (dict or Iterator[dict]): Rows as returned by `get_recent_additions`
+            or batches from `get_recent_additions_batched`.
+        table (str): The table the rows were extracted from.
+        key (str): S3 key to write to.
+        s3_client (object): Client for accessing the S3 bucket.
+        stream_upload (bool): See `save_data_to_s3`.
+        output_format (str): See `save_data_to_s3`.
+
+    Returns:
+        str: `key`, or None if there were no rows.
+    """
+    extension, write = OUTPUT_FORMATS[output_format]
+    schema = {}
+    data = record_schema(data, schema)
+    if stream_upload:
+        writer = S3MultipartWriter(s3_client, bucket_name, key)
+        try:
+            rows_written = write(data, writer)
+        except Exception:
+            writer.abort()
+            raise
+        if rows_written:
+            writer.close()
+        else:
+            writer.abort()
+    else:
+        rows_written = data_to_file(data, table_name=table, output_format=output_format)
+        if rows_written:
+            s3_client.upload_file(f"/tmp/{table}{extension}", bucket_name, key)
+    if rows_written:
+        save_schema_sidecar(key, schema, s3_client=s3_client)
+    return key if rows_written else None
+
+def save_table_in_chunks(conn, table, timestamp, last_date, watermark_store, s3_client=s3_client, chunk_size=10000, output_format="csv", columns=None):
+    """Saves latest additions to a single table to S3 as numbered part objects.
+
+    Rows are read with keyset pagination on `(last_updated, <table>_id)`, and
+    each chunk of `chunk_size` rows is written to its own object,
+    `<prefix>part-00001<extension>`, `<prefix>part-00002<extension>`, ... .
+    After every part is uploaded, the part number and the last key it
+    contained are saved as the table's checkpoint in `watermark_store`. If a
+    run is interrupted, the next run finds the checkpoint and carries on
+    writing parts under the same prefix from the chunk after the last
+    completed one, instead of extracting the whole window again.
+
+    Args:
+        conn (object): Database connection instance.
+        table (str): The table to be uploaded.
+        timestamp (dict): A dictionary containing timestamp information for the
+            current lambda handler run.
+        last_date (str): The timestamp for the last lambda handler run.
+        watermark_store (WatermarkStore): Store holding the table's checkpoint.
+        s3_client (object): Client for accessing the S3 bucket.
+        chunk_size (int): Number of rows per part object.
+        output_format (str): See `save_data_to_s3`.
+        columns (list): Columns to extract. Defaults to None, meaning all.
+
+    Returns:
+        str: The prefix (ending in '/') the parts were written under, or None
+            if there were no rows.
+    """
+    extension, write = OUTPUT_FORMATS[output_format]
+    checkpoint = watermark_store.get_checkpoint(table)
+    if checkpoint:
+        prefix, part, after = checkpoint["prefix"], checkpoint["part"], checkpoint["last_key"]
+        logging.info(f"Resuming extraction of {table} after part {part}")
+    else:
+        prefix, part, after = timestamp["filepath"] + '/' + table + '/', 0, None
+
+    chunks = get_recent_additions_keyset(conn, tablename=table, primary_key=f"{table}_id", updatedate=last_date, time_now=timestamp["secret"], chunk_size=chunk_size, after=after, columns=columns)
+    for chunk in chunks:
+        part += 1
+        part_key = f"{prefix}part-{part:05d}{extension}"
+        with S3MultipartWriter(s3_client, bucket_name, part_key) as writer:
+            write(chunk, writer)
+        save_schema_sidecar(part_key, schema_sidecar(chunk["headers"], chunk["types"]), s3_client=s3_client)
+        watermark_store.set_checkpoint(table, {"prefix": prefix, "part": part, "last_key": chunk["last_key"]})
+    return prefix if part else None
+
+def save_changes_to_s3(conn, tables_to_ingest, timestamp, s3_client=s3_client, slot_name=DEFAULT_SLOT_NAME, max_changes=DEFAULT_MAX_CHANGES, output_format="csv", groups=(), column_manifest=None, full_tables=None) -> dict:
+    """Saves changes captured by a logical replication slot to the S3 bucket.
+
+    Pending change events are read from the slot and batched per table. The
+    latest version of every inserted or updated row is written to the same
+    `<timestamp>/<table><extension>` key `save_data_to_s3` would use. Deleted
+    rows are only logged: as in polling mode, the transform and load stages
+    keep the rows they have already seen. The slot is only advanced once
+    every file has been uploaded, so a failed run leaves the changes in place
+    to be read again.
+
+    For every group in `groups`, if any table in the group changed, every
+    table in the group is extracted in full, as in polling mode, so the
+    transform join sees complete inputs. Every other table is only its
+    changed rows.
+
+    Args:
+        conn (object): Database connection instance.
+        tables_to_ingest (list): Tables whose changes should be saved.
+        timestamp (dict): A dictionary containing timestamp information for the
+            current lambda handler run.
+        s3_client (object): Client for accessing the S3 bucket.
+        slot_name (str): Name of the replication slot, created if missing.
+        max_changes (int): Approximate maximum number of changes read per run.
+        output_format (str): See `save_data_to_s3`.
+        groups (list): Lists of tables that must be extracted together.
+        column_manifest (callable): See `save_data_to_s3`. Only used for the
+            full extraction of join groups. Defaults to None.
+        full_tables (list): When passed, the tables extracted in full are
+            appended to it. Defaults to None.
+
+    Returns:
+        dict: Table names mapped to the S3 keys of their changed rows.
+    """
+    extension, write = OUTPUT_FORMATS[output_format]
+    ensure_replication_slot(conn, slot_name)
+    changes = peek_changes(conn, slot_name, tables=tables_to_ingest, max_changes=max_changes)
+    upserts, deletes = group_changes_by_table(changes)
+
+    keys = {}
+    for table, data in upserts.items():
+        keys[table] = timestamp["filepath"] + '/' + table + extension
+        with S3MultipartWriter(s3_client, bucket_name, keys[table]) as writer:
+            write(data, writer)
+        save_schema_sidecar(keys[table], schema_sidecar(data["headers"], data["types"]), s3_client=s3_client)
+    for table, data in deletes.items():
+        logging.info(f"Ignoring {len(data['body'])} deleted rows of {table}")
+    for group in groups:
+        members = [table for table in group if table in tables_to_ingest]
+        if any(table in keys for table in members):
+            for table in members:
+                columns = column_manifest(table) if column_manifest else None
+                key = save_table_to_s3(conn, table, timestamp, DEFAULT_WATERMARK, s3_client=s3_client, output_format=output_format, columns=columns)
+                if key:
+                    keys[table] = key
+                    if full_tables is not None:
+                        full_tables.append(table)
+
+    if changes:
+        advance_slot(conn, changes[-1][0], slot_name)
+    return keys
+
+def save_schema_sidecar(key, schema, s3_client=s3_client):
+    """Uploads the schema sidecar of a CSV extract to '<key>.schema.json'.
+
+    Typed formats such as Parquet carry their own schema, so nothing is
+    written for them.
+
+    Args:
+        key (str): S3 key of the extract.
+        schema (dict): The sidecar, as built by `schema_sidecar`.
+        s3_client (object): Client for accessing the S3 bucket.
+    """
+    if ".csv" not in key or not schema:
+        return
+    s3_client.put_object(Bucket=bucket_name, Key=key + SCHEMA_SUFFIX, Body=json.dumps(schema).encode("utf-8"))
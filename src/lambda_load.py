@@ -1,12 +1,21 @@
 import boto3
+import os
 from typing import Dict, Any
-from helpers import fetch_credentials, export_db_creds_to_env
+from helpers import fetch_credentials_cached, clear_credential_cache, export_db_creds_to_env
 from load_utils.write_dataframe_to_dw import process_tables
-from ingestion_utils.database_utils import create_connection
+from ingestion_utils.database_utils import ConnectionPool, create_connection
+from transform_utils.dim_cache import DimDateState
 import logging
 
 secret_client =  boto3.client("secretsmanager")
 s3_client = boto3.client("s3")
+bucket_name = os.environ.get("BUCKET_NAME")
+
+# Most warehouse connections open at once, and so tables loaded at the same time.
+load_max_connections = int(os.environ.get("LOAD_MAX_CONNECTIONS", "4"))
+
+# Kept at module level so connections stay open between warm invocations.
+connection_pool = ConnectionPool(max_size=load_max_connections, connection_factory=lambda: get_connection(), check_liveness=True)
 
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """Lambda handler for loading parquet data from S3 to a data warehouse.
@@ -14,14 +23,20 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     This function processes an event containing lists of fact and dimension tables
     and their S3 keys. It reads parquet files from S3, and writes the data
     into a data warehouse. Fact tables are inserted, and dimension tables are replaced.
+    The dimension tables are loaded concurrently, then the fact tables, each table on
+    its own connection from a pool of at most LOAD_MAX_CONNECTIONS. The connections
+    are reused across warm invocations, and only closed if the load fails. Once
+    dim_date is loaded, the range it covers is saved with DimDateState, so the
+    transform lambda stops emitting those dates.
 
     Args:
         event (Dict[str, Any]): Event data containing table information and S3 keys.
                                  Expected format:
                                  {
                                      "status_code": int,
-                                     "fact_tables": {"table_name": "s3_key", ...},
-                                     "dim_tables": {"table_name": "s3_key", ...}
+                                     "fact_tables": {"table_name": "s3_key or dataset prefix", ...},
+                                     "dim_tables": {"table_name": "s3_key", ...},
+                                     "dim_date_covered": ["start date", "end date"] (when dim_date is in dim_tables)
                                  }
         context (Any): Lambda context object (not used in this function).
 
@@ -34,8 +49,6 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         ValueError: If event is missing required keys ('fact_tables' or 'dim_tables').
         Exception: If any unexpected error occurs during processing.
     """
-    db_conn = None
-
     if not isinstance(event, dict):
         raise TypeError("event must be a dictionary")
     if "fact_tables" not in event:
@@ -49,21 +62,25 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     s3_client = boto3.client('s3')
 
     try:
-        db_conn = get_connection()
-        process_tables(dim_tables, s3_client, db_conn, is_fact=False)
+        process_tables(dim_tables, s3_client, None, is_fact=False, pool=connection_pool)
         logging.info(f"Datawarehouse update for dim tables complete: {dim_tables}")
-        process_tables(fact_tables, s3_client, db_conn, is_fact=True)
+        if "dim_date" in dim_tables and event.get("dim_date_covered"):
+            DimDateState(s3_client, bucket_name).save(event["dim_date_covered"])
+        process_tables(fact_tables, s3_client, None, is_fact=True, pool=connection_pool)
         logging.info(f"Datawarehouse update for fact tables complete: {fact_tables}")
         return {"status_code": 200, "body": "Data load completed"}
     except Exception as e:
         logging.info(f"loading failed: {e}")        
+        connection_pool.close_all()
         return {"status_code": 500, "body": f"Error processing data load: {str(e)}"}
-    finally:
-        if db_conn:
-            db_conn.close()
 
 def get_connection(secret_client = secret_client):
-    db_creds = fetch_credentials(secret_client, secret_name="warehouse_credentials")
-    export_db_creds_to_env(db_creds, ["username","password","port","host"])
-    conn = create_connection()
-    return conn
\ No newline at end of file
+    for attempt in range(2):
+        db_creds = fetch_credentials_cached(secret_client, secret_name="warehouse_credentials")
+        export_db_creds_to_env(db_creds, ["username","password","port","host"])
+        try:
+            return create_connection()
+        except Exception:
+            if attempt:
+                raise
+            clear_credential_cache("warehouse_credentials")
\ No newline at end of file
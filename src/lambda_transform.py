@@ -1,4 +1,9 @@
-from transform_utils.file_utils import read_csv_from_s3, write_parquet_to_s3
+from transform_utils.file_utils import read_table_from_s3, write_parquet_to_s3, read_csv_batches_from_s3, write_partitioned_parquet_to_s3
+from transform_utils.streaming import transform_batches_to_parquet
+from transform_utils.column_manifest import source_columns
+from transform_utils.dim_cache import DimCache, DimDateState
+from transform_utils.incremental_joins import JoinSnapshots, JOINED_DIMS
+from helpers import run_concurrently, available_cpus, S3MultipartWriter
 
 from transform_utils.fact_sales_order import util_fact_sales_order
 from transform_utils.fact_purchase_order import util_fact_purchase_order
@@ -6,19 +11,23 @@ from transform_utils.fact_payment import util_fact_payment
 
 from transform_utils.dim_staff import util_dim_staff
 from transform_utils.dim_counterparty import util_dim_counterparty
-from transform_utils.dim_currency import util_dim_currency
-from transform_utils.dim_date import util_dim_date
+from transform_utils.dim_currency import util_dim_currency, refresh_currency_names
+from transform_utils.dim_date import extend_dim_date, date_bounds, DEFAULT_START
 from transform_utils.dim_design import util_dim_design
 from transform_utils.dim_location import util_dim_location
 from transform_utils.dim_payment_type import util_dim_payment_type
 from transform_utils.dim_transaction import util_dim_transaction
+from transform_utils import arrow_engine
 
 import boto3
+import pandas as pd
+import pyarrow as pa
 from botocore.exceptions import ClientError
 from datetime import datetime, UTC
 import logging
 import os
 import json
+import threading
 # test tfstate 1231 10 mar
 
 """6/3/25 16:40 - Ingestion lambda will now ingest entirety of each dim-to-be-table
@@ -38,7 +47,8 @@ dim tables, and on fact-to-be-tables e.g sales_order IF there are updates. (if t
 no updates the fact table will not be present in event dict).
 
 Returns dictionary in same format as that received from ingestion but with filepaths to
-created parquet files in transformed bucket.
+created parquet files in transformed bucket. With PARTITION_FACTS=true a fact table's path is
+the prefix of its partitioned dataset (ending in '/'); streamed fact tables are single files.
 """
 
 logger = logging.getLogger()
@@ -47,6 +57,58 @@ logger.setLevel(logging.INFO)
 s3_client = boto3.client('s3')
 ingestion_bucket = os.environ["INGESTION_BUCKET_NAME"]
 transformed_bucket = os.environ["TRANSFORMED_BUCKET_NAME"]
+# Transforms are CPU bound, so they run one per vCPU; S3 transfers mostly wait
+# on the network, so more of them run at once.
+transform_max_workers = int(os.environ.get("TRANSFORM_MAX_WORKERS", "0")) or available_cpus()
+s3_max_workers = int(os.environ.get("S3_MAX_WORKERS", "8"))
+use_dim_cache = os.environ.get("DIM_CACHE", "true").lower() == "true"
+# "pandas" runs the util_* functions on DataFrames, "arrow" runs the equivalent
+# transform_utils.arrow_engine functions on pyarrow Tables. Both write the same data.
+transform_engine = os.environ.get("TRANSFORM_ENGINE", "pandas").lower()
+# When "true", dim_staff and dim_counterparty are built only for the source rows
+# that changed since the snapshot kept by JoinSnapshots, and only changed rows are written.
+incremental_joins = os.environ.get("INCREMENTAL_JOINS", "false").lower() == "true"
+# Fact extracts at least this large are transformed batch by batch and streamed to S3 as
+# parquet row groups instead of being read into memory whole. 0 streams every fact extract.
+fact_stream_min_bytes = int(os.environ.get("FACT_STREAM_MIN_BYTES", str(64 * 1024 * 1024)))
+# Parquet writer profile (see file_utils.PARQUET_PROFILES) used for every table written.
+parquet_profile = os.environ.get("PARQUET_PROFILE", "default")
+# When true, fact tables are written as datasets partitioned by created_date
+# ({timestamp_path}/fact_<table>/year=/month=/day=/) and the event passes their prefixes.
+partition_facts = os.environ.get("PARTITION_FACTS", "false").lower() == "true"
+
+TRANSFORM_UTILS = {
+    "pandas": {
+        'dim_staff': util_dim_staff,
+        'dim_counterparty': util_dim_counterparty,
+        'dim_currency': util_dim_currency,
+        'dim_location': util_dim_location,
+        'dim_design': util_dim_design,
+        'dim_payment_type': util_dim_payment_type,
+        'dim_transaction': util_dim_transaction,
+        'fact_sales_order': util_fact_sales_order,
+        'fact_purchase_order': util_fact_purchase_order,
+        'fact_payment': util_fact_payment,
+    },
+    "arrow": {
+        'dim_staff': arrow_engine.arrow_dim_staff,
+        'dim_counterparty': arrow_engine.arrow_dim_counterparty,
+        'dim_currency': arrow_engine.arrow_dim_currency,
+        'dim_location': arrow_engine.arrow_dim_location,
+        'dim_design': arrow_engine.arrow_dim_design,
+        'dim_payment_type': arrow_engine.arrow_dim_payment_type,
+        'dim_transaction': arrow_engine.arrow_dim_transaction,
+        'fact_sales_order': arrow_engine.arrow_fact_sales_order,
+        'fact_purchase_order': arrow_engine.arrow_fact_purchase_order,
+        'fact_payment': arrow_engine.arrow_fact_payment,
+    },
+}
+
+# Currency names come from a table bundled with the layer. When enabled, a newer
+# copy is downloaded once per container in the background and used by later
+# invocations; a transform never waits for it.
+if os.environ.get("CURRENCY_NAMES_REFRESH", "false").lower() == "true":
+    threading.Thread(target=refresh_currency_names, daemon=True).start()
 
 def lambda_handler(event,context):
     """Event example:
@@ -67,32 +129,58 @@ def lambda_handler(event,context):
     #
 
     try:
-        dim_table_dfs = run_dim_utils(event, ingestion_bucket)
-        fact_table_dfs = run_fact_utils(event, ingestion_bucket)
-            
+        dim_cache = DimCache(s3_client, transformed_bucket) if use_dim_cache else None
+        cached_dim_tables = {}
+        join_snapshots = JoinSnapshots(s3_client, transformed_bucket) if incremental_joins else None
         now = datetime.now(UTC)
         timestamp_path = f"{now.year}/{now.month:02}/{now.day:02}/{now.hour:02}/{now.minute:02}"
+        streamed_fact_tables = {}
+        table_dfs, errors = run_concurrently({
+            "dim": lambda: run_dim_utils(event, ingestion_bucket, dim_cache, cached_dim_tables, join_snapshots),
+            "fact": lambda: run_fact_utils(event, ingestion_bucket, timestamp_path, streamed_fact_tables),
+        }, max_workers=2)
+        if errors:
+            raise next(iter(errors.values()))
+        dim_table_dfs, fact_table_dfs = table_dfs["dim"], table_dfs["fact"]
+        dim_date_state = DimDateState(s3_client, transformed_bucket)
+        streamed_dates = [summary["dates"] for summary in streamed_fact_tables.values() if summary["dates"]]
+        df_dim_date, dim_date_covered = run_dim_date(fact_table_dfs, dim_date_state, streamed_dates)
+        if df_dim_date is not None:
+            dim_table_dfs["dim_date"] = df_dim_date
 
-        fact_tables = {}
-        dim_tables = {}
+        if partition_facts:
+            fact_tables = {table: f"{timestamp_path}/{table}/" for table in fact_table_dfs}
+        else:
+            fact_tables = {table: f"{timestamp_path}/{table}.parquet" for table in fact_table_dfs}
+        dim_tables = {table: f"{timestamp_path}/{table}.parquet" for table in dim_table_dfs}
 
-        for table, df in fact_table_dfs.items():
-            s3_key = f"{timestamp_path}/{table}.parquet"
-            write_parquet_to_s3(df, transformed_bucket, s3_key)
-            fact_tables[table] = s3_key
+        writes = {
+            s3_key: (lambda df=df, s3_key=s3_key: write_table(df, s3_key))
+            for dfs, keys in ((fact_table_dfs, fact_tables), (dim_table_dfs, dim_tables))
+            for table, df in dfs.items()
+            for s3_key in [keys[table]]
+        }
+        _, errors = run_concurrently(writes, max_workers=s3_max_workers)
+        if errors:
+            raise next(iter(errors.values()))
+        for table, s3_key in {**fact_tables, **dim_tables}.items():
             logger.info(f"Written {table} to {s3_key}")
+        fact_tables.update({table: summary["key"] for table, summary in streamed_fact_tables.items() if summary["rows"]})
+        if join_snapshots:
+            join_snapshots.commit()
+        if dim_cache:
+            dim_cache.commit(dim_tables)
+            dim_tables = {**cached_dim_tables, **dim_tables}
 
-        for table, df in dim_table_dfs.items():
-            s3_key = f"{timestamp_path}/{table}.parquet"
-            write_parquet_to_s3(df, transformed_bucket, s3_key)
-            dim_tables[table] = s3_key
-            logger.info(f"Written {table} to {s3_key}")
-
-        return {
+        output = {
             "status_code": 200,
             "fact_tables": fact_tables,
             "dim_tables": dim_tables
             }
+        if df_dim_date is not None:
+            # saved by the load lambda once dim_date is loaded, see DimDateState
+            output["dim_date_covered"] = [str(date)[:10] for date in dim_date_covered]
+        return output
     except KeyError as ke:
         logging.error(f"missing key in event: {ke}")
         return {"status_code": 400, "body": f"Missing table information: {ke}"}
@@ -100,86 +188,197 @@ def lambda_handler(event,context):
         logging.error(f"writing to transformed bucket failed: {e}")
         return {"statusCode": 500, "body": f"Transform run failed: {e}"}
 
-def run_dim_utils(event, ingestion_bucket):
-    """runs dim utils for each of the passed dim_tables from the event. returns transformed dataframes"""
+def write_table(df, s3_key):
+    """writes a transformed table to s3_key in the transformed bucket, as a dataset partitioned by
+    created_date if the key ends in '/'. the writers report failure in their return value, so it is
+    raised here: a table that was not written fails the run before any state is saved"""
+    if s3_key.endswith('/'):
+        result = write_partitioned_parquet_to_s3(df, transformed_bucket, s3_key, profile=parquet_profile)
+    else:
+        result = write_parquet_to_s3(df, transformed_bucket, s3_key, profile=parquet_profile)
+    if "successfully uploaded" not in result:
+        raise Exception(f"Failed to write {s3_key}: {result}")
+    return result
+
+def run_dim_utils(event, ingestion_bucket, dim_cache=None, cached_dim_tables=None, join_snapshots=None):
+    """runs dim utils for each of the passed dim_tables from the event. returns transformed dataframes
+
+    source tables are read from S3 concurrently, then the dim utils whose sources were all
+    read are run concurrently, one per vCPU.
+
+    when a DimCache is passed, a dim whose source objects all have the same ETags as when it
+    was last built is not read or transformed again; its previous parquet key is put in
+    cached_dim_tables instead.
+
+    when a JoinSnapshots is passed, dim_staff and dim_counterparty are built by it from whichever of
+    their source tables are in the event, and are left out of the result when no rows change. the
+    event's full_tables lists the source tables extracted in full, which they can be rebuilt from."""
     table_relations = {'fact_sales_order': ['sales_order'],
                 'dim_staff': ['staff','department'],
                 'dim_counterparty': ['counterparty', 'address'],
                 'dim_currency': ['currency'],
-                'dim_date': [],
                 'dim_design': ['design'],
                 'dim_location': ['address'],
                 'dim_payment_type': ['payment_type'],
                 'dim_transaction': ['transaction']}
     
-    transformed_dfs = {} 
-    dfs = {}
+    utils = TRANSFORM_UTILS[transform_engine]
+    dim_utils = {'dim_staff': lambda: utils['dim_staff'](dfs['staff'], dfs['department']),
+                'dim_counterparty': lambda: utils['dim_counterparty'](dfs['counterparty'], dfs['address']),
+                'dim_currency': lambda: utils['dim_currency'](dfs['currency']),
+                'dim_location': lambda: utils['dim_location'](dfs['address']),
+                'dim_design': lambda: utils['dim_design'](dfs['design']),
+                'dim_payment_type': lambda: utils['dim_payment_type'](dfs['payment_type']),
+                'dim_transaction': lambda: utils['dim_transaction'](dfs['transaction'])}
     
-    for table in event["dim_tables"]:
-        try:
-            dfs[table] = read_csv_from_s3(ingestion_bucket, event["dim_tables"][table])
-        except Exception as e:
-            logger.error(f"Failed to read {table} from S3: {e}")
-            continue  
-
-    transformed_dfs['dim_date'] = util_dim_date('2022-01-01', '2025-12-31')
-    for dim_table, required_tables in table_relations.items():
-        try:
-            if all(tbl in dfs for tbl in required_tables):
-                if dim_table == 'dim_staff':
-                    transformed_dfs[dim_table] = util_dim_staff(dfs['staff'], dfs['department'])
-                elif dim_table == 'dim_counterparty':
-                    transformed_dfs[dim_table] = util_dim_counterparty(dfs['counterparty'], dfs['address'])
-                elif dim_table == 'dim_currency':
-                    transformed_dfs[dim_table] = util_dim_currency(dfs['currency'])
-                elif dim_table == 'dim_location':
-                    transformed_dfs[dim_table] = util_dim_location(dfs['address'])
-                elif dim_table == 'dim_design':
-                    transformed_dfs[dim_table] = util_dim_design(dfs['design'])
-                elif dim_table == 'dim_payment_type':
-                    transformed_dfs[dim_table] = util_dim_payment_type(dfs['payment_type'])
-                elif dim_table == 'dim_transaction':
-                    transformed_dfs[dim_table] = util_dim_transaction(dfs['transaction'])
-
-                logger.info(f"successfully transformed {dim_table}")
-            # else:
-            #     logger.info(f"could not construct {dim_table}. Missing one of {required_tables}")
-        except Exception as e:
-                logger.error(f"Error processing {dim_table}: {e}")
+    incremental = set(JOINED_DIMS) if join_snapshots is not None else set()
+    for dim_table in incremental:
+        parent, child = JOINED_DIMS[dim_table]['parent'], JOINED_DIMS[dim_table]['child']
+        dim_utils[dim_table] = (lambda dim_table=dim_table, parent=parent, child=child: join_snapshots.build(
+            dim_table, TRANSFORM_UTILS['pandas'][dim_table], as_dataframe(dfs.get(parent)), as_dataframe(dfs.get(child)),
+            complete=event.get("full_tables", ())))
+
+    buildable = [dim_table for dim_table in dim_utils
+                 if all(tbl in event["dim_tables"] for tbl in table_relations[dim_table])
+                 or (dim_table in incremental and any(tbl in event["dim_tables"] for tbl in table_relations[dim_table]))]
+    if dim_cache is not None:
+        versions = dim_cache.input_versions(ingestion_bucket, event["dim_tables"])
+        for dim_table in [dim_table for dim_table in buildable if dim_table not in incremental]:
+            cached_key = dim_cache.check(dim_table, {tbl: versions[tbl] for tbl in table_relations[dim_table]})
+            if cached_key:
+                logger.info(f"{dim_table} inputs unchanged, reusing {cached_key}")
+                cached_dim_tables[dim_table] = cached_key
+                buildable.remove(dim_table)
+
+    needed = {tbl for dim_table in buildable for tbl in table_relations[dim_table]}
+    dfs = read_tables_concurrently({table: key for table, key in event["dim_tables"].items() if table in needed}, ingestion_bucket)
+
+    tasks = {dim_table: dim_utils[dim_table] for dim_table in buildable
+             if all(tbl in dfs for tbl in table_relations[dim_table] if tbl in event["dim_tables"])}
+    transformed_dfs, errors = run_concurrently(tasks, max_workers=transform_max_workers)
+    for dim_table in [dim_table for dim_table, df in transformed_dfs.items() if df is None]:
+        logger.info(f"no changed rows for {dim_table}")
+        del transformed_dfs[dim_table]
+    for dim_table in transformed_dfs:
+        logger.info(f"successfully transformed {dim_table}")
+    for dim_table, e in errors.items():
+        logger.error(f"Error processing {dim_table}: {e}")
 
     return transformed_dfs
 
-def run_fact_utils(event, ingestion_bucket):
-    """runs transformation utils on fact-to-be-tables (e.g sales_order --> fact_sales_order)"""
+def as_dataframe(table):
+    """returns table as a pandas dataframe: an empty one for None, or a converted pyarrow Table"""
+    if table is None:
+        return pd.DataFrame()
+    if isinstance(table, pa.Table):
+        return table.to_pandas()
+    return table
+
+def run_dim_date(fact_table_dfs, dim_date_state, extra_bounds=()):
+    """builds the dim_date rows that are not in the warehouse yet. returns (dataframe or None, covered range)
+
+    dim_date covers every day from 2022 to the end of the current year, extended to include every
+    *_date in the transformed fact tables (and in extra_bounds, the (earliest, latest) dates of facts
+    that were streamed rather than held in memory). the range already loaded is kept by dim_date_state, so
+    rows are only built (and written and loaded) when that range has to grow, or was not loaded yet."""
+    start, end = pd.Timestamp(DEFAULT_START), pd.Timestamp(datetime.now(UTC).date())
+    fact_dates = date_bounds(df for df in fact_table_dfs.values() if isinstance(df, (pd.DataFrame, pa.Table)))
+    for bounds in ([fact_dates] if fact_dates else []) + list(extra_bounds):
+        start, end = min(start, bounds[0]), max(end, bounds[1])
+
+    df_dim_date, covered = extend_dim_date(dim_date_state.load(), start, end)
+    if df_dim_date is None:
+        logger.info(f"dim_date already covers {start.date()} to {end.date()}")
+    else:
+        logger.info(f"successfully transformed dim_date, {len(df_dim_date)} new dates")
+    return df_dim_date, covered
+
+def run_fact_utils(event, ingestion_bucket, timestamp_path=None, streamed_fact_tables=None):
+    """runs transformation utils on fact-to-be-tables (e.g sales_order --> fact_sales_order)
+
+    when streamed_fact_tables is passed, extracts of at least FACT_STREAM_MIN_BYTES that can be
+    streamed (CSV with a schema sidecar) are not read whole. each is transformed batch by batch
+    and written straight to {timestamp_path}/fact_<table>.parquet by stream_fact_table, and its
+    summary is put in streamed_fact_tables instead of being returned."""
     
-    transformed_dfs = {} 
-    dfs = {}
+    utils = TRANSFORM_UTILS[transform_engine]
+    fact_utils = {'sales_order': utils['fact_sales_order'],
+                  'purchase_order': utils['fact_purchase_order'],
+                  'payment': utils['fact_payment']}
 
     for table in event['fact_tables']:
-        try:
-            if event['fact_tables'][table]:
-                dfs[table] = read_csv_from_s3(ingestion_bucket, event['fact_tables'][table])
-            else:
-                logger.info(f"No passed csv file for {table}")
-        except Exception as e:
-            logger.error(f"Failed to read {table} from S3: {e}")
-            continue  
-
-    for df in dfs:
-        try:
-            if df == 'sales_order':
-                transformed_dfs[f'fact_{df}'] = util_fact_sales_order(dfs['sales_order'])
-            elif df == 'purchase_order':
-                transformed_dfs[f'fact_{df}'] = util_fact_purchase_order(dfs['purchase_order'])
-            elif df == 'payment':
-                transformed_dfs[f'fact_{df}'] =  util_fact_payment(dfs['payment'])
-            logger.info(f"successfully transformed {df}")
-
-        except Exception as e:
-            logger.error(f"Error processing {df}: {e}")
+        if not event['fact_tables'][table]:
+            logger.info(f"No passed csv file for {table}")
+    keys = {table: key for table, key in event['fact_tables'].items() if key}
+
+    stream_tasks = {}
+    if streamed_fact_tables is not None:
+        for table in [table for table in keys if table in fact_utils]:
+            try:
+                if extract_size(ingestion_bucket, keys[table]) < fact_stream_min_bytes:
+                    continue
+            except Exception:
+                continue  # reading it whole reports the error
+            batches = read_csv_batches_from_s3(ingestion_bucket, keys[table], source_columns(table))
+            if batches is None:
+                logger.info(f"{table} extract has no schema sidecar, reading it whole")
+                continue
+            s3_key = f"{timestamp_path}/fact_{table}.parquet"
+            stream_tasks[f'fact_{table}'] = (lambda batches=batches, util=fact_utils[table], s3_key=s3_key:
+                                             stream_fact_table(util, batches, s3_key))
+            del keys[table]
+
+    dfs = read_tables_concurrently(keys, ingestion_bucket)
+
+    tasks = {f'fact_{table}': (lambda df=df, util=fact_utils[table]: util(df))
+             for table, df in dfs.items() if table in fact_utils}
+    transformed_dfs, errors = run_concurrently({**tasks, **stream_tasks}, max_workers=transform_max_workers)
+    for fact_table in stream_tasks:
+        if fact_table in transformed_dfs:
+            streamed_fact_tables[fact_table] = transformed_dfs.pop(fact_table)
+    for fact_table in transformed_dfs:
+        logger.info(f"successfully transformed {fact_table[len('fact_'):]}")
+    for fact_table, e in errors.items():
+        logger.error(f"Error processing {fact_table[len('fact_'):]}: {e}")
 
     return transformed_dfs
 
+def stream_fact_table(util, batches, s3_key):
+    """transforms record batches with util and streams them to s3_key in the transformed bucket as
+    parquet row groups, through a multipart upload. nothing is written if there are no rows.
+    returns the summary from transform_batches_to_parquet with the key added"""
+    writer = S3MultipartWriter(s3_client, transformed_bucket, s3_key)
+    try:
+        summary = transform_batches_to_parquet(util, batches, writer, as_arrow=transform_engine == "arrow",
+                                               profile=parquet_profile)
+    except Exception:
+        writer.abort()
+        raise
+    if summary["rows"]:
+        writer.close()
+        logger.info(f"Streamed {summary['rows']} rows to {s3_key}")
+    else:
+        writer.abort()
+    return {**summary, "key": s3_key}
+
+def extract_size(ingestion_bucket, key):
+    """size in bytes of an extract, or of all its parts for a key ending in '/'"""
+    if not key.endswith('/'):
+        return s3_client.head_object(Bucket=ingestion_bucket, Key=key)['ContentLength']
+    paginator = s3_client.get_paginator('list_objects_v2')
+    return sum(obj['Size'] for page in paginator.paginate(Bucket=ingestion_bucket, Prefix=key)
+               for obj in page.get('Contents', []))
+
+def read_tables_concurrently(keys, ingestion_bucket):
+    """reads each source table in keys ({table: s3 key}) from the ingestion bucket at the same time.
+    returns {table: dataframe}, leaving out tables that could not be read"""
+    reads = {table: (lambda table=table, key=key: read_table_from_s3(ingestion_bucket, key, source_columns(table), as_arrow=transform_engine == "arrow"))
+             for table, key in keys.items()}
+    dfs, errors = run_concurrently(reads, max_workers=s3_max_workers)
+    for table, e in errors.items():
+        logger.error(f"Failed to read {table} from S3: {e}")
+    return dfs
+
 
 # event =     {
 #   "status_code": 200,
@@ -0,0 +1,161 @@
+import io
+import os
+import queue
+import threading
+from typing import Iterable, Iterator
+
+import boto3
+from botocore.exceptions import ClientError
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Parquet files at least this large are read with ranged GETs, one row group at a time;
+# smaller ones are downloaded in a single request.
+RANGE_READ_MIN_BYTES = int(os.environ.get("LOAD_RANGE_READ_MIN_BYTES", str(64 * 1024 * 1024)))
+
+
+class S3RangeReader(io.RawIOBase):
+    """A seekable, read-only file over an S3 object, read with ranged GETs.
+
+    Only the bytes asked for are downloaded, so a parquet reader given this
+    file fetches the footer and then the column chunks of each row group it
+    reads, never the whole object.
+
+    Args:
+        s3_client (boto3.client): Boto3 S3 client.
+        bucket (str): Bucket of the object.
+        key (str): Key of the object.
+        size (int): Size of the object in bytes.
+    """
+
+    def __init__(self, s3_client: boto3.client, bucket: str, key: str, size: int) -> None:
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.size = size
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self._position = max(0, min(offset, self.size))
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        end = min(self._position + len(buffer), self.size)
+        if end <= self._position:
+            return 0
+        response = self.s3_client.get_object(
+            Bucket=self.bucket, Key=self.key, Range=f"bytes={self._position}-{end - 1}"
+        )
+        data = response["Body"].read()
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+def open_parquet_file(s3_client: boto3.client, bucket_name: str, s3_key: str, range_read_min_bytes: int = None) -> pq.ParquetFile:
+    """Opens a parquet file in S3 for reading row group by row group.
+
+    The size of the file is read with head_object. A file smaller than
+    range_read_min_bytes is then downloaded once and read in place through a
+    pyarrow buffer, without copying it again. A larger one is read through an
+    S3RangeReader, the reads for each row group being coalesced into as few
+    requests as possible, and is never requested whole.
+
+    Args:
+        s3_client (boto3.client): Boto3 S3 client.
+        bucket_name (str): Bucket of the file.
+        s3_key (str): Key of the file.
+        range_read_min_bytes (int, optional): Defaults to RANGE_READ_MIN_BYTES.
+
+    Returns:
+        pq.ParquetFile: The opened file.
+
+    Raises:
+        ClientError: With code 'NoSuchKey' if the file does not exist.
+    """
+    try:
+        size = s3_client.head_object(Bucket=bucket_name, Key=s3_key)["ContentLength"]
+    except ClientError as e:
+        # head_object has no body to carry an error code, so a missing key comes back as a bare 404.
+        if e.response["Error"]["Code"] == "404":
+            raise ClientError(
+                error_response={"Error": {"Code": "NoSuchKey", "Message": f"File not found in S3: {s3_key}"}},
+                operation_name="HeadObject",
+            ) from e
+        raise
+    if size < (range_read_min_bytes or RANGE_READ_MIN_BYTES):
+        body = s3_client.get_object(Bucket=bucket_name, Key=s3_key)["Body"].read()
+        return pq.ParquetFile(pa.BufferReader(pa.py_buffer(body)))
+    return pq.ParquetFile(S3RangeReader(s3_client, bucket_name, s3_key, size), pre_buffer=True)
+
+
+def iter_row_groups(parquet_file: pq.ParquetFile) -> Iterator[pa.RecordBatch]:
+    """Yields the rows of a parquet file as record batches, one row group at a time.
+
+    A DataFrame index stored as a column by pandas is left out, as
+    pd.read_parquet would make it the index rather than a column.
+    """
+    metadata = parquet_file.schema_arrow.pandas_metadata or {}
+    index_columns = {column for column in metadata.get("index_columns", []) if isinstance(column, str)}
+    columns = [name for name in parquet_file.schema_arrow.names if name not in index_columns]
+    for row_group in range(parquet_file.num_row_groups):
+        yield from parquet_file.read_row_group(row_group, columns=columns).to_batches()
+
+
+def prefetch(iterable: Iterable, depth: int = 1) -> Iterator:
+    """Iterates in a background thread, keeping up to depth items ready ahead of the consumer.
+
+    Reading the next row group from S3 then overlaps with writing the current one,
+    while at most depth + 1 items are held at once. An exception raised while
+    iterating is raised to the consumer; if the consumer stops early, the
+    background thread stops too.
+    """
+    items = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except BaseException as e:
+            put((done, e))
+            return
+        put((done, None))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        stopped.set()
+        thread.join()
@@ -1,19 +1,39 @@
+import numpy as np
 import pandas as pd
 import pg8000
 import pg8000.native
 from pg8000.native import literal
-from typing import Dict
+from typing import Dict, Iterator
 import boto3
 from datetime import datetime
 import logging
 from botocore.exceptions import ClientError
 from pandas.errors import ParserError
 import os
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 import pyarrow.lib
 from io import BytesIO
+from itertools import chain
+from .parquet_stream import open_parquet_file, iter_row_groups, prefetch
+
+# How DataFrames are written to the warehouse: "insert" sends one INSERT ... VALUES
+# statement per table, "copy" streams the rows with COPY FROM STDIN.
+LOAD_ENGINE = os.environ.get("LOAD_ENGINE", "insert").lower()
+# Rows encoded into each CSV chunk sent to COPY, bounding the memory the encoder uses.
+COPY_CHUNK_ROWS = int(os.environ.get("COPY_CHUNK_ROWS", "10000"))
+# Most rows, and bytes of rendered values, in each statement the "insert" engine sends.
+INSERT_BATCH_ROWS = int(os.environ.get("INSERT_BATCH_ROWS", "10000"))
+INSERT_BATCH_BYTES = int(os.environ.get("INSERT_BATCH_BYTES", str(16 * 1024 * 1024)))
+# When true, tables are streamed from S3 to the warehouse one parquet row group at a
+# time (see load_table_in_row_groups) instead of being read into a DataFrame whole.
+STREAM_ROW_GROUPS = os.environ.get("LOAD_STREAM_ROW_GROUPS", "false").lower() == "true"
 
 def write_dataframe_to_db(
-    dataframe: pd.DataFrame, conn: pg8000.native.Connection, table_name: str, insert_mode: bool = True
+    dataframe: pd.DataFrame, conn: pg8000.native.Connection, table_name: str, insert_mode: bool = True,
+    engine: str = None
 ) -> bool:
     """Writes data from a Pandas DataFrame into a PostgreSQL table, with options for insert or replace.
 
@@ -26,6 +46,9 @@ def write_dataframe_to_db(
         conn (pg8000.Connection): Database connection.
         table_name (str): Table name.
         insert_mode (bool, optional): True for insert mode, False for replace mode. Defaults to True.
+        engine (str, optional): "insert" to send INSERT statements of at most INSERT_BATCH_ROWS rows
+            and INSERT_BATCH_BYTES bytes (see construct_sql_batches), or "copy" to stream
+            the rows with COPY FROM STDIN (see copy_dataframe_to_db). Defaults to LOAD_ENGINE.
 
     Returns:
         bool: True if write operation successful.
@@ -44,10 +67,29 @@ def write_dataframe_to_db(
         raise ValueError("DataFrame cannot be empty")
     if not table_name:
         raise ValueError("table_name cannot be empty")
+    engine = engine or LOAD_ENGINE
+    if engine not in ("insert", "copy"):
+        raise ValueError(f"Unknown load engine '{engine}', expected 'insert' or 'copy'")
 
     try:
-        sql = construct_sql(dataframe=dataframe, table_name=table_name, upsert=not insert_mode)
-        conn.run(sql=sql)
+        if engine == "copy":
+            copy_dataframe_to_db(dataframe, conn, table_name, upsert=not insert_mode)
+            return True
+        statements = construct_sql_batches(dataframe=dataframe, table_name=table_name, upsert=not insert_mode)
+        first = next(statements)
+        second = next(statements, None)
+        if second is None:
+            conn.run(sql=first)
+            return True
+        # Several statements are sent in one transaction, so a table is loaded whole or not at all.
+        conn.run("START TRANSACTION")
+        try:
+            for sql in (first, second, *statements):
+                conn.run(sql=sql)
+            conn.run("COMMIT")
+        except Exception:
+            conn.run("ROLLBACK")
+            raise
         return True
     except pg8000.Error as db_error:
         raise pg8000.Error(str(db_error)) from db_error
@@ -55,22 +97,24 @@ def write_dataframe_to_db(
         raise Exception(str(e))
     
 
-def process_tables(tables: Dict[str, str], s3_client: boto3.client, db_conn: pg8000.native.Connection, is_fact: bool = True) -> None:
+def process_tables(tables: Dict[str, str], s3_client: boto3.client, db_conn: pg8000.native.Connection, is_fact: bool = True, pool=None) -> None:
     """Processes tables by loading data from S3 and inserting into the data warehouse.
 
     For each fact table, this function reads the corresponding parquet file from S3
     using the provided S3 key and inserts the data into the specified table in the
-    data warehouse.
+    data warehouse. Given a pool, the tables are loaded concurrently instead (see
+    load_tables_concurrently).
 
     Args:
         tables (Dict[str, str]): Dictionary of fact table names and their S3 keys.
                                        Example: {"sales_order": "path/sales_order.parquet", ...}
         s3_client (boto3.client): Boto3 S3 client.
-        db_conn (pg8000.Connection): Database connection.
+        db_conn (pg8000.Connection): Database connection. Not used when a pool is given.
+        pool (ConnectionPool, optional): Pool of warehouse connections, each table being
+            written on a connection borrowed from it.
 
     Raises:
         TypeError: If fact_tables is not a dictionary, s3_client is not boto3 client, or db_conn is not pg8000 Connection.
-        ValueError: If fact_tables is empty.
         Exception: If any error occurs during S3 read or database write operations.
     """
     if not isinstance(tables, dict):
@@ -78,72 +122,308 @@ def process_tables(tables: Dict[str, str], s3_client: boto3.client, db_conn: pg8
 
     if not tables:
         if not is_fact:
-            raise ValueError("dim_tables cannot be empty")
+            logging.info("dim_tables is empty, there is no update")
         else:
             logging.info("fact_tables is empty, there is no update")
+    elif pool is not None:
+        load_tables_concurrently(tables, s3_client, pool, is_fact)
     else:
         for table_name, s3_key in tables.items():
             try:
+                if STREAM_ROW_GROUPS:
+                    load_table_in_row_groups(s3_client, s3_key, db_conn, table_name, is_fact)
+                    continue
                 df = read_parquet_from_s3(s3_client, s3_key)
                 write_dataframe_to_db(df, db_conn, table_name, insert_mode=is_fact)
             except Exception as e:
                 raise Exception(f"Error processing table '{table_name}': {str(e)}") from e
 
+def load_tables_concurrently(tables: Dict[str, str], s3_client: boto3.client, pool, is_fact: bool = True) -> None:
+    """Loads tables that do not depend on each other at the same time.
+
+    Each table is downloaded, then written on a connection borrowed from the pool, so
+    at most pool.max_size tables are written at once. One more worker than there are
+    connections keeps the next table downloading while the others are written. With
+    STREAM_ROW_GROUPS, each table is instead streamed on its connection by
+    load_table_in_row_groups, which overlaps downloading with writing row group by row group.
+
+    Args:
+        tables (Dict[str, str]): Table names and their S3 keys, as for process_tables.
+        s3_client (boto3.client): Boto3 S3 client.
+        pool (ConnectionPool): Pool of warehouse connections.
+        is_fact (bool, optional): Insert (True) or upsert (False) the rows. Defaults to True.
+
+    Raises:
+        Exception: For the first table, in the order given, that failed to load, once
+            every table has finished.
+    """
+    def load(table_name, s3_key):
+        if STREAM_ROW_GROUPS:
+            with pool.acquire() as conn:
+                load_table_in_row_groups(s3_client, s3_key, conn, table_name, is_fact)
+            return
+        df = read_parquet_from_s3(s3_client, s3_key)
+        with pool.acquire() as conn:
+            write_dataframe_to_db(df, conn, table_name, insert_mode=is_fact)
+
+    with ThreadPoolExecutor(max_workers=pool.max_size + 1) as executor:
+        futures = {table_name: executor.submit(load, table_name, s3_key) for table_name, s3_key in tables.items()}
+    for table_name, future in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            raise Exception(f"Error processing table '{table_name}': {str(e)}") from e
+
 def construct_sql(dataframe: pd.DataFrame, table_name: str, upsert: bool = True) -> str:
     """Constructs an SQL INSERT or UPSERT statement from a Pandas DataFrame.
 
     This function generates an SQL query string to insert data from a DataFrame
     into a specified table. It supports both regular INSERT and UPSERT (ON CONFLICT)
-    statements based on the 'upsert' parameter.
+    statements based on the 'upsert' parameter. Values are rendered column by
+    column (see render_rows). For large tables use construct_sql_batches, which
+    bounds the size of each statement.
 
     Args:
         dataframe (pd.DataFrame): The DataFrame containing the data to be inserted.
             Columns of the DataFrame should correspond to the table columns.
         table_name (str): The name of the SQL table to insert data into.
-        upsert (bool, optional):  If True, generates an UPSERT statement
-            (ON CONFLICT DO UPDATE). If False, generates a regular INSERT statement.
-            Defaults to True.
+        upsert (bool, optional):  If True, generates an UPSERT statement that updates
+            only rows whose values changed (see conflict_clause). If False, generates a
+            regular INSERT statement. Defaults to True.
 
     Returns:
         str: The generated SQL query string.
     """
-    columns = dataframe.columns
-    formatted_columns = ', '.join([f'"{col}"' if ' ' in col or '-' in col or '.' in col else col for col in columns])
-    values_clause = []
-    for _, row in dataframe.iterrows():
-        value_list = []
-        for value in row:
-            if pd.isna(value):
-                value_list.append('NULL')
-            elif isinstance(value, str):
-                value_list.append(literal(value))
-            elif isinstance(value, bool):
-                value_list.append(str(value).upper())
-            elif isinstance(value, datetime):
-                value_list.append(literal(value.strftime("%Y-%m-%d")))
-            else:
-                value_list.append(literal(value))
-        values_clause.append(f"({', '.join(value_list)})")
+    values_clause = render_rows(dataframe)
 
     if not values_clause:
         values_str = "()"
     else:
         values_str = ', '.join(values_clause)
+    return insert_statement(dataframe.columns, table_name, values_str, upsert)
+
+def construct_sql_batches(
+    dataframe: pd.DataFrame, table_name: str, upsert: bool = True, max_rows: int = None, max_bytes: int = None
+) -> Iterator[str]:
+    """Constructs the statements of construct_sql in batches of bounded size.
 
+    Rows are rendered max_rows at a time and packed into statements of at most
+    max_rows rows and about max_bytes bytes of values (a single row larger than
+    max_bytes gets a statement of its own), so no statement or rendered batch
+    grows with the size of the table.
+
+    Args:
+        dataframe (pd.DataFrame): The DataFrame containing the data to be inserted.
+        table_name (str): The name of the SQL table to insert data into.
+        upsert (bool, optional): As for construct_sql. Defaults to True.
+        max_rows (int, optional): Rows per statement. Defaults to INSERT_BATCH_ROWS.
+        max_bytes (int, optional): Bytes of values per statement. Defaults to INSERT_BATCH_BYTES.
+
+    Yields:
+        str: One INSERT or UPSERT statement per batch. Nothing for an empty DataFrame.
+    """
+    max_rows = max_rows or INSERT_BATCH_ROWS
+    max_bytes = max_bytes or INSERT_BATCH_BYTES
+    for start in range(0, len(dataframe), max_rows):
+        batch, batch_bytes = [], 0
+        for row in render_rows(dataframe.iloc[start:start + max_rows]):
+            if batch and batch_bytes + len(row) + 2 > max_bytes:
+                yield insert_statement(dataframe.columns, table_name, ', '.join(batch), upsert)
+                batch, batch_bytes = [], 0
+            batch.append(row)
+            batch_bytes += len(row) + 2
+        if batch:
+            yield insert_statement(dataframe.columns, table_name, ', '.join(batch), upsert)
+
+def insert_statement(columns, table_name: str, values_str: str, upsert: bool) -> str:
+    formatted_columns = format_columns(columns)
     if upsert:
-        set_clause = ', '.join([f"{col}=excluded.{col}" for col in columns[1:]])
-        sql_statement = f"INSERT INTO {table_name} ({formatted_columns}) VALUES {values_str}\nON CONFLICT ({columns[0]}) DO UPDATE SET {set_clause};"
+        sql_statement = f"INSERT INTO {table_name} ({formatted_columns}) VALUES {values_str}\n{conflict_clause(columns, table_name)};"
     else:
         sql_statement = f"INSERT INTO {table_name} ({formatted_columns}) VALUES {values_str};"
     return sql_statement
 
+def render_rows(dataframe: pd.DataFrame) -> list:
+    """Renders each row of a DataFrame as an SQL values tuple, e.g. "(1, 'a', NULL)".
+
+    Each column is rendered as a whole by the renderer for its type (see
+    COLUMN_RENDERERS): NULL for missing values, quoted and escaped strings, TRUE or
+    FALSE, numbers as they are and datetimes as quoted dates. Columns holding
+    values of mixed types fall back to render_value for each value.
+    """
+    if dataframe.empty:
+        return []
+    columns = [render_column(dataframe.iloc[:, position]) for position in range(dataframe.shape[1])]
+    return [f"({', '.join(values)})" for values in zip(*columns)]
+
+def render_column(column: pd.Series) -> list:
+    nulls = column.isna().to_numpy(dtype=bool)
+    rendered = np.full(len(column), 'NULL', dtype=object)
+    if not nulls.all():
+        present = column[~nulls]
+        rendered[~nulls] = COLUMN_RENDERERS.get(column_kind(column), _render_values)(present)
+    return rendered.tolist()
+
+def column_kind(column: pd.Series) -> str:
+    """The renderer for a column: its dtype's kind, or for object and string
+    columns the type pandas infers from their values."""
+    if pd.api.types.is_bool_dtype(column.dtype):
+        return "boolean"
+    if pd.api.types.is_integer_dtype(column.dtype):
+        return "integer"
+    if pd.api.types.is_float_dtype(column.dtype):
+        return "floating"
+    if pd.api.types.is_datetime64_any_dtype(column.dtype):
+        return "datetime"
+    return pd.api.types.infer_dtype(column, skipna=True)
+
+def render_value(value) -> str:
+    """Renders a single value as an SQL literal."""
+    if pd.isna(value):
+        return 'NULL'
+    elif isinstance(value, str):
+        return literal(value)
+    elif isinstance(value, bool):
+        return str(value).upper()
+    elif isinstance(value, datetime):
+        return literal(value.strftime("%Y-%m-%d"))
+    else:
+        return literal(value)
+
+def _render_values(values: pd.Series) -> list:
+    return [render_value(value) for value in values.tolist()]
+
+def _render_strings(values: pd.Series) -> list:
+    return ("'" + values.astype(str).str.replace("'", "''", regex=False) + "'").tolist()
+
+def _render_booleans(values: pd.Series) -> np.ndarray:
+    return np.where(values.to_numpy(dtype=bool), 'TRUE', 'FALSE')
+
+def _render_numbers(values: pd.Series) -> list:
+    return list(map(str, values.tolist()))
+
+def _render_isoformat(values: pd.Series) -> list:
+    # As literal() renders dates and times, str(value) quoted; their text never holds a quote.
+    if not isinstance(values.dtype, pd.ArrowDtype):
+        return ("'" + values.astype(str) + "'").tolist()
+    array = pa.array(values)
+    text = array.cast(pa.string())
+    if pa.types.is_time(array.type):
+        # str() of a time leaves out zero microseconds.
+        text = pc.replace_substring_regex(text, r"\.0+$", "")
+    return pc.binary_join_element_wise("'", text, "'", "").to_pylist()
+
+def _render_datetimes(values: pd.Series) -> list:
+    return ("'" + pd.to_datetime(values).dt.strftime("%Y-%m-%d") + "'").tolist()
+
+COLUMN_RENDERERS = {
+    "string": _render_strings,
+    "boolean": _render_booleans,
+    "integer": _render_numbers,
+    "floating": _render_numbers,
+    "datetime": _render_datetimes,
+    "datetime64": _render_datetimes,
+    "date": _render_isoformat,
+    "time": _render_isoformat,
+}
+
+def copy_dataframe_to_db(
+    dataframe: pd.DataFrame, conn: pg8000.native.Connection, table_name: str, upsert: bool = False,
+    chunk_rows: int = None
+) -> None:
+    """Streams a DataFrame into a PostgreSQL table with COPY FROM STDIN.
+
+    Rows are encoded as CSV chunks of chunk_rows rows by encode_csv_chunks and sent as
+    they are encoded, so only one chunk is held in memory besides the DataFrame. With
+    upsert, the rows are copied into a temporary staging table (never WAL-logged) and
+    merged into the table by a single INSERT ... ON CONFLICT, in one transaction. New
+    rows are inserted and only rows whose values differ (IS DISTINCT FROM, so NULLs
+    compare as values) are updated; unchanged rows are left alone, so reloading a whole
+    dimension writes no new row versions for them.
+
+    Args:
+        dataframe (pd.DataFrame): DataFrame to write. Its columns name the table columns.
+        conn (pg8000.Connection): Database connection.
+        table_name (str): Table name.
+        upsert (bool, optional): Update rows whose first column conflicts. Defaults to False.
+        chunk_rows (int, optional): Rows per CSV chunk. Defaults to COPY_CHUNK_ROWS.
+    """
+    chunks = encode_csv_chunks(dataframe, chunk_rows or COPY_CHUNK_ROWS)
+    copy_rows_to_db(chunks, list(dataframe.columns), conn, table_name, upsert)
+
+def copy_rows_to_db(
+    chunks: Iterator[bytes], column_names: list, conn: pg8000.native.Connection, table_name: str, upsert: bool = False
+) -> None:
+    """Sends CSV chunks from encode_csv_chunks to a table with COPY FROM STDIN, as
+    described for copy_dataframe_to_db."""
+    columns = format_columns(column_names)
+    if not upsert:
+        conn.run(f"COPY {table_name} ({columns}) FROM STDIN WITH (FORMAT csv)", stream=chunks)
+        return
+
+    staging_table = f"staging_{table_name}"
+    conn.run("START TRANSACTION")
+    try:
+        conn.run(
+            f"CREATE TEMPORARY TABLE {staging_table} ON COMMIT DROP AS "
+            f"SELECT {columns} FROM {table_name} WITH NO DATA"
+        )
+        conn.run(f"COPY {staging_table} ({columns}) FROM STDIN WITH (FORMAT csv)", stream=chunks)
+        conn.run(
+            f"INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {staging_table}\n"
+            f"{conflict_clause(column_names, table_name)}"
+        )
+        logging.info(f"{table_name}: {conn.row_count} rows inserted or changed")
+        conn.run("COMMIT")
+    except Exception:
+        conn.run("ROLLBACK")
+        raise
+
+def encode_csv_chunks(dataframe, chunk_rows: int) -> Iterator[bytes]:
+    """Encodes a DataFrame, or a pyarrow RecordBatch or Table, as headerless CSV for COPY,
+    chunk_rows rows at a time.
+
+    Strings are always quoted and nulls are left empty and unquoted, which is how
+    PostgreSQL's CSV format tells an empty string from NULL.
+    """
+    write_options = pacsv.WriteOptions(include_header=False)
+    for start in range(0, len(dataframe), chunk_rows):
+        if isinstance(dataframe, (pa.RecordBatch, pa.Table)):
+            chunk = dataframe.slice(start, chunk_rows)
+        else:
+            chunk = pa.Table.from_pandas(dataframe.iloc[start:start + chunk_rows], preserve_index=False)
+        buffer = pa.BufferOutputStream()
+        pacsv.write_csv(chunk, buffer, write_options)
+        yield buffer.getvalue().to_pybytes()
+
+def conflict_clause(column_names, table_name: str) -> str:
+    """Builds the ON CONFLICT clause of an upsert keyed on the first column. A conflicting
+    row is updated only when its other columns differ (IS DISTINCT FROM, so NULLs compare
+    equal), and is left alone when the key is the only column."""
+    first, *others = [format_columns([col]) for col in column_names]
+    if not others:
+        return f"ON CONFLICT ({first}) DO NOTHING"
+    set_clause = ', '.join([f"{col}=excluded.{col}" for col in others])
+    current = ', '.join([f"{table_name}.{col}" for col in others])
+    received = ', '.join([f"excluded.{col}" for col in others])
+    return f"ON CONFLICT ({first}) DO UPDATE SET {set_clause}\nWHERE ({current}) IS DISTINCT FROM ({received})"
+
+def format_columns(columns) -> str:
+    """Joins column names for SQL, quoting those containing a space, '-' or '.'."""
+    return ', '.join([f'"{col}"' if ' ' in col or '-' in col or '.' in col else col for col in columns])
+
 def read_parquet_from_s3(s3_client: boto3.client, s3_key: str) -> pd.DataFrame:
     """Reads Parquet file from S3 to Pandas DataFrame.
     Bucket name is expected to be in environment variable 'BUCKET_NAME'.
 
+    A key ending in '/' is read as a partitioned dataset: every parquet file
+    under the prefix (e.g. 'path/fact_sales_order/year=2022/month=11/day=03/
+    part-00000.parquet') is read, in key order, into one DataFrame.
+
     Args:
         s3_client (boto3.client): Boto3 S3 client.
-        s3_key (str): S3 key of the Parquet file (e.g., 'path/file.parquet').
+        s3_key (str): S3 key of the Parquet file (e.g., 'path/file.parquet'),
+                      or prefix of a partitioned dataset (e.g., 'path/fact_sales_order/').
                       Do not include the bucket name here.
 
     Returns:
@@ -178,6 +458,8 @@ def read_parquet_from_s3(s3_client: boto3.client, s3_key: str) -> pd.DataFrame:
         raise ValueError("BUCKET_NAME environment variable not set")
 
     try:
+        if s3_key.endswith("/"):
+            return read_parquet_dataset(s3_client, bucket_name, s3_key)
         response = s3_client.get_object(Bucket=bucket_name, Key=s3_key)
         parquet_file = response["Body"]
         df = pd.read_parquet(BytesIO(parquet_file.read()))
@@ -204,4 +486,132 @@ def read_parquet_from_s3(s3_client: boto3.client, s3_key: str) -> pd.DataFrame:
     except (ParserError, pyarrow.lib.ArrowInvalid) as e:
         raise ParserError(
             "Failed to parse Parquet file. File might be corrupted."
-        ) from e
\ No newline at end of file
+        ) from e
+
+def read_parquet_dataset(s3_client: boto3.client, bucket_name: str, prefix: str) -> pd.DataFrame:
+    """Reads every parquet file under an S3 prefix into one Pandas DataFrame.
+
+    Raises:
+        ClientError: With code 'NoSuchKey' if there are no parquet files under the prefix.
+    """
+    keys = list_parquet_keys(s3_client, bucket_name, prefix)
+    dfs = [pd.read_parquet(BytesIO(s3_client.get_object(Bucket=bucket_name, Key=key)["Body"].read())) for key in keys]
+    return pd.concat(dfs, ignore_index=True)
+
+def list_parquet_keys(s3_client: boto3.client, bucket_name: str, prefix: str) -> list:
+    """Lists the parquet files under an S3 prefix, in key order.
+
+    Raises:
+        ClientError: With code 'NoSuchKey' if there are no parquet files under the prefix.
+    """
+    paginator = s3_client.get_paginator("list_objects_v2")
+    keys = sorted(
+        obj["Key"]
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix)
+        for obj in page.get("Contents", [])
+        if obj["Key"].endswith(".parquet")
+    )
+    if not keys:
+        raise ClientError(
+            error_response={"Error": {"Code": "NoSuchKey", "Message": f"No parquet files under {prefix}"}},
+            operation_name="ListObjectsV2",
+        )
+    return keys
+
+def read_parquet_batches_from_s3(s3_client: boto3.client, s3_key: str) -> Iterator[pa.RecordBatch]:
+    """Streams a parquet file, or a partitioned dataset under a prefix ending in '/', from S3
+    as pyarrow record batches, one row group at a time.
+    Bucket name is expected to be in environment variable 'BUCKET_NAME'.
+
+    Files are opened with parquet_stream.open_parquet_file: small files are downloaded once and
+    read in place without further copies, large ones with ranged GETs of each row group. Only
+    one row group is decoded at a time, so memory is bounded by the row group size rather than
+    the file size.
+
+    Args:
+        s3_client (boto3.client): Boto3 S3 client.
+        s3_key (str): S3 key of the Parquet file, or prefix of a partitioned dataset.
+
+    Yields:
+        pa.RecordBatch: The rows of each row group, in file and key order.
+
+    Raises:
+        TypeError: If `s3_key` is not a str.
+        ValueError: If `s3_key` is empty or invalid, or if 'BUCKET_NAME' env var is not set.
+        ClientError: For S3 related issues (file not found, access denied).
+        ParserError: If Parquet parsing fails (corrupted file).
+    """
+    if not isinstance(s3_key, str):
+        raise TypeError("s3_key must be a string")
+    if not s3_key:
+        raise ValueError("S3 key cannot be empty")
+    if s3_key.startswith("/"):
+        raise ValueError(
+            "Invalid S3 key format. S3 key should not start with a leading slash."
+        )
+
+    bucket_name = os.environ.get("BUCKET_NAME")
+    if not bucket_name:
+        raise ValueError("BUCKET_NAME environment variable not set")
+
+    keys = list_parquet_keys(s3_client, bucket_name, s3_key) if s3_key.endswith("/") else [s3_key]
+    for key in keys:
+        try:
+            parquet_file = open_parquet_file(s3_client, bucket_name, key)
+            yield from iter_row_groups(parquet_file)
+        except pyarrow.lib.ArrowInvalid as e:
+            raise ParserError(
+                "Failed to parse Parquet file. File might be corrupted."
+            ) from e
+
+def write_batches_to_db(
+    batches, conn: pg8000.native.Connection, table_name: str, insert_mode: bool = True, engine: str = None
+) -> bool:
+    """Writes pyarrow record batches into a PostgreSQL table as one load.
+
+    The "copy" engine encodes each batch straight from arrow and streams every batch through a
+    single COPY (see copy_rows_to_db); the "insert" engine renders each batch with
+    construct_sql_batches and runs the statements in one transaction. Either way only the batch
+    being written is held in memory.
+
+    Args:
+        batches (Iterable[pa.RecordBatch]): Rows to write, e.g. from read_parquet_batches_from_s3.
+        conn (pg8000.Connection): Database connection.
+        table_name (str): Table name.
+        insert_mode (bool, optional): As for write_dataframe_to_db. Defaults to True.
+        engine (str, optional): As for write_dataframe_to_db. Defaults to LOAD_ENGINE.
+
+    Returns:
+        bool: True if write operation successful.
+
+    Raises:
+        ValueError: If there are no rows, or the engine is unknown.
+    """
+    engine = engine or LOAD_ENGINE
+    if engine not in ("insert", "copy"):
+        raise ValueError(f"Unknown load engine '{engine}', expected 'insert' or 'copy'")
+    batches = (batch for batch in batches if batch.num_rows)
+    first = next(batches, None)
+    if first is None:
+        raise ValueError(f"No rows to load into {table_name}")
+    batches = chain([first], batches)
+
+    if engine == "copy":
+        chunks = (chunk for batch in batches for chunk in encode_csv_chunks(batch, COPY_CHUNK_ROWS))
+        copy_rows_to_db(chunks, first.schema.names, conn, table_name, upsert=not insert_mode)
+        return True
+    conn.run("START TRANSACTION")
+    try:
+        for batch in batches:
+            for sql in construct_sql_batches(batch.to_pandas(), table_name, upsert=not insert_mode):
+                conn.run(sql=sql)
+        conn.run("COMMIT")
+    except Exception:
+        conn.run("ROLLBACK")
+        raise
+    return True
+
+def load_table_in_row_groups(s3_client: boto3.client, s3_key: str, conn: pg8000.native.Connection, table_name: str, is_fact: bool = True) -> None:
+    """Streams a table from S3 into the warehouse one row group at a time. The next row group
+    is read from S3 in the background while the current one is written."""
+    write_batches_to_db(prefetch(read_parquet_batches_from_s3(s3_client, s3_key)), conn, table_name, insert_mode=is_fact)
@@ -0,0 +1,84 @@
+"""Source columns each transform util reads, per source table.
+
+The ingestion lambda selects only these columns when extracting a table,
+so columns the transform stage would discard are never read from the
+source database, uploaded to S3 or parsed. Tables without an entry are
+extracted in full. Every list keeps the table's primary key and
+`last_updated`, which ingestion needs for incremental extraction.
+
+When a transform util starts using another source column, add it here.
+"""
+
+SOURCE_COLUMNS = {
+    "address": [
+        "address_id",
+        "address_line_1",
+        "address_line_2",
+        "district",
+        "city",
+        "postal_code",
+        "country",
+        "phone",
+        "created_at",
+        "last_updated",
+    ],
+    "counterparty": ["counterparty_id", "counterparty_legal_name", "legal_address_id", "last_updated"],
+    "currency": ["currency_id", "currency_code", "last_updated"],
+    "department": ["department_id", "department_name", "location", "last_updated"],
+    "design": ["design_id", "design_name", "file_location", "file_name", "last_updated"],
+    "payment_type": ["payment_type_id", "payment_type_name", "last_updated"],
+    "staff": ["staff_id", "first_name", "last_name", "email_address", "department_id", "last_updated"],
+    "transaction": ["transaction_id", "transaction_type", "sales_order_id", "purchase_order_id", "last_updated"],
+    "payment": [
+        "payment_id",
+        "created_at",
+        "last_updated",
+        "transaction_id",
+        "counterparty_id",
+        "payment_amount",
+        "currency_id",
+        "payment_type_id",
+        "paid",
+        "payment_date",
+    ],
+    "purchase_order": [
+        "purchase_order_id",
+        "created_at",
+        "last_updated",
+        "staff_id",
+        "counterparty_id",
+        "item_code",
+        "item_quantity",
+        "item_unit_price",
+        "currency_id",
+        "agreed_delivery_date",
+        "agreed_payment_date",
+        "agreed_delivery_location_id",
+    ],
+    "sales_order": [
+        "sales_order_id",
+        "created_at",
+        "last_updated",
+        "staff_id",
+        "counterparty_id",
+        "units_sold",
+        "unit_price",
+        "currency_id",
+        "design_id",
+        "agreed_payment_date",
+        "agreed_delivery_date",
+        "agreed_delivery_location_id",
+    ],
+}
+
+
+def source_columns(table):
+    """Returns the columns to extract for a source table.
+
+    Args:
+        table (str): Name of the source table.
+
+    Returns:
+        list: Column names, or None if the whole table should be extracted.
+    """
+    return SOURCE_COLUMNS.get(table)
@@ -0,0 +1,153 @@
+import json
+import hashlib
+import botocore
+
+# Bump when a dim util changes its output, so outputs cached by the previous
+# code are not reused.
+CACHE_VERSION = 1
+
+
+class DimCache:
+    """Remembers which inputs each dimension table was last built from.
+
+    The index is a JSON object in the transformed bucket of the form
+    `{"version": 1, "dims": {"dim_staff": {"inputs": {"staff": etag, ...},
+    "key": parquet_key}, ...}}`. An ingested object's ETag is a hash of its
+    contents, so when every input of a dimension has the same ETag as last
+    time the dimension is unchanged and its previous parquet key can be
+    reused, skipping the read, transform and upload.
+
+    Args:
+        s3_client: Boto3 S3 client.
+        bucket (str): Bucket holding the index (the transformed bucket).
+        key (str): Key of the index object.
+    """
+
+    def __init__(self, s3_client, bucket, key='_state/dim_cache.json'):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self._dims = None
+        self._pending = {}
+
+    def load(self):
+        """Reads the index from S3. A missing or outdated index is treated as empty."""
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self.key)
+            index = json.loads(response['Body'].read())
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] != 'NoSuchKey':
+                raise
+            index = {}
+        self._dims = index.get('dims', {}) if index.get('version') == CACHE_VERSION else {}
+        return self._dims
+
+    def input_versions(self, bucket, keys):
+        """Looks up the ETag of every input object.
+
+        Args:
+            bucket (str): Bucket holding the inputs (the ingestion bucket).
+            keys (dict): Source table names mapped to their S3 keys. A key
+                ending in '/' is a prefix of part objects, whose ETags are
+                combined into one version.
+
+        Returns:
+            dict: Source table names mapped to versions, or None where the
+                version could not be read.
+        """
+        versions = {}
+        for table, key in keys.items():
+            try:
+                versions[table] = self._version(bucket, key)
+            except botocore.exceptions.ClientError:
+                versions[table] = None
+        return versions
+
+    def check(self, dim_table, versions):
+        """Returns the cached parquet key for `dim_table` if its inputs are unchanged.
+
+        Args:
+            dim_table (str): Name of the dimension table.
+            versions (dict): Versions of the dimension's inputs, as returned by
+                `input_versions`.
+
+        Returns:
+            str: The previously written parquet key, or None if the dimension
+                has to be rebuilt. In that case `versions` are remembered and
+                stored against the new key by `commit`.
+        """
+        if self._dims is None:
+            self.load()
+        entry = self._dims.get(dim_table)
+        if entry and None not in versions.values() and entry['inputs'] == versions:
+            return entry['key']
+        self._pending[dim_table] = versions
+        return None
+
+    def commit(self, written_keys):
+        """Stores the keys of rebuilt dimensions and saves the index.
+
+        Args:
+            written_keys (dict): Dimension table names mapped to the parquet
+                keys they were written to.
+        """
+        if self._dims is None:
+            self.load()
+        for dim_table, key in written_keys.items():
+            versions = self._pending.pop(dim_table, None)
+            if versions is not None and None not in versions.values():
+                self._dims[dim_table] = {'inputs': versions, 'key': key}
+        body = json.dumps({'version': CACHE_VERSION, 'dims': self._dims}, indent=2, sort_keys=True)
+        self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=body.encode('utf-8'))
+
+    def _version(self, bucket, key):
+        if not key.endswith('/'):
+            return self.s3_client.head_object(Bucket=bucket, Key=key)['ETag']
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        etags = sorted(
+            f"{obj['Key'][len(key):]}:{obj['ETag']}"
+            for page in paginator.paginate(Bucket=bucket, Prefix=key)
+            for obj in page.get('Contents', [])
+        )
+        if not etags:
+            return None
+        return hashlib.md5('\n'.join(etags).encode('utf-8'), usedforsecurity=False).hexdigest()
+
+
+class DimDateState:
+    """Remembers the range of dates dim_date has been loaded into the warehouse for.
+
+    The state is a JSON object in the transformed bucket of the form
+    `{"start": "2022-01-01", "end": "2026-12-31"}`. dim_date depends on no
+    source table, so instead of rebuilding it every run only the dates
+    outside this range are built and emitted. The transform lambda only
+    reads the state; the load lambda saves it once the emitted rows are
+    loaded, so a range that was written but never loaded is emitted again.
+
+    Args:
+        s3_client: Boto3 S3 client.
+        bucket (str): Bucket holding the state (the transformed bucket).
+        key (str): Key of the state object.
+    """
+
+    def __init__(self, s3_client, bucket, key='_state/dim_date.json'):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+
+    def load(self):
+        """Returns the (start, end) dates already loaded, or None if dim_date has not been loaded."""
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self.key)
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] != 'NoSuchKey':
+                raise
+            return None
+        state = json.loads(response['Body'].read())
+        return state['start'], state['end']
+
+    def save(self, covered):
+        """Stores the (start, end) dates dim_date now covers."""
+        start, end = (str(date)[:10] for date in covered)
+        body = json.dumps({'start': start, 'end': end})
+        self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=body.encode('utf-8'))
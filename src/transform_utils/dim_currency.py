@@ -1,10 +1,23 @@
 import pandas as pd 
-import requests
+from functools import lru_cache
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+BUNDLED_NAMES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "currency_names.json")
+CACHED_NAMES_PATH = os.path.join(os.environ.get("TMPDIR", "/tmp"), "currency_names.json")
+CURRENCY_NAMES_URL = "https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@latest/v1/currencies.json"
 
 def util_dim_currency(df_currency):
     """Performs transformation on input dataframe to convert it to suitable
        structure for data warehouse. 
 
+       Currency names are looked up in the bundled reference table (see
+       `load_currency_names`), so the transform makes no network calls. A code
+       with no known name keeps the code as its name.
+
        Args:
        df_abc: The data frame created from the currency table csv 
 
@@ -25,15 +38,68 @@ def util_dim_currency(df_currency):
     df_dim_currency['currency_id'] = df_currency['currency_id']
     df_dim_currency['currency_code'] = df_currency['currency_code']
 
-    URL = "https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@latest/v1/currencies.json"
-    curr_rates = requests.get(url=URL)
-    dict_curr_rates = curr_rates.json()
+    dict_currency_names = load_currency_names()
 
     lst_currency_code_values = df_dim_currency['currency_code'].tolist()
-    lst_currency_name_values = [dict_curr_rates[currency_code_value.lower()] for currency_code_value in lst_currency_code_values]
+    lst_currency_name_values = [
+        dict_currency_names.get(currency_code_value.lower(), currency_code_value)
+        for currency_code_value in lst_currency_code_values
+    ]
 
     df_dim_currency['currency_name'] = lst_currency_name_values
     df_dim_currency.index.name = "currency_id"
     return df_dim_currency
 
+@lru_cache(maxsize=1)
+def load_currency_names():
+    """Loads the currency code to name mapping, once per container.
+
+       The mapping shipped with the layer (`currency_names.json`, lower case
+       ISO 4217 codes) is overlaid with the local cache written by
+       `refresh_currency_names`, if there is one. An unreadable cache is
+       ignored.
+
+       Returns:
+       A dictionary of lower case currency codes mapped to names."""
+
+    with open(BUNDLED_NAMES_PATH, encoding="utf-8") as f:
+        names = json.load(f)
+    try:
+        with open(CACHED_NAMES_PATH, encoding="utf-8") as f:
+            names.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable currency name cache {CACHED_NAMES_PATH}: {e}")
+    return names
+
+def refresh_currency_names(timeout=5):
+    """Downloads the latest currency names into the local cache.
+
+       This is optional and never needed for a transform to succeed: any
+       failure is logged and the bundled names stay in use. On success the
+       memoized mapping is cleared so the next lookup reads the cache.
+
+       Args:
+       timeout: Seconds to wait for the download.
+
+       Returns:
+       True if the cache was refreshed, otherwise False."""
+
+    try:
+        import requests
 
+        response = requests.get(url=CURRENCY_NAMES_URL, timeout=timeout)
+        response.raise_for_status()
+        names = {code.lower(): name for code, name in response.json().items() if isinstance(name, str) and name}
+        if not names:
+            raise ValueError("no currency names in response")
+        temp_path = f"{CACHED_NAMES_PATH}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(names, f)
+        os.replace(temp_path, CACHED_NAMES_PATH)
+    except Exception as e:
+        logger.warning(f"Could not refresh currency names, using bundled names: {e}")
+        return False
+    load_currency_names.cache_clear()
+    return True
@@ -1,4 +1,11 @@
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+
+DAY_NAMES = np.array(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])
+MONTH_NAMES = np.array(['January', 'February', 'March', 'April', 'May', 'June', 'July',
+                        'August', 'September', 'October', 'November', 'December'])
+DEFAULT_START = '2022-01-01'
 
 def util_dim_date(start: str, end: str):
     """Creates a date range using pandas. Individual dates are then passed to
@@ -22,8 +29,69 @@ def util_dim_date(start: str, end: str):
         'month': date_range.month,
         'day': date_range.day,
         'day_of_week': date_range.day_of_week + 1,
-        'day_name': date_range.strftime('%A'),
-        'month_name': date_range.strftime('%B'),
+        'day_name': DAY_NAMES[date_range.day_of_week],
+        'month_name': MONTH_NAMES[date_range.month - 1],
         'quarter': date_range.quarter
     })
-    return df_dim_date
\ No newline at end of file
+    return df_dim_date
+
+def extend_dim_date(covered, start, end):
+    """Creates only the dim_date rows needed to cover the dates from start to end.
+
+       dim_date is extended in whole calendar years: the range built so far
+       grows back to 1 January of the year of `start` and forward to 31
+       December of the year of `end`, so new rows are needed at most once a
+       year.
+
+       Args:
+       covered: A (start, end) tuple of the dates dim_date already holds, or
+              None if it has not been built yet.
+       start: The earliest date that must be in dim_date.
+       end: The latest date that must be in dim_date.
+
+       Returns:
+       A (df_dim_date, covered) tuple of a dataframe holding only the new rows
+       (None if there are none) and the (start, end) dates now covered.
+       """
+
+    start = pd.Timestamp(year=pd.Timestamp(start).year, month=1, day=1)
+    end = pd.Timestamp(year=pd.Timestamp(end).year, month=12, day=31)
+    if covered is None:
+        return util_dim_date(start, end), (start, end)
+
+    covered_start, covered_end = pd.Timestamp(covered[0]), pd.Timestamp(covered[1])
+    new_rows = []
+    if start < covered_start:
+        new_rows.append(util_dim_date(start, covered_start - pd.Timedelta(days=1)))
+    if end > covered_end:
+        new_rows.append(util_dim_date(covered_end + pd.Timedelta(days=1), end))
+    covered = (min(start, covered_start), max(end, covered_end))
+    if not new_rows:
+        return None, covered
+    return pd.concat(new_rows, ignore_index=True), covered
+
+def date_bounds(dfs):
+    """Finds the earliest and latest value of every `*_date` column in dfs.
+
+       Args:
+       dfs: An iterable of dataframes or pyarrow Tables, e.g. transformed
+       fact tables.
+
+       Returns:
+       A (start, end) tuple of timestamps, or None if there are no dates.
+       """
+
+    bounds = []
+    for df in dfs:
+        names = df.column_names if isinstance(df, pa.Table) else df.columns
+        for column in names:
+            if column.endswith('_date'):
+                values = df[column]
+                if isinstance(df, pa.Table):
+                    values = values.to_pandas()
+                values = pd.to_datetime(values.dropna(), format='ISO8601')
+                if not values.empty:
+                    bounds += [values.min(), values.max()]
+    if not bounds:
+        return None
+    return min(bounds), max(bounds)
@@ -1,4 +1,5 @@
 import pandas as pd
+from .temporal import split_timestamp
 
 def util_fact_purchase_order(df_purchase_order):
     """Performs transformation on input dataframe to convert it to suitable
@@ -35,11 +36,8 @@ def util_fact_purchase_order(df_purchase_order):
 
     df_fact_purchase_order["purchase_order_id"] = df_purchase_order["purchase_order_id"]
 
-    df_fact_purchase_order["created_date"] = pd.to_datetime(df_purchase_order["created_at"], format='mixed').dt.date
-    df_fact_purchase_order["created_time"] = pd.to_datetime(df_purchase_order["created_at"], format='mixed').dt.time
-    
-    df_fact_purchase_order["last_updated_date"] = pd.to_datetime(df_purchase_order["last_updated"], format='mixed').dt.date
-    df_fact_purchase_order["last_updated_time"] = pd.to_datetime(df_purchase_order["last_updated"], format='mixed').dt.time
+    df_fact_purchase_order["created_date"], df_fact_purchase_order["created_time"] = split_timestamp(df_purchase_order["created_at"])
+    df_fact_purchase_order["last_updated_date"], df_fact_purchase_order["last_updated_time"] = split_timestamp(df_purchase_order["last_updated"])
 
     for column in required_columns[3:7]:
         df_fact_purchase_order[column] = df_purchase_order[column]
@@ -1,4 +1,5 @@
 import pandas as pd
+from .temporal import split_timestamp, to_dates
 
 def util_fact_sales_order(df_sales_order):
     """Performs transformation on input dataframe to convert it to suitable
@@ -35,13 +36,8 @@ def util_fact_sales_order(df_sales_order):
 
     df_fact_sales_order["sales_order_id"] = df_sales_order["sales_order_id"]
 
-    df_fact_sales_order["created_date"] = pd.to_datetime(df_sales_order["created_at"], format='mixed').dt.date
-    df_fact_sales_order["created_time"] = pd.to_datetime(
-        df_sales_order["created_at"], format='mixed').dt.time
-    df_fact_sales_order["last_updated_date"] = pd.to_datetime(
-        df_sales_order["last_updated"], format='mixed').dt.date
-    df_fact_sales_order["last_updated_time"] = pd.to_datetime(
-        df_sales_order["last_updated"], format='mixed').dt.time
+    df_fact_sales_order["created_date"], df_fact_sales_order["created_time"] = split_timestamp(df_sales_order["created_at"])
+    df_fact_sales_order["last_updated_date"], df_fact_sales_order["last_updated_time"] = split_timestamp(df_sales_order["last_updated"])
 
     df_fact_sales_order["sales_staff_id"] = df_sales_order["staff_id"]
     df_fact_sales_order["counterparty_id"] = df_sales_order["counterparty_id"]
@@ -51,10 +47,8 @@ def util_fact_sales_order(df_sales_order):
     df_fact_sales_order["currency_id"] = df_sales_order["currency_id"]
     df_fact_sales_order["design_id"] = df_sales_order["design_id"]
 
-    df_fact_sales_order["agreed_payment_date"] = pd.to_datetime(
-        df_sales_order["agreed_payment_date"]).dt.date
-    df_fact_sales_order["agreed_delivery_date"] = pd.to_datetime(
-        df_sales_order["agreed_delivery_date"]).dt.date
+    df_fact_sales_order["agreed_payment_date"] = to_dates(df_sales_order["agreed_payment_date"])
+    df_fact_sales_order["agreed_delivery_date"] = to_dates(df_sales_order["agreed_delivery_date"])
     df_fact_sales_order["agreed_delivery_location_id"] = df_sales_order["agreed_delivery_location_id"]
 
     return df_fact_sales_order
\ No newline at end of file
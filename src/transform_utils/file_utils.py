@@ -1,14 +1,65 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.csv as pacsv
 import boto3
 import io
+import json
 import botocore
+from concurrent.futures import ThreadPoolExecutor
 
-def read_csv_from_s3(bucket, key):
+SCHEMA_SUFFIX = '.schema.json'
+
+# Parquet writer profiles, by name. Each maps pyarrow writer settings:
+# compression and compression_level, row_group_size (rows per row group),
+# use_dictionary (True, False or a list of columns), write_statistics (True,
+# False or a list of columns), and sort_by, the columns rows are sorted by
+# before writing (those missing from a table are ignored). The sort order is
+# recorded in the file, and sorted row groups give min/max statistics that
+# readers can skip row groups by. 'default' writes as the transform always has.
+PARQUET_PROFILES = {
+    'default': {'compression': 'snappy'},
+    'fast': {
+        'compression': 'zstd', 'compression_level': 1, 'row_group_size': 128 * 1024,
+        'use_dictionary': True, 'write_statistics': True,
+    },
+    'compact': {
+        'compression': 'zstd', 'compression_level': 9, 'row_group_size': 1024 * 1024,
+        'use_dictionary': True, 'write_statistics': True,
+        'sort_by': ['created_date', 'created_time'],
+    },
+}
+PARQUET_SETTINGS = {'compression', 'compression_level', 'row_group_size', 'use_dictionary', 'write_statistics', 'sort_by'}
+# Bytes of CSV parsed into each record batch when an extract is streamed.
+DEFAULT_BLOCK_SIZE = 8 * 1024 * 1024
+
+# Arrow types used to parse CSV columns, by the logical type recorded in the
+# extract's schema sidecar. Dates, times and anything unknown are kept as
+# strings, as they would be without a sidecar.
+CSV_COLUMN_TYPES = {
+    'bool': pa.bool_(),
+    'int64': pa.int64(),
+    'float64': pa.float64(),
+    'timestamp': pa.timestamp('us'),
+    'timestamptz': pa.timestamp('us', tz='UTC'),
+}
+
+def read_csv_from_s3(bucket, key, columns=None, as_arrow=False):
     """Reads a CSV from S3 into a pandas DataFrame.
+
+       Keys ending in '.gz' or '.zst' are decompressed on the fly as the
+       body is streamed, so compressed extracts are read transparently.
+       When the extract has a schema sidecar ('<key>.schema.json'), it is
+       parsed by the pyarrow CSV reader with the recorded column types, so
+       no types are inferred and timestamps are parsed once, on read.
     
        Args:
        bucket: The S3 bucket to read csv files from.
        key: The key (name) of the csv file to be read.
+       columns: Optional list of columns to keep; others are skipped while
+       parsing. Only applied when the extract has a schema sidecar.
+       as_arrow: Return a pyarrow Table instead, for the arrow transform
+       engine.
        
        Returns:
        A pandas dataframe to be manipulated for the data transformation to
@@ -16,8 +67,19 @@ def read_csv_from_s3(bucket, key):
     
     s3_client = boto3.client('s3')
     try:
+      schema = read_schema_sidecar(s3_client, bucket, key)
       response = s3_client.get_object(Bucket=bucket, Key=key)
-      data = pd.read_csv(response['Body'])
+      body = response['Body']
+      if schema is not None:
+          stream = pa.PythonFile(body, mode='r')
+          if key.endswith(('.gz', '.zst')):
+              stream = pa.CompressedInputStream(stream, 'gzip' if key.endswith('.gz') else 'zstd')
+          return read_typed_csv(stream, schema, columns, as_arrow)
+      if key.endswith('.zst'):
+          body = pa.CompressedInputStream(pa.PythonFile(body, mode='r'), 'zstd')
+      data = pd.read_csv(body, compression='gzip' if key.endswith('.gz') else None)
+      if as_arrow:
+          return pa.Table.from_pandas(data, preserve_index=False)
       return data
     
     except (botocore.exceptions.NoCredentialsError, botocore.exceptions.PartialCredentialsError):
@@ -30,13 +92,205 @@ def read_csv_from_s3(bucket, key):
     except Exception as e:
         return f"An error occurred: {str(e)}"
 
-def write_parquet_to_s3(df, bucket, key):
+def read_schema_sidecar(s3_client, bucket, key):
+    """Fetches the schema sidecar written next to a CSV extract, if any.
+    
+       Args:
+       s3_client: Boto3 S3 client.
+       bucket: The S3 bucket holding the extract.
+       key: The key (name) of the extract.
+       
+       Returns:
+       The sidecar dictionary, or None if the extract has no sidecar."""
+
+    try:
+      response = s3_client.get_object(Bucket=bucket, Key=key + SCHEMA_SUFFIX)
+    except botocore.exceptions.ClientError as e:
+       if e.response['Error']['Code'] == 'NoSuchKey':
+          return None
+       raise
+    return json.loads(response['Body'].read())
+
+def read_typed_csv(stream, schema, columns=None, as_arrow=False):
+    """Parses a CSV stream with the column types given by its schema sidecar.
+    
+       Args:
+       stream: A readable file-like object or pyarrow stream of CSV data.
+       schema: The sidecar dictionary, see `read_schema_sidecar`.
+       columns: Optional list of columns to keep.
+       as_arrow: Return the parsed pyarrow Table without converting it.
+       
+       Returns:
+       A pandas dataframe with one column per kept column."""
+
+    table = pacsv.read_csv(stream, convert_options=typed_convert_options(schema, columns))
+    return table if as_arrow else table.to_pandas()
+
+def typed_convert_options(schema, columns=None):
+    """Builds pyarrow CSV convert options from a schema sidecar.
+
+       Args:
+       schema: The sidecar dictionary, see `read_schema_sidecar`.
+       columns: Optional list of columns to keep.
+
+       Returns:
+       A pyarrow.csv.ConvertOptions."""
+
+    names = [column['name'] for column in schema['columns']]
+    return pacsv.ConvertOptions(
+        column_types={
+            column['name']: CSV_COLUMN_TYPES.get(column['type'], pa.string())
+            for column in schema['columns']
+        },
+        include_columns=[name for name in names if columns is None or name in columns],
+        strings_can_be_null=True,
+    )
+
+def read_csv_batches_from_s3(bucket, key, columns=None, block_size=DEFAULT_BLOCK_SIZE):
+    """Streams a typed CSV extract from S3 as pyarrow record batches.
+
+       The S3 body is decompressed and parsed as it is read, about
+       `block_size` bytes of CSV at a time, so only one batch is held in
+       memory however large the extract is. Every batch has the column types
+       recorded in the extract's schema sidecar. A key ending in '/' streams
+       each part under the prefix in order.
+
+       Args:
+       bucket: The S3 bucket to read from.
+       key: The key of the extract, or a prefix of parts ending in '/'.
+       columns: Optional list of columns to keep.
+       block_size: Approximate bytes of CSV per batch.
+
+       Returns:
+       An iterator of pyarrow RecordBatches, or None if the extract cannot be
+       streamed (it is not CSV, or a file has no schema sidecar). Read those
+       with `read_table_from_s3`."""
+
+    s3_client = boto3.client('s3')
+    keys = list_part_keys(s3_client, bucket, key) if key.endswith('/') else [key]
+    if not keys or any(part_key.endswith(('.parquet', '.arrow')) for part_key in keys):
+        return None
+    schemas = [read_schema_sidecar(s3_client, bucket, part_key) for part_key in keys]
+    if None in schemas:
+        return None
+    return _csv_batches(s3_client, bucket, keys, schemas, columns, block_size)
+
+def _csv_batches(s3_client, bucket, keys, schemas, columns, block_size):
+    for key, schema in zip(keys, schemas):
+        body = s3_client.get_object(Bucket=bucket, Key=key)['Body']
+        stream = pa.PythonFile(body, mode='r')
+        if key.endswith(('.gz', '.zst')):
+            stream = pa.CompressedInputStream(stream, 'gzip' if key.endswith('.gz') else 'zstd')
+        reader = pacsv.open_csv(
+            stream,
+            read_options=pacsv.ReadOptions(block_size=block_size),
+            convert_options=typed_convert_options(schema, columns),
+        )
+        for batch in reader:
+            yield batch
+
+def list_part_keys(s3_client, bucket, prefix):
+    """Lists the part objects under a prefix in part order, leaving out schema sidecars."""
+
+    paginator = s3_client.get_paginator('list_objects_v2')
+    return sorted(
+        obj['Key']
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix)
+        for obj in page.get('Contents', [])
+        if not obj['Key'].endswith(SCHEMA_SUFFIX)
+    )
+
+def read_table_from_s3(bucket, key, columns=None, as_arrow=False):
+    """Reads an ingested table from S3 into a pandas DataFrame.
+    
+       The format is detected from the key's extension: Parquet ('.parquet')
+       and Arrow IPC ('.arrow') extracts are read natively with their column
+       types intact, and anything else is parsed as CSV. A key ending in '/'
+       is a prefix holding a table extracted in numbered parts, which are
+       read in order and concatenated.
+
+       Args:
+       bucket: The S3 bucket to read the file from.
+       key: The key (name) of the file to be read.
+       columns: Optional list of columns to keep, e.g. from
+       `column_manifest.source_columns`. Columns missing from the file are
+       ignored.
+       as_arrow: Return a pyarrow Table instead, for the arrow transform
+       engine.
+       
+       Returns:
+       A pandas dataframe to be manipulated for the data transformation to
+       warehouse star schema format."""
+
+    if key.endswith('/'):
+        return read_parts_from_s3(bucket, key, columns, as_arrow)
+    if not key.endswith(('.parquet', '.arrow')):
+        return read_csv_from_s3(bucket, key, columns, as_arrow)
+
+    s3_client = boto3.client('s3')
+    try:
+      response = s3_client.get_object(Bucket=bucket, Key=key)
+      buffer = pa.py_buffer(response['Body'].read())
+      if key.endswith('.parquet'):
+          table = pq.read_table(pa.BufferReader(buffer))
+      else:
+          table = pa.ipc.open_file(buffer).read_all()
+      if columns is not None:
+          table = table.select([name for name in table.column_names if name in columns])
+      return table if as_arrow else table.to_pandas()
+
+    except (botocore.exceptions.NoCredentialsError, botocore.exceptions.PartialCredentialsError):
+        return "AWS credentials not found or incomplete."
+    except botocore.exceptions.ClientError as e:
+       if e.response['Error']['Code'] == 'NoSuchKey':
+          return f"The file '{key}' does not exist in the bucket '{bucket}'."
+       elif e.response['Error']['Code'] == 'AccessDenied':
+            return f"Access denied to '{bucket}'. Check your S3 permissions."
+    except Exception as e:
+        return f"An error occurred: {str(e)}"
+
+def read_parts_from_s3(bucket, prefix, columns=None, as_arrow=False):
+    """Reads every part object under a prefix into a single pandas DataFrame.
+    
+       Args:
+       bucket: The S3 bucket to read the parts from.
+       prefix: The prefix (ending in '/') the numbered parts are stored under.
+       columns: Optional list of columns to keep.
+       as_arrow: Return a pyarrow Table instead.
+       
+       Returns:
+       A pandas dataframe holding the rows of all parts, in part order."""
+
+    s3_client = boto3.client('s3')
+    try:
+      keys = list_part_keys(s3_client, bucket, prefix)
+    except (botocore.exceptions.NoCredentialsError, botocore.exceptions.PartialCredentialsError):
+        return "AWS credentials not found or incomplete."
+    except Exception as e:
+        return f"An error occurred: {str(e)}"
+    if not keys:
+        return f"No parts found under '{prefix}' in the bucket '{bucket}'."
+
+    parts = []
+    for key in keys:
+        part = read_table_from_s3(bucket, key, columns, as_arrow)
+        if isinstance(part, str):
+            return part
+        parts.append(part)
+    if as_arrow:
+        return pa.concat_tables(parts, promote_options='permissive')
+    return pd.concat(parts, ignore_index=True)
+
+def write_parquet_to_s3(df, bucket, key, profile='default'):
     """Writes a pandas DataFrame to a given S3 bucket.
     
        Args:
-       df: The dataframe to write to parquet file format.
+       df: The dataframe to write to parquet file format. A pyarrow Table,
+       as returned by the arrow transform engine, is written as it is.
        bucket: The S3 bucket to put the parquet file in.
        key: The desired key (name) of the parquet file.
+       profile: The name of a writer profile in PARQUET_PROFILES, or a dict
+       of the same settings.
        
        Returns:
        A string indicating the success of the upload.
@@ -44,7 +298,7 @@ def write_parquet_to_s3(df, bucket, key):
     
     try:
       buffer = io.BytesIO()
-      df.to_parquet(buffer, engine='pyarrow', compression='snappy')
+      _write_parquet(df, buffer, parquet_profile(profile))
       buffer.seek(0)
 
       s3_client = boto3.client('s3')
@@ -58,4 +312,99 @@ def write_parquet_to_s3(df, bucket, key):
     except botocore.exceptions.BotoCoreError as e:
         return f"An AWS error occurred: {str(e)}"
     except Exception as e:
-        return f"An error occurred: {str(e)}"
\ No newline at end of file
+        return f"An error occurred: {str(e)}"
+
+def write_partitioned_parquet_to_s3(df, bucket, prefix, partition_column='created_date', profile='default', max_workers=8):
+    """Writes a fact table to S3 as a Hive-partitioned parquet dataset.
+
+       Rows are split by the day in `partition_column` and each day is
+       written to '<prefix>year=YYYY/month=MM/day=DD/part-00000.parquet',
+       so readers that understand Hive partitioning can skip days they do
+       not need. The partition values are only in the keys; every file
+       keeps all of the table's columns. Rows with no date go under
+       'year=__HIVE_DEFAULT_PARTITION__/'.
+
+       Args:
+       df: The dataframe (or pyarrow Table) to write.
+       bucket: The S3 bucket to put the dataset in.
+       prefix: Key prefix of the dataset, ending in '/'.
+       partition_column: The date column to partition by.
+       profile: The name of a writer profile in PARQUET_PROFILES, or a dict
+       of the same settings.
+       max_workers: Number of partitions uploaded at the same time.
+
+       Returns:
+       A string indicating the success of the upload."""
+
+    try:
+      options = parquet_profile(profile)
+      s3_client = boto3.client('s3')
+      partitions = _date_partitions(df, partition_column)
+
+      def upload(partition):
+          path, rows = partition
+          buffer = io.BytesIO()
+          _write_parquet(rows, buffer, options)
+          buffer.seek(0)
+          s3_client.upload_fileobj(buffer, bucket, f"{prefix}{path}part-00000.parquet")
+
+      with ThreadPoolExecutor(max_workers=max_workers) as executor:
+          list(executor.map(upload, partitions))
+
+      print(f"Dataset of {len(partitions)} partitions successfully uploaded to s3://{bucket}/{prefix}")
+      return f"Dataset successfully uploaded to s3://{bucket}/{prefix}"
+
+    except (botocore.exceptions.NoCredentialsError, botocore.exceptions.PartialCredentialsError):
+        return "AWS credentials not found or incomplete."
+    except botocore.exceptions.BotoCoreError as e:
+        return f"An AWS error occurred: {str(e)}"
+    except Exception as e:
+        return f"An error occurred: {str(e)}"
+
+def parquet_profile(profile):
+    """Returns the settings of a writer profile, given its name in
+       PARQUET_PROFILES or a dict of settings. Raises ValueError for an
+       unknown name or setting."""
+    if isinstance(profile, dict):
+        settings = profile
+    elif profile in PARQUET_PROFILES:
+        settings = PARQUET_PROFILES[profile]
+    else:
+        raise ValueError(f"Unknown parquet profile '{profile}', expected one of {sorted(PARQUET_PROFILES)}")
+    unknown = set(settings) - PARQUET_SETTINGS
+    if unknown:
+        raise ValueError(f"Unknown parquet settings {sorted(unknown)}")
+    return settings
+
+def _write_parquet(df, sink, settings):
+    options = {key: value for key, value in settings.items() if key != 'sort_by' and value is not None}
+    columns = list(df.column_names if isinstance(df, pa.Table) else df.columns)
+    sort_by = [column for column in settings.get('sort_by') or [] if column in columns]
+    if sort_by:
+        if isinstance(df, pa.Table):
+            df = df.sort_by([(column, 'ascending') for column in sort_by])
+        else:
+            df = df.sort_values(sort_by, kind='stable', ignore_index=True)
+        options['sorting_columns'] = [pq.SortingColumn(columns.index(column)) for column in sort_by]
+    if isinstance(df, pa.Table):
+        pq.write_table(df, sink, **options)
+    else:
+        df.to_parquet(sink, engine='pyarrow', **options)
+
+def _date_partitions(df, column):
+    """Splits a table by day. Returns a list of ('year=../month=../day=../', rows)."""
+    values = df[column].to_pandas() if isinstance(df, pa.Table) else df[column]
+    days = pd.to_datetime(pd.Series(values).astype(object), errors='coerce').dt.normalize()
+    partitions = []
+    for day, positions in pd.Series(range(len(days))).groupby(days.values, dropna=False, sort=True):
+        if pd.isna(day):
+            path = 'year=__HIVE_DEFAULT_PARTITION__/'
+        else:
+            day = pd.Timestamp(day)
+            path = f"year={day.year}/month={day.month:02}/day={day.day:02}/"
+        if isinstance(df, pa.Table):
+            rows = df.take(pa.array(positions.values))
+        else:
+            rows = df.iloc[positions.values].reset_index(drop=True)
+        partitions.append((path, rows))
+    return partitions
@@ -0,0 +1,211 @@
+import io
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import botocore
+
+# Dimensions built by joining two source tables. `parent` rows each become one
+# dimension row and reference a `child` row through `foreign_key`.
+JOINED_DIMS = {
+    'dim_staff': {
+        'parent': 'staff', 'parent_key': 'staff_id',
+        'child': 'department', 'child_key': 'department_id',
+        'foreign_key': 'department_id',
+    },
+    'dim_counterparty': {
+        'parent': 'counterparty', 'parent_key': 'counterparty_id',
+        'child': 'address', 'child_key': 'address_id',
+        'foreign_key': 'legal_address_id',
+    },
+}
+
+
+class JoinSnapshots:
+    """Builds joined dimensions from changed source rows only.
+
+    For each dimension in `JOINED_DIMS`, a snapshot of both source tables as
+    of the last build is kept as parquet under `prefix` in the transformed
+    bucket. `build` takes the rows received this run from either side, which
+    may be whole tables or only changed rows, and:
+
+    1. upserts them into the snapshot and keeps the keys of rows that are new
+       or differ from the snapshot;
+    2. looks up the parents affected by changed children in an index of the
+       snapshot's foreign keys;
+    3. joins only the affected parents and the children they reference, and
+    4. returns only the dimension rows that differ from the ones built from
+       the previous snapshot.
+
+    Without a snapshot, a table is seeded from the received rows only if
+    they are a complete extract, and every row is built, as a full join
+    would. The ingestion lambda sends whole tables for a join group whenever
+    any of its tables changes, unless it runs with INCREMENTAL_JOINS=true.
+    Turn that on only after this transform has saved snapshots.
+
+    If the columns extracted from a table change, its snapshot is projected
+    onto the received columns when columns were only dropped. Otherwise that
+    side is rebuilt from the received rows if they are a complete extract,
+    and the whole dimension is rebuilt. If they are only changed rows, with
+    a missing or mismatched snapshot, `build` raises rather than truncate
+    the snapshot to them.
+
+    Args:
+        s3_client: Boto3 S3 client.
+        bucket (str): Bucket holding the snapshots (the transformed bucket).
+        prefix (str): Key prefix of the snapshots.
+    """
+
+    def __init__(self, s3_client, bucket, prefix='_state/join_snapshots/'):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self._pending = {}
+
+    def build(self, dim_table, util, parent, child, complete=()):
+        """Builds the rows of `dim_table` that change with the received source rows.
+
+        Args:
+            dim_table (str): A dimension in `JOINED_DIMS`.
+            util: The pandas util building the dimension from (parent, child).
+            parent (DataFrame): Received rows of the parent table. May be empty.
+            child (DataFrame): Received rows of the child table. May be empty.
+            complete (iterable): Tables whose received rows are a complete
+                extract rather than only changed rows.
+
+        Returns:
+            DataFrame: The new and changed dimension rows, or None if no rows
+                change. The new snapshot is saved by `commit`, and only if
+                the dimension was built.
+
+        Raises:
+            ValueError: If a table has no snapshot, or its extracted columns
+                changed, and it was not received as a complete extract.
+        """
+        spec = JOINED_DIMS[dim_table]
+        previous_parent = self._load(dim_table, spec['parent'], parent, complete)
+        previous_child = self._load(dim_table, spec['child'], child, complete)
+        rebuild = previous_parent is None or previous_child is None
+
+        new_parent, changed_parents = upsert_rows(previous_parent, parent, spec['parent_key'])
+        new_child, changed_children = upsert_rows(previous_child, child, spec['child_key'])
+        snapshot = {spec['parent']: new_parent, spec['child']: new_child}
+
+        foreign_keys = foreign_key_index(new_parent, spec['foreign_key'], spec['parent_key'])
+        affected = set(new_parent[spec['parent_key']]) if rebuild else set(changed_parents)
+        for child_key in changed_children:
+            affected.update(foreign_keys.get(child_key, ()))
+        if not affected:
+            self._pending[dim_table] = snapshot
+            return None
+
+        df_dim = _build(util, new_parent, new_child, affected, spec)
+        if not isinstance(df_dim, pd.DataFrame):
+            # The util failed, so the changes stay out of the snapshot until it is built.
+            return df_dim
+        if not rebuild:
+            df_previous = _build(util, previous_parent, previous_child, affected, spec)
+            if isinstance(df_previous, pd.DataFrame):
+                df_dim = changed_rows(df_previous, df_dim, spec['parent_key'])
+        self._pending[dim_table] = snapshot
+        if df_dim.empty:
+            return None
+        return df_dim
+
+    def commit(self):
+        """Saves the snapshots of every dimension built since the last commit."""
+        for dim_table, tables in self._pending.items():
+            for table, df in tables.items():
+                buffer = io.BytesIO()
+                pq.write_table(pa.Table.from_pandas(df, preserve_index=False), buffer)
+                self.s3_client.put_object(Bucket=self.bucket, Key=self._key(dim_table, table), Body=buffer.getvalue())
+        self._pending = {}
+
+    def _load(self, dim_table, table, received, complete):
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self._key(dim_table, table))
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] != 'NoSuchKey':
+                raise
+            if table in complete:
+                return None
+            raise ValueError(
+                f"There is no {dim_table} snapshot of {table} and only changed rows were received. "
+                f"Extract {table} in full (INCREMENTAL_JOINS=false on ingestion) to seed it."
+            )
+        snapshot = pq.read_table(pa.BufferReader(response['Body'].read())).to_pandas()
+        if not len(received.columns) or set(snapshot.columns) == set(received.columns):
+            return snapshot
+        if set(received.columns) < set(snapshot.columns):
+            # Columns were only dropped from the extract, which the snapshot still holds.
+            return snapshot[list(received.columns)]
+        if table in complete:
+            return None
+        raise ValueError(
+            f"Columns extracted from {table} no longer match the {dim_table} snapshot and only changed "
+            f"rows were received. Extract {table} in full (INCREMENTAL_JOINS=false on ingestion) to rebuild it."
+        )
+
+    def _key(self, dim_table, table):
+        return f"{self.prefix}{dim_table}/{table}.parquet"
+
+def upsert_rows(previous, received, key):
+    """Applies received rows to a snapshot of a table.
+
+    Args:
+        previous (DataFrame): The snapshot, or None if there is none.
+        received (DataFrame): Received rows, replacing snapshot rows with the
+            same key.
+        key (str): Primary key column.
+
+    Returns:
+        tuple: `(table, changed_keys)`, the updated snapshot and the keys of
+            received rows that are new or differ from the snapshot.
+    """
+    if previous is None:
+        return received.reset_index(drop=True), list(received[key]) if len(received.columns) else []
+    if received.empty:
+        return previous, []
+    received = received[list(previous.columns)]
+    received_hashes = pd.Series(row_hashes(received).values, index=received[key])
+    previous_hashes = pd.Series(row_hashes(previous).values, index=previous[key])
+    unchanged = received_hashes.index.isin(previous_hashes.index)
+    unchanged[unchanged] = (
+        previous_hashes.reindex(received_hashes.index[unchanged]).values == received_hashes.values[unchanged]
+    )
+    changed_keys = list(received_hashes.index[~unchanged])
+    table = pd.concat([previous[~previous[key].isin(received[key])], received], ignore_index=True)
+    return table, changed_keys
+
+def foreign_key_index(parent, foreign_key, parent_key):
+    """Maps each foreign key value to the parent keys referencing it."""
+    if parent.empty:
+        return {}
+    return parent.groupby(foreign_key)[parent_key].apply(list).to_dict()
+
+def changed_rows(previous, current, key):
+    """Returns the rows of `current` that are new or differ from `previous`, by `key`."""
+    previous_hashes = pd.Series(row_hashes(previous).values, index=previous[key])
+    current_hashes = row_hashes(current)
+    matches = previous_hashes.reindex(current[key]).values == current_hashes.values
+    return current[~matches].reset_index(drop=True)
+
+def row_hashes(df):
+    """Hashes each row's values, ignoring the dtype differences that reading
+    the same values from CSV or from parquet can introduce (e.g. an integer
+    column read as float because of a null)."""
+    normalised = pd.DataFrame(index=df.index)
+    for column in sorted(df.columns):
+        values = df[column]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            values = values.astype('float64')
+        normalised[column] = values.astype('string')
+    return pd.util.hash_pandas_object(normalised, index=False)
+
+def _build(util, parent, child, affected, spec):
+    parent_rows = parent[parent[spec['parent_key']].isin(affected)]
+    child_rows = child[child[spec['child_key']].isin(parent_rows[spec['foreign_key']])]
+    if child_rows.empty:
+        # The utils reject an empty table; with nothing to join every parent
+        # gets empty child columns, as a left join would give them.
+        child_rows = child.iloc[:0].reindex(range(1))
+    return util(parent_rows.reset_index(drop=True), child_rows.reset_index(drop=True))
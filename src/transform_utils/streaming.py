@@ -0,0 +1,64 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .dim_date import date_bounds
+from .file_utils import parquet_profile
+
+
+def transform_batches_to_parquet(util, batches, sink, as_arrow=False, profile='default'):
+    """Applies a fact util to each record batch and writes the results as parquet row groups.
+
+    Each batch is transformed and written as one row group of a single
+    parquet file before the next batch is read, so memory is bounded by the
+    batch size rather than the size of the extract. Every row group takes the
+    schema of the first one. For the pandas utils, batches are converted with
+    arrow-backed dtypes, so an integer column keeps its type whether or not a
+    batch holds nulls.
+
+    Args:
+        util: A `util_fact_*` function, or its `arrow_engine` version if
+            `as_arrow` is True.
+        batches: An iterable of pyarrow RecordBatches, e.g. from
+            `file_utils.read_csv_batches_from_s3`.
+        sink: A writable binary file-like object, e.g. a
+            `helpers.S3MultipartWriter`.
+        as_arrow: Pass batches to `util` as pyarrow Tables.
+        profile: A writer profile name or settings, as for
+            `file_utils.write_parquet_to_s3`. Its row_group_size and sort_by
+            do not apply; each batch is one row group, in source order.
+
+    Returns:
+        dict: `{"rows": rows written, "dates": (earliest, latest) *_date
+            value or None}`. No parquet file is written if there are no rows.
+
+    Raises:
+        ValueError: If `util` rejects a batch, with the util's message.
+    """
+    options = {key: value for key, value in parquet_profile(profile).items()
+               if key not in ('row_group_size', 'sort_by') and value is not None}
+    writer = None
+    rows, bounds = 0, []
+    try:
+        for batch in batches:
+            if batch.num_rows == 0:
+                continue
+            source = pa.Table.from_batches([batch])
+            if as_arrow:
+                output = util(source)
+            else:
+                output = util(source.to_pandas(types_mapper=pd.ArrowDtype))
+            if isinstance(output, str):
+                raise ValueError(output)
+            if isinstance(output, pd.DataFrame):
+                output = pa.Table.from_pandas(output, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(sink, output.schema, **options)
+            writer.write_table(output.cast(writer.schema))
+            rows += output.num_rows
+            batch_dates = date_bounds([output])
+            if batch_dates:
+                bounds.extend(batch_dates)
+    finally:
+        if writer is not None:
+            writer.close()
+    return {"rows": rows, "dates": (min(bounds), max(bounds)) if bounds else None}
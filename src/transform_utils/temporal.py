@@ -0,0 +1,78 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+def parse_timestamps(values):
+    """Parses a column of timestamps once, trying the source's known format first.
+
+       Source timestamps are ISO 8601 ('2022-11-03 14:20:52.186'), which pandas
+       parses with a single vectorised pass. Only if that fails is each value
+       parsed separately with format='mixed'. Columns that are already
+       datetimes (e.g. read with a schema sidecar) are returned unchanged.
+
+       Args:
+       values: A pandas series of timestamp strings or datetimes.
+
+       Returns:
+       A pandas series of datetime64 values.
+
+       Raises:
+       ValueError: If a value cannot be parsed as a timestamp."""
+
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    try:
+        return pd.to_datetime(values, format='ISO8601')
+    except (ValueError, TypeError):
+        return pd.to_datetime(values, format='mixed')
+
+def split_timestamp(values):
+    """Splits a column of timestamps into separate date and time columns.
+
+       The timestamps are parsed once with `parse_timestamps` and cast to
+       arrow date32 and time64 columns, instead of building a Python date
+       and time object per row with `.dt.date` and `.dt.time`. Both are
+       written to parquet as DATE and TIME, as before.
+
+       Args:
+       values: A pandas series of timestamp strings or datetimes.
+
+       Returns:
+       A (dates, times) tuple of pandas series with the index of `values`."""
+
+    dates, times = split_timestamp_array(pa.array(parse_timestamps(values), from_pandas=True))
+    return (
+        pd.Series(pd.arrays.ArrowExtensionArray(dates), index=values.index),
+        pd.Series(pd.arrays.ArrowExtensionArray(times), index=values.index),
+    )
+
+def split_timestamp_array(timestamps):
+    """Splits an arrow array of timestamps into date32 and time64('us') arrays.
+
+       Time zone aware timestamps are first converted to their local time, as
+       pandas' `.dt.date` and `.dt.time` would.
+
+       Args:
+       timestamps: A pyarrow array or chunked array of timestamps.
+
+       Returns:
+       A (dates, times) tuple of pyarrow arrays."""
+
+    if pa.types.is_timestamp(timestamps.type) and timestamps.type.tz is not None:
+        timestamps = pc.local_timestamp(timestamps)
+    dates = pc.cast(timestamps, pa.date32())
+    times = pc.cast(timestamps, pa.time64('us'), safe=False)
+    return dates, times
+
+def to_dates(values):
+    """Parses a column of dates ('2022-11-07') into an arrow date32 column.
+
+       Args:
+       values: A pandas series of date strings, dates or datetimes.
+
+       Returns:
+       A pandas series of dates with the index of `values`."""
+
+    dates, _ = split_timestamp(values)
+    return dates
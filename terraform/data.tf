@@ -9,12 +9,21 @@ data "terraform_remote_state" "s3" {
 
 data "aws_iam_policy_document" "s3_document" {
   statement {
-    actions = ["s3:PutObject", "s3:GetObject"]
+    actions = ["s3:PutObject", "s3:GetObject", "s3:AbortMultipartUpload"]
     resources = [
       "${data.terraform_remote_state.s3.outputs.s3_ingestion_bucket_arn}/*",
       "${data.terraform_remote_state.s3.outputs.s3_transform_bucket_arn}/*"
     ]
   }
+  # ListBucket lets GetObject report NoSuchKey (rather than AccessDenied) for
+  # state objects that have not been written yet.
+  statement {
+    actions = ["s3:ListBucket"]
+    resources = [
+      data.terraform_remote_state.s3.outputs.s3_ingestion_bucket_arn,
+      data.terraform_remote_state.s3.outputs.s3_transform_bucket_arn
+    ]
+  }
 }
 
 data "aws_s3_bucket" "s3_ingestion_bucket" {
@@ -10,6 +10,9 @@ resource "null_resource" "prepare_layer_files" {
     helper_file_hash_1 = filebase64sha256("${path.module}/../src/ingestion_utils/database_utils.py")
     helper_file_hash_2 = filebase64sha256("${path.module}/../src/ingestion_utils/file_utils.py")
     helper_file_hash_3 = filebase64sha256("${path.module}/../src/helpers.py")
+    helper_file_hash_4 = filebase64sha256("${path.module}/../src/ingestion_utils/watermark_utils.py")
+    helper_file_hash_5 = filebase64sha256("${path.module}/../src/ingestion_utils/cdc_utils.py")
+    helper_file_hash_6 = filebase64sha256("${path.module}/../src/transform_utils/column_manifest.py")
     
 }
 
@@ -21,6 +24,10 @@ resource "null_resource" "prepare_layer_files" {
       cp "${path.module}/../src/helpers.py" "$LAYER_PATH/helpers.py"
       cp "${path.module}/../src/ingestion_utils/database_utils.py" "$LAYER_PATH/ingestion_utils/database_utils.py"
       cp "${path.module}/../src/ingestion_utils/file_utils.py" "$LAYER_PATH/ingestion_utils/file_utils.py"
+      cp "${path.module}/../src/ingestion_utils/watermark_utils.py" "$LAYER_PATH/ingestion_utils/watermark_utils.py"
+      cp "${path.module}/../src/ingestion_utils/cdc_utils.py" "$LAYER_PATH/ingestion_utils/cdc_utils.py"
+      mkdir -p "$LAYER_PATH/transform_utils"
+      cp "${path.module}/../src/transform_utils/column_manifest.py" "$LAYER_PATH/transform_utils/column_manifest.py"
 
       pip install --no-cache-dir pg8000 --target "$LAYER_PATH"
     EOT
@@ -62,7 +69,7 @@ resource "aws_lambda_function" "ingestion_handler" {
   s3_key           = aws_s3_object.lambda_code.key
   source_code_hash = data.archive_file.ingestion_lambda.output_base64sha256
   role             = aws_iam_role.lambda_role.arn
-  layers           = [aws_lambda_layer_version.helper_lambda_layer.arn]
+  layers           = [aws_lambda_layer_version.helper_lambda_layer.arn, "arn:aws:lambda:eu-west-2:336392948345:layer:AWSSDKPandas-Python312:16"] #pyarrow for parquet/arrow output
   handler          = "lambda_ingest.lambda_handler"
   runtime          = "python3.12"
   timeout          = 60
@@ -70,6 +77,12 @@ resource "aws_lambda_function" "ingestion_handler" {
   environment {
     variables = {
       BUCKET_NAME = data.aws_s3_bucket.s3_ingestion_bucket.bucket
+      EXTRACT_BATCH_SIZE = 10000
+      STREAM_UPLOAD = "true"
+      EXTRACT_MAX_WORKERS = 4
+      INGEST_OUTPUT_FORMAT = "csv.gz"
+      FACT_CHUNK_SIZE = 50000
+      INGEST_MODE = "poll"
     }
   }
 }
@@ -93,6 +106,13 @@ resource "null_resource" "prepare_layer_files_transform" {
     helper_file_hash_11 = filebase64sha256("${path.module}/../src/transform_utils/dim_transaction.py")
     helper_file_hash_12 = filebase64sha256("${path.module}/../src/transform_utils/dim_payment_type.py")
     helper_file_hash_13 = filebase64sha256("${path.module}/../src/transform_utils/fact_purchase_order.py")
+    helper_file_hash_14 = filebase64sha256("${path.module}/../src/transform_utils/column_manifest.py")
+    helper_file_hash_15 = filebase64sha256("${path.module}/../src/transform_utils/dim_cache.py")
+    helper_file_hash_16 = filebase64sha256("${path.module}/../src/transform_utils/temporal.py")
+    helper_file_hash_17 = filebase64sha256("${path.module}/../src/transform_utils/currency_names.json")
+    helper_file_hash_18 = filebase64sha256("${path.module}/../src/transform_utils/arrow_engine.py")
+    helper_file_hash_19 = filebase64sha256("${path.module}/../src/transform_utils/incremental_joins.py")
+    helper_file_hash_20 = filebase64sha256("${path.module}/../src/transform_utils/streaming.py")
     
 }
 
@@ -114,6 +134,13 @@ resource "null_resource" "prepare_layer_files_transform" {
       cp "${path.module}/../src/transform_utils/dim_transaction.py" "$LAYER_PATH/transform_utils/dim_transaction.py"
       cp "${path.module}/../src/transform_utils/dim_payment_type.py" "$LAYER_PATH/transform_utils/dim_payment_type.py"
       cp "${path.module}/../src/transform_utils/fact_purchase_order.py" "$LAYER_PATH/transform_utils/fact_purchase_order.py"
+      cp "${path.module}/../src/transform_utils/column_manifest.py" "$LAYER_PATH/transform_utils/column_manifest.py"
+      cp "${path.module}/../src/transform_utils/dim_cache.py" "$LAYER_PATH/transform_utils/dim_cache.py"
+      cp "${path.module}/../src/transform_utils/temporal.py" "$LAYER_PATH/transform_utils/temporal.py"
+      cp "${path.module}/../src/transform_utils/currency_names.json" "$LAYER_PATH/transform_utils/currency_names.json"
+      cp "${path.module}/../src/transform_utils/arrow_engine.py" "$LAYER_PATH/transform_utils/arrow_engine.py"
+      cp "${path.module}/../src/transform_utils/incremental_joins.py" "$LAYER_PATH/transform_utils/incremental_joins.py"
+      cp "${path.module}/../src/transform_utils/streaming.py" "$LAYER_PATH/transform_utils/streaming.py"
 
     EOT
   }
@@ -181,6 +208,8 @@ resource "null_resource" "prepare_layer_files_load" {
     
     helper_file_hash_1 = filebase64sha256("${path.module}/../src/load_utils/write_dataframe_to_dw.py")
     helper_file_hash_2 = filebase64sha256("${path.module}/../src/helpers.py")
+    helper_file_hash_3 = filebase64sha256("${path.module}/../src/load_utils/parquet_stream.py")
+    helper_file_hash_4 = filebase64sha256("${path.module}/../src/transform_utils/dim_cache.py")
     
 }
 
@@ -192,7 +221,10 @@ resource "null_resource" "prepare_layer_files_load" {
       mkdir -p "$LAYER_PATH/ingestion_utils"
       cp "${path.module}/../src/helpers.py" "$LAYER_PATH/helpers.py"
       cp "${path.module}/../src/load_utils/write_dataframe_to_dw.py" "$LAYER_PATH/load_utils/write_dataframe_to_dw.py"
+      cp "${path.module}/../src/load_utils/parquet_stream.py" "$LAYER_PATH/load_utils/parquet_stream.py"
       cp "${path.module}/../src/ingestion_utils/database_utils.py" "$LAYER_PATH/ingestion_utils/database_utils.py"
+      mkdir -p "$LAYER_PATH/transform_utils"
+      cp "${path.module}/../src/transform_utils/dim_cache.py" "$LAYER_PATH/transform_utils/dim_cache.py"
 
     EOT
   }
@@ -248,6 +280,8 @@ resource "aws_lambda_function" "load_handler" {
   environment {
     variables = {
       BUCKET_NAME = data.aws_s3_bucket.s3_transform_bucket.bucket
+      LOAD_ENGINE = "copy"
+      LOAD_STREAM_ROW_GROUPS = "true"
     }
   }
 }
\ No newline at end of file
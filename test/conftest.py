@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The lambda handlers import their layer modules (helpers, ingestion_utils, ...)
+# as top-level packages, as they are laid out in the lambda layers.
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
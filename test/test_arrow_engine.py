@@ -0,0 +1,170 @@
+import datetime
+import pandas as pd
+import pyarrow as pa
+import pytest
+from src.transform_utils import arrow_engine
+from src.transform_utils.dim_staff import util_dim_staff
+from src.transform_utils.dim_counterparty import util_dim_counterparty
+from src.transform_utils.dim_currency import util_dim_currency
+from src.transform_utils.dim_design import util_dim_design
+from src.transform_utils.dim_location import util_dim_location
+from src.transform_utils.dim_payment_type import util_dim_payment_type
+from src.transform_utils.dim_transaction import util_dim_transaction
+from src.transform_utils.fact_sales_order import util_fact_sales_order
+from src.transform_utils.fact_purchase_order import util_fact_purchase_order
+from src.transform_utils.fact_payment import util_fact_payment
+from src.transform_utils.dim_date import date_bounds
+
+TIMESTAMPS = pa.array([
+    datetime.datetime(2022, 11, 3, 14, 20, 52, 186000),
+    datetime.datetime(2023, 1, 1, 0, 0),
+    datetime.datetime(2024, 2, 29, 23, 59, 59, 999000),
+], pa.timestamp('us'))
+
+SOURCE_TABLES = {
+    "staff": pa.table({
+        "staff_id": [1, 2, 3],
+        "first_name": ["Jeremie", "Deron", "Jeanette"],
+        "last_name": ["Franey", "Beier", "Erdman"],
+        "email_address": ["jeremie.franey@terrifictotes.com", "deron.beier@terrifictotes.com", None],
+        "department_id": [2, 9, 2],
+        "last_updated": TIMESTAMPS,
+    }),
+    "department": pa.table({
+        "department_id": [2, 1],
+        "department_name": ["Purchasing", "Sales"],
+        "location": ["Manchester", None],
+    }),
+    "counterparty": pa.table({
+        "counterparty_id": [1, 2, 3],
+        "counterparty_legal_name": ["Fahey and Sons", "Leannon Inc", "Armstrong Inc"],
+        "legal_address_id": [15, 28, 2],
+    }),
+    "address": pa.table({
+        "address_id": [2, 15],
+        "address_line_1": ["179 Alexie Cliffs", "605 Haskell Trafficway"],
+        "address_line_2": [None, "Axel Freeway"],
+        "district": ["Avon", None],
+        "city": ["Aliso Viejo", "East Bobbie"],
+        "postal_code": ["99305-7380", "88253-4257"],
+        "country": ["San Marino", "Heard Island and McDonald Islands"],
+        "phone": ["9621 880720", "9687 937447"],
+        "created_at": TIMESTAMPS[:2],
+        "last_updated": TIMESTAMPS[:2],
+    }),
+    "currency": pa.table({"currency_id": [1, 2, 3], "currency_code": ["GBP", "usd", "XYZ"]}),
+    "design": pa.table({
+        "design_id": [8, 51],
+        "design_name": ["Wooden", "Bronze"],
+        "file_location": ["/usr", "/private"],
+        "file_name": ["wooden-20220717-npgz.json", "bronze-20221024-4dds.json"],
+    }),
+    "payment_type": pa.table({"payment_type_id": [1, 2], "payment_type_name": ["SALES_RECEIPT", "SALES_REFUND"]}),
+    "transaction": pa.table({
+        "transaction_id": [1, 2, 3],
+        "transaction_type": ["PURCHASE", "SALE", "SALE"],
+        "sales_order_id": pa.array([None, 1, 2], pa.int64()),
+        "purchase_order_id": pa.array([2, None, None], pa.int64()),
+    }),
+    "sales_order": pa.table({
+        "sales_order_id": [2, 3, 4],
+        "created_at": TIMESTAMPS,
+        "last_updated": TIMESTAMPS,
+        "staff_id": [19, 10, 10],
+        "counterparty_id": [8, 4, 16],
+        "units_sold": [42972, 65839, 32069],
+        "unit_price": [3.94, 2.915, 3.12],
+        "currency_id": [2, 3, 2],
+        "design_id": [3, 4, 4],
+        "agreed_payment_date": ["2022-11-08", "2022-11-07", "2022-11-06"],
+        "agreed_delivery_date": ["2022-11-07", "2022-11-06", "2022-11-05"],
+        "agreed_delivery_location_id": [8, 19, 15],
+    }),
+    "purchase_order": pa.table({
+        "purchase_order_id": [1, 2, 3],
+        "created_at": TIMESTAMPS,
+        "last_updated": TIMESTAMPS,
+        "staff_id": [12, 20, 12],
+        "counterparty_id": [11, 17, 15],
+        "item_code": ["ZDOI5EA", "QLZLEXR", "AN3D85L"],
+        "item_quantity": [371, 286, 839],
+        "item_unit_price": [361.39, 199.04, 658.58],
+        "currency_id": [2, 2, 2],
+        "agreed_delivery_date": ["2022-11-09", "2022-11-04", "2022-11-05"],
+        "agreed_payment_date": ["2022-11-07", "2022-11-07", "2022-11-04"],
+        "agreed_delivery_location_id": [6, 8, 16],
+    }),
+    "payment": pa.table({
+        "payment_id": [2, 3, 5],
+        "created_at": TIMESTAMPS,
+        "last_updated": TIMESTAMPS,
+        "transaction_id": [2, 3, 5],
+        "counterparty_id": [15, 18, 17],
+        "payment_amount": [552548.62, 205952.22, 57067.20],
+        "currency_id": [2, 3, 2],
+        "payment_type_id": [3, 1, 3],
+        "paid": [False, False, True],
+        "payment_date": ["2022-11-04", "2022-11-03", "2022-11-06"],
+    }),
+}
+
+UTILS = [
+    (util_dim_staff, arrow_engine.arrow_dim_staff, ["staff", "department"]),
+    (util_dim_counterparty, arrow_engine.arrow_dim_counterparty, ["counterparty", "address"]),
+    (util_dim_currency, arrow_engine.arrow_dim_currency, ["currency"]),
+    (util_dim_design, arrow_engine.arrow_dim_design, ["design"]),
+    (util_dim_location, arrow_engine.arrow_dim_location, ["address"]),
+    (util_dim_payment_type, arrow_engine.arrow_dim_payment_type, ["payment_type"]),
+    (util_dim_transaction, arrow_engine.arrow_dim_transaction, ["transaction"]),
+    (util_fact_sales_order, arrow_engine.arrow_fact_sales_order, ["sales_order"]),
+    (util_fact_purchase_order, arrow_engine.arrow_fact_purchase_order, ["purchase_order"]),
+    (util_fact_payment, arrow_engine.arrow_fact_payment, ["payment"]),
+]
+
+def as_written(df):
+    return pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(None)
+
+@pytest.mark.parametrize("pandas_util, arrow_util, tables", UTILS, ids=[util.__name__ for util, _, _ in UTILS])
+class TestArrowEngineMatchesPandas:
+
+    def test_typed_sources_give_identical_output(self, pandas_util, arrow_util, tables):
+        sources = [SOURCE_TABLES[table] for table in tables]
+
+        expected = as_written(pandas_util(*[source.to_pandas() for source in sources]))
+
+        assert arrow_util(*sources).equals(expected)
+
+    def test_csv_sources_without_sidecar_give_identical_output(self, pandas_util, arrow_util, tables, tmp_path):
+        dfs = []
+        for table in tables:
+            path = tmp_path / f"{table}.csv"
+            SOURCE_TABLES[table].to_pandas().to_csv(path, index=False)
+            dfs.append(pd.read_csv(path))
+
+        expected = as_written(pandas_util(*dfs))
+
+        assert arrow_util(*[pa.Table.from_pandas(df, preserve_index=False) for df in dfs]).equals(expected)
+
+    def test_missing_columns_give_same_message(self, pandas_util, arrow_util, tables):
+        sources = [SOURCE_TABLES[table] for table in tables]
+        sources[0] = sources[0].drop_columns([sources[0].column_names[0]])
+
+        assert arrow_util(*sources) == pandas_util(*[source.to_pandas() for source in sources])
+
+    def test_empty_source_gives_same_message(self, pandas_util, arrow_util, tables):
+        sources = [SOURCE_TABLES[table].slice(0, 0) for table in tables]
+
+        assert arrow_util(*sources) == pandas_util(*[source.to_pandas() for source in sources])
+
+class TestArrowEngineTables:
+
+    def test_join_keeps_source_row_order(self):
+        output = arrow_engine.arrow_dim_counterparty(SOURCE_TABLES["counterparty"], SOURCE_TABLES["address"])
+
+        assert output["counterparty_id"].to_pylist() == [1, 2, 3]
+        assert output["counterparty_legal_city"].to_pylist() == ["East Bobbie", None, "Aliso Viejo"]
+
+    def test_date_bounds_reads_arrow_tables(self):
+        output = arrow_engine.arrow_fact_payment(SOURCE_TABLES["payment"])
+
+        assert date_bounds([output]) == (pd.Timestamp('2022-11-03'), pd.Timestamp('2024-02-29'))
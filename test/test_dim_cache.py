@@ -0,0 +1,80 @@
+import pytest
+import boto3
+import json
+import os
+from moto import mock_aws
+from src.transform_utils.dim_cache import DimCache, DimDateState, CACHE_VERSION
+
+@pytest.fixture(scope="function", autouse=True)
+def aws_credentials():
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "eu-west-2"
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        s3 = boto3.client('s3')
+        for bucket in ('ingestion-bucket', 'transformed-bucket'):
+            s3.create_bucket(Bucket=bucket, CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'})
+        yield s3
+
+class TestDimCache:
+    def test_same_content_under_new_keys_reuses_previous_output(self, s3):
+        s3.put_object(Bucket='ingestion-bucket', Key='run1/staff.csv', Body='staff_id\n1\n')
+        s3.put_object(Bucket='ingestion-bucket', Key='run2/staff.csv', Body='staff_id\n1\n')
+        first = DimCache(s3, 'transformed-bucket')
+        versions = first.input_versions('ingestion-bucket', {'staff': 'run1/staff.csv'})
+        assert first.check('dim_staff', versions) is None
+        first.commit({'dim_staff': 'run1/dim_staff.parquet'})
+
+        second = DimCache(s3, 'transformed-bucket')
+        versions = second.input_versions('ingestion-bucket', {'staff': 'run2/staff.csv'})
+
+        assert second.check('dim_staff', versions) == 'run1/dim_staff.parquet'
+
+    def test_changed_content_rebuilds(self, s3):
+        s3.put_object(Bucket='ingestion-bucket', Key='run1/staff.csv', Body='staff_id\n1\n')
+        s3.put_object(Bucket='ingestion-bucket', Key='run2/staff.csv', Body='staff_id\n2\n')
+        first = DimCache(s3, 'transformed-bucket')
+        first.check('dim_staff', first.input_versions('ingestion-bucket', {'staff': 'run1/staff.csv'}))
+        first.commit({'dim_staff': 'run1/dim_staff.parquet'})
+
+        second = DimCache(s3, 'transformed-bucket')
+
+        assert second.check('dim_staff', second.input_versions('ingestion-bucket', {'staff': 'run2/staff.csv'})) is None
+
+    def test_missing_input_is_never_cached(self, s3):
+        cache = DimCache(s3, 'transformed-bucket')
+        versions = cache.input_versions('ingestion-bucket', {'staff': 'missing.csv'})
+        cache.check('dim_staff', versions)
+        cache.commit({'dim_staff': 'run1/dim_staff.parquet'})
+
+        assert versions == {'staff': None}
+        assert DimCache(s3, 'transformed-bucket').load() == {}
+
+    def test_part_prefix_versions_combine_part_etags(self, s3):
+        s3.put_object(Bucket='ingestion-bucket', Key='run1/staff/part-00001.csv', Body='staff_id\n1\n')
+        cache = DimCache(s3, 'transformed-bucket')
+        before = cache.input_versions('ingestion-bucket', {'staff': 'run1/staff/'})
+        s3.put_object(Bucket='ingestion-bucket', Key='run1/staff/part-00002.csv', Body='staff_id\n2\n')
+
+        assert before != cache.input_versions('ingestion-bucket', {'staff': 'run1/staff/'})
+
+    def test_index_from_other_cache_version_is_ignored(self, s3):
+        s3.put_object(Bucket='transformed-bucket', Key='_state/dim_cache.json', Body=json.dumps(
+            {'version': CACHE_VERSION - 1, 'dims': {'dim_date': {'inputs': {}, 'key': 'old/dim_date.parquet'}}}))
+
+        assert DimCache(s3, 'transformed-bucket').check('dim_date', {}) is None
+
+class TestDimDateState:
+    def test_missing_state_loads_none(self, s3):
+        assert DimDateState(s3, 'transformed-bucket').load() is None
+
+    def test_saved_range_is_loaded(self, s3):
+        import pandas as pd
+        DimDateState(s3, 'transformed-bucket').save((pd.Timestamp('2022-01-01'), pd.Timestamp('2026-12-31')))
+
+        assert DimDateState(s3, 'transformed-bucket').load() == ('2022-01-01', '2026-12-31')
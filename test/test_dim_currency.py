@@ -1,4 +1,5 @@
 from src.transform_utils.dim_currency import *
+import json
 import pandas as pd
 import pytest
 
@@ -73,3 +74,57 @@ class TestDimCurrencyErrorHandling:
         response = util_dim_currency(test_df_currency)
 
         assert response == "Error: Missing columns currency_code from the source dataframe"
+
+class TestCurrencyNames:
+
+    @pytest.fixture(autouse=True)
+    def local_cache(self, tmp_path, monkeypatch):
+        cache_path = tmp_path / "currency_names.json"
+        monkeypatch.setattr("src.transform_utils.dim_currency.CACHED_NAMES_PATH", str(cache_path))
+        load_currency_names.cache_clear()
+        yield cache_path
+        load_currency_names.cache_clear()
+
+    def test_does_not_call_network(self, monkeypatch):
+
+        def fail(*args, **kwargs):
+            raise AssertionError("network call made")
+
+        monkeypatch.setattr("requests.get", fail)
+        data = [[1, 'GBP'], [2, 'XYZ']]
+
+        response = util_dim_currency(pd.DataFrame(data, columns=["currency_id", "currency_code"]))
+
+        assert response['currency_name'].tolist() == ["British Pound", "XYZ"]
+
+    def test_names_are_memoized(self):
+
+        assert load_currency_names() is load_currency_names()
+
+    def test_refresh_writes_cache_used_by_lookup(self, local_cache, monkeypatch):
+
+        class Response:
+            def raise_for_status(self):
+                pass
+
+            def json(self):
+                return {"gbp": "Pound Sterling", "xyz": "Test Dollar"}
+
+        monkeypatch.setattr("requests.get", lambda **kwargs: Response())
+        load_currency_names()
+
+        assert refresh_currency_names() is True
+        assert json.loads(local_cache.read_text()) == {"gbp": "Pound Sterling", "xyz": "Test Dollar"}
+        assert load_currency_names()["gbp"] == "Pound Sterling"
+        assert load_currency_names()["usd"] == "US Dollar"
+
+    def test_failed_refresh_keeps_bundled_names(self, local_cache, monkeypatch):
+
+        def fail(**kwargs):
+            raise ConnectionError("no network")
+
+        monkeypatch.setattr("requests.get", fail)
+
+        assert refresh_currency_names() is False
+        assert not local_cache.exists()
+        assert load_currency_names()["eur"] == "Euro"
@@ -23,4 +23,47 @@ class TestDimDate:
         output = util_dim_date('2022-01-01', '2022-01-31')
         assert output['date_id'].iloc[0] == pd.Timestamp('2022-01-01')
         assert output['year'].iloc[0] == 2022
-        assert output['day_name'].iloc[0] == 'Saturday'
\ No newline at end of file
+        assert output['day_name'].iloc[0] == 'Saturday'
+
+
+class TestExtendDimDate:
+
+    def test_first_build_covers_whole_years(self):
+        output, covered = extend_dim_date(None, '2022-03-04', '2023-06-01')
+
+        assert covered == (pd.Timestamp('2022-01-01'), pd.Timestamp('2023-12-31'))
+        assert len(output) == 730
+        assert output['date_id'].iloc[-1] == pd.Timestamp('2023-12-31')
+
+    def test_covered_range_emits_no_rows(self):
+        output, covered = extend_dim_date(('2022-01-01', '2025-12-31'), '2022-01-01', '2025-06-30')
+
+        assert output is None
+        assert covered == (pd.Timestamp('2022-01-01'), pd.Timestamp('2025-12-31'))
+
+    def test_later_dates_emit_only_new_rows(self):
+        output, covered = extend_dim_date(('2022-01-01', '2025-12-31'), '2022-01-01', '2026-02-01')
+
+        assert covered == (pd.Timestamp('2022-01-01'), pd.Timestamp('2026-12-31'))
+        assert output['date_id'].iloc[0] == pd.Timestamp('2026-01-01')
+        assert len(output) == 365
+        pd.testing.assert_frame_equal(output, util_dim_date('2026-01-01', '2026-12-31'))
+
+    def test_earlier_dates_emit_only_new_rows(self):
+        output, covered = extend_dim_date(('2022-01-01', '2025-12-31'), '2021-07-01', '2025-01-01')
+
+        assert covered == (pd.Timestamp('2021-01-01'), pd.Timestamp('2025-12-31'))
+        assert output['date_id'].tolist() == list(pd.date_range('2021-01-01', '2021-12-31'))
+
+
+class TestDateBounds:
+
+    def test_returns_earliest_and_latest_date_column_values(self):
+        df_fact = pd.DataFrame({'created_date': ['2023-05-01', '2023-05-02'],
+                                'payment_date': ['2024-01-09', None],
+                                'created_time': ['2099-01-01', '2099-01-01']})
+
+        assert date_bounds([df_fact]) == (pd.Timestamp('2023-05-01'), pd.Timestamp('2024-01-09'))
+
+    def test_no_dates_returns_none(self):
+        assert date_bounds([pd.DataFrame({'units_sold': [1]})]) is None
@@ -3,7 +3,7 @@ import os
 import boto3
 from unittest import mock
 from moto import mock_aws
-from src.helpers import fetch_credentials, export_db_creds_to_env
+from src.helpers import fetch_credentials, fetch_credentials_cached, clear_credential_cache, export_db_creds_to_env, S3MultipartWriter, MIN_PART_SIZE, run_concurrently
 
 
 @pytest.fixture(scope="function", autouse=True)
@@ -53,6 +53,38 @@ class TestFetchCredentials:
             fetch_credentials(secrets_client, secret_name)
 
 
+class TestFetchCredentialsCached:
+    def setup_method(self):
+        clear_credential_cache()
+
+    def teardown_method(self):
+        clear_credential_cache()
+
+    def test_giving_repeated_calls_within_ttl_then_secret_fetched_once(self, secrets_client):
+        secrets_client.create_secret(Name="database", SecretString=str({"password": "first"}))
+        with mock.patch.object(secrets_client, "get_secret_value", wraps=secrets_client.get_secret_value) as spy:
+            first = fetch_credentials_cached(secrets_client, "database")
+            second = fetch_credentials_cached(secrets_client, "database")
+
+        assert first == second == {"password": "first"}
+        spy.assert_called_once()
+
+    def test_giving_expired_ttl_then_secret_fetched_again(self, secrets_client):
+        secrets_client.create_secret(Name="database", SecretString=str({"password": "first"}))
+        fetch_credentials_cached(secrets_client, "database", ttl=0)
+        secrets_client.put_secret_value(SecretId="database", SecretString=str({"password": "rotated"}))
+
+        assert fetch_credentials_cached(secrets_client, "database", ttl=0) == {"password": "rotated"}
+
+    def test_giving_cleared_cache_then_secret_fetched_again(self, secrets_client):
+        secrets_client.create_secret(Name="database", SecretString=str({"password": "first"}))
+        fetch_credentials_cached(secrets_client, "database")
+        secrets_client.put_secret_value(SecretId="database", SecretString=str({"password": "rotated"}))
+        clear_credential_cache("database")
+
+        assert fetch_credentials_cached(secrets_client, "database") == {"password": "rotated"}
+
+
 # Helper function to clear environment variables before and after tests
 def clear_env_vars(keys):
     for key in keys:
@@ -146,3 +178,69 @@ class TestExportDbCredsToEnv:
         assert os.environ.get("PASSWORD") == "test_password"
         assert os.environ.get("HOST") == "localhost"
         assert os.environ.get("EXTRA_KEY") == "extra_value"
+
+
+
+@pytest.fixture()
+def s3_client(aws_credentials):
+    with mock_aws():
+        s3_client = boto3.client("s3")
+        s3_client.create_bucket(
+            Bucket="test-bucket",
+            CreateBucketConfiguration={"LocationConstraint": "eu-west-2"},
+        )
+        yield s3_client
+
+
+class TestS3MultipartWriter:
+    def test_given_small_payload_uploads_single_object(self, s3_client):
+        with S3MultipartWriter(s3_client, "test-bucket", "small.csv") as writer:
+            writer.write(b"col1,col2\r\n")
+            writer.write(b"a,1\r\n")
+
+        body = s3_client.get_object(Bucket="test-bucket", Key="small.csv")["Body"].read()
+        assert body == b"col1,col2\r\na,1\r\n"
+        assert writer.tell() == len(body)
+
+    def test_given_payload_larger_than_part_size_uploads_in_parts(self, s3_client):
+        chunk = b"x" * (MIN_PART_SIZE // 2 + 1)
+        with S3MultipartWriter(s3_client, "test-bucket", "large.csv", part_size=MIN_PART_SIZE) as writer:
+            for _ in range(5):
+                writer.write(chunk)
+
+        response = s3_client.get_object(Bucket="test-bucket", Key="large.csv")
+        assert response["Body"].read() == chunk * 5
+        assert response["ETag"].strip('"').endswith("-3")
+
+    def test_given_exception_inside_context_aborts_upload(self, s3_client):
+        with pytest.raises(RuntimeError):
+            with S3MultipartWriter(s3_client, "test-bucket", "aborted.csv", part_size=MIN_PART_SIZE) as writer:
+                writer.write(b"x" * (MIN_PART_SIZE + 1))
+                raise RuntimeError("extraction failed")
+
+        assert "Contents" not in s3_client.list_objects_v2(Bucket="test-bucket")
+        assert "Uploads" not in s3_client.list_multipart_uploads(Bucket="test-bucket")
+
+    def test_given_part_size_below_minimum_raises_ValueError(self, s3_client):
+        with pytest.raises(ValueError):
+            S3MultipartWriter(s3_client, "test-bucket", "key", part_size=1024)
+
+
+class TestRunConcurrently:
+    def test_given_tasks_returns_results_in_task_order(self):
+        results, errors = run_concurrently({"b": lambda: 2, "a": lambda: 1}, max_workers=2)
+
+        assert list(results.items()) == [("b", 2), ("a", 1)]
+        assert errors == {}
+
+    def test_given_failing_task_returns_its_error_and_other_results(self):
+        def fail():
+            raise ValueError("bad table")
+
+        results, errors = run_concurrently({"ok": lambda: 1, "bad": fail})
+
+        assert results == {"ok": 1}
+        assert isinstance(errors["bad"], ValueError)
+
+    def test_given_no_tasks_returns_empty_dicts(self):
+        assert run_concurrently({}) == ({}, {})
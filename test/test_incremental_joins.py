@@ -0,0 +1,180 @@
+import pytest
+import boto3
+import os
+import pandas as pd
+from moto import mock_aws
+from unittest.mock import MagicMock
+from src.transform_utils.incremental_joins import JoinSnapshots, upsert_rows, row_hashes
+from src.transform_utils.dim_counterparty import util_dim_counterparty
+from src.transform_utils.dim_staff import util_dim_staff
+
+@pytest.fixture(scope="function", autouse=True)
+def aws_credentials():
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "eu-west-2"
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket='transformed-bucket', CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'})
+        yield s3
+
+@pytest.fixture
+def counterparty():
+    return pd.DataFrame({
+        "counterparty_id": [1, 2, 3],
+        "counterparty_legal_name": ["Fahey and Sons", "Leannon Inc", "Armstrong Inc"],
+        "legal_address_id": [15, 28, 15],
+        "last_updated": ["2022-11-03 14:20:51.563"] * 3,
+    })
+
+@pytest.fixture
+def address():
+    return pd.DataFrame({
+        "address_id": [15, 28, 30],
+        "address_line_1": ["605 Haskell Trafficway", "079 Horacio Landing", "0336 Ruthe Heights"],
+        "address_line_2": ["Axel Freeway", None, None],
+        "district": [None, None, "Buckinghamshire"],
+        "city": ["East Bobbie", "Utica", "Lake Myrlfurt"],
+        "postal_code": ["88253-4257", "93045", "94545-4284"],
+        "country": ["Heard Island and McDonald Islands", "Austria", "Falkland Islands (Malvinas)"],
+        "phone": ["9687 937447", "7772 084705", "1083 286132"],
+        "created_at": ["2022-11-03 14:20:49.962"] * 3,
+        "last_updated": ["2022-11-03 14:20:49.962"] * 3,
+    })
+
+def first_build(s3, counterparty, address):
+    snapshots = JoinSnapshots(s3, 'transformed-bucket')
+    output = snapshots.build('dim_counterparty', util_dim_counterparty, counterparty, address, complete=['counterparty', 'address'])
+    snapshots.commit()
+    return output
+
+class TestJoinSnapshots:
+    def test_without_snapshot_builds_every_row(self, s3, counterparty, address):
+        output = first_build(s3, counterparty, address)
+
+        pd.testing.assert_frame_equal(output, util_dim_counterparty(counterparty, address))
+
+    def test_changed_child_emits_only_parents_referencing_it(self, s3, counterparty, address):
+        first_build(s3, counterparty, address)
+        changed_address = address[address["address_id"] == 15].assign(city="Bobbieville", last_updated="2022-11-04 09:00:00")
+
+        output = JoinSnapshots(s3, 'transformed-bucket').build('dim_counterparty', util_dim_counterparty, pd.DataFrame(), changed_address)
+
+        assert output["counterparty_id"].tolist() == [1, 3]
+        assert output["counterparty_legal_city"].tolist() == ["Bobbieville", "Bobbieville"]
+
+    def test_changed_parent_emits_only_that_row(self, s3, counterparty, address):
+        first_build(s3, counterparty, address)
+        changed_counterparty = counterparty[counterparty["counterparty_id"] == 2].assign(legal_address_id=30)
+
+        output = JoinSnapshots(s3, 'transformed-bucket').build('dim_counterparty', util_dim_counterparty, changed_counterparty, pd.DataFrame())
+
+        assert output["counterparty_id"].tolist() == [2]
+        assert output["counterparty_legal_city"].tolist() == ["Lake Myrlfurt"]
+
+    def test_unchanged_full_tables_emit_nothing(self, s3, counterparty, address):
+        first_build(s3, counterparty, address)
+
+        assert JoinSnapshots(s3, 'transformed-bucket').build('dim_counterparty', util_dim_counterparty, counterparty, address) is None
+
+    def test_change_to_unreferenced_or_unused_columns_emits_nothing(self, s3, counterparty, address):
+        first_build(s3, counterparty, address)
+        changed_address = address.assign(last_updated="2022-11-05 10:00:00")
+        changed_address.loc[changed_address["address_id"] == 30, "city"] = "Elsewhere"
+
+        assert JoinSnapshots(s3, 'transformed-bucket').build('dim_counterparty', util_dim_counterparty, pd.DataFrame(), changed_address) is None
+
+    def test_snapshot_is_only_saved_on_commit(self, s3, counterparty, address):
+        JoinSnapshots(s3, 'transformed-bucket').build('dim_counterparty', util_dim_counterparty, counterparty, address, complete=['counterparty', 'address'])
+
+        assert s3.list_objects_v2(Bucket='transformed-bucket').get('KeyCount') == 0
+
+    def test_staff_moved_department_emits_only_that_staff(self, s3):
+        staff = pd.DataFrame({"staff_id": [1, 2], "first_name": ["Jeremie", "Deron"], "last_name": ["Franey", "Beier"],
+                              "email_address": ["jeremie.franey@terrifictotes.com", "deron.beier@terrifictotes.com"], "department_id": [2, 6]})
+        department = pd.DataFrame({"department_id": [2, 6], "department_name": ["Purchasing", "Facilities"], "location": ["Manchester", "Manchester"]})
+        snapshots = JoinSnapshots(s3, 'transformed-bucket')
+        snapshots.build('dim_staff', util_dim_staff, staff, department, complete=['staff', 'department'])
+        snapshots.commit()
+
+        output = JoinSnapshots(s3, 'transformed-bucket').build('dim_staff', util_dim_staff, staff[staff["staff_id"] == 2].assign(department_id=2), pd.DataFrame())
+
+        assert output.to_dict('records') == [{"staff_id": 2, "first_name": "Deron", "last_name": "Beier",
+                                              "email_address": "deron.beier@terrifictotes.com", "department_name": "Purchasing", "location": "Manchester"}]
+
+    def test_failing_util_does_not_stage_snapshot(self, s3, counterparty, address):
+        first_build(s3, counterparty, address)
+        snapshots = JoinSnapshots(s3, 'transformed-bucket')
+        changed_counterparty = counterparty[counterparty["counterparty_id"] == 2].assign(legal_address_id=30)
+
+        with pytest.raises(KeyError):
+            snapshots.build('dim_counterparty', MagicMock(side_effect=KeyError("city")), changed_counterparty, pd.DataFrame())
+        snapshots.commit()
+
+        snapshot = JoinSnapshots(s3, 'transformed-bucket')._load('dim_counterparty', 'counterparty', pd.DataFrame(), ())
+        assert snapshot.sort_values("counterparty_id")["legal_address_id"].tolist() == [15, 28, 15]
+
+    def test_without_snapshot_changed_rows_only_raise(self, s3, counterparty, address):
+        snapshots = JoinSnapshots(s3, 'transformed-bucket')
+
+        with pytest.raises(ValueError, match="no dim_counterparty snapshot of address"):
+            snapshots.build('dim_counterparty', util_dim_counterparty, counterparty, address.iloc[:1], complete=['counterparty'])
+        snapshots.commit()
+
+        assert s3.list_objects_v2(Bucket='transformed-bucket').get('KeyCount') == 0
+
+class TestUpsertRows:
+    def test_returns_updated_table_and_changed_keys(self):
+        previous = pd.DataFrame({"id": [1, 2], "value": ["a", "b"]})
+        received = pd.DataFrame({"id": [2, 3, 1], "value": ["c", "d", "a"]})
+
+        table, changed = upsert_rows(previous, received, "id")
+
+        assert changed == [2, 3]
+        assert table.sort_values("id")["value"].tolist() == ["a", "c", "d"]
+
+    def test_row_hashes_ignore_int_and_float_representations(self):
+        as_ints = pd.DataFrame({"id": [1, 2], "value": ["a", None]})
+        as_floats = pd.DataFrame({"id": [1.0, 2.0], "value": ["a", None]})
+
+        assert row_hashes(as_ints).tolist() == row_hashes(as_floats).tolist()
+
+class TestSnapshotColumnMismatch:
+    def test_dropped_column_keeps_snapshot_rows(self, s3, counterparty, address):
+        first_build(s3, counterparty, address)
+        changed_counterparty = counterparty[counterparty["counterparty_id"] == 2].drop(columns="last_updated").assign(legal_address_id=30)
+
+        snapshots = JoinSnapshots(s3, 'transformed-bucket')
+        output = snapshots.build('dim_counterparty', util_dim_counterparty, changed_counterparty, pd.DataFrame())
+
+        assert output["counterparty_id"].tolist() == [2]
+        assert sorted(snapshots._pending['dim_counterparty']['counterparty']["counterparty_id"]) == [1, 2, 3]
+
+    def test_added_column_with_changed_rows_only_raises_and_keeps_snapshot(self, s3, counterparty, address):
+        first_build(s3, counterparty, address)
+        changed_address = address[address["address_id"] == 15].assign(region="North")
+
+        snapshots = JoinSnapshots(s3, 'transformed-bucket')
+        with pytest.raises(ValueError, match="Extract address in full"):
+            snapshots.build('dim_counterparty', util_dim_counterparty, pd.DataFrame(), changed_address)
+        snapshots.commit()
+
+        snapshot = JoinSnapshots(s3, 'transformed-bucket')._load('dim_counterparty', 'address', pd.DataFrame(), ())
+        assert sorted(snapshot["address_id"]) == [15, 28, 30]
+        assert "region" not in snapshot.columns
+
+    def test_added_column_with_complete_extract_rebuilds_every_row(self, s3, counterparty, address):
+        first_build(s3, counterparty, address)
+        full_address = address.assign(region="North")
+
+        snapshots = JoinSnapshots(s3, 'transformed-bucket')
+        output = snapshots.build('dim_counterparty', util_dim_counterparty, pd.DataFrame(), full_address, complete=['address'])
+
+        pd.testing.assert_frame_equal(output, util_dim_counterparty(counterparty, address))
+        assert sorted(snapshots._pending['dim_counterparty']['counterparty']["counterparty_id"]) == [1, 2, 3]
+        assert "region" in snapshots._pending['dim_counterparty']['address'].columns
@@ -0,0 +1,185 @@
+import pytest
+import json
+import os
+from decimal import Decimal
+from unittest.mock import MagicMock
+from pg8000.native import Connection
+from src.ingestion_utils.cdc_utils import ensure_replication_slot, peek_changes, advance_slot, group_changes_by_table
+
+def change(action, table, columns=None, identity=None):
+    document = {"action": action, "schema": "public", "table": table}
+    if columns is not None:
+        document["columns"] = [{"name": name, "type": "integer", "typeoid": oid, "value": value} for name, oid, value in columns]
+    if identity is not None:
+        document["identity"] = [{"name": name, "type": "integer", "typeoid": oid, "value": value} for name, oid, value in identity]
+    return document
+
+class TestEnsureReplicationSlot:
+    def test_giving_missing_slot_when_ensure_replication_slot_then_creates_slot(self):
+        mock_conn = MagicMock()
+        mock_conn.run.side_effect = [[], [["totes_ingest", "0/16B3748"]]]
+
+        assert ensure_replication_slot(mock_conn, "totes_ingest") is True
+        assert mock_conn.run.call_args.args[0] == "SELECT * FROM pg_create_logical_replication_slot('totes_ingest', 'wal2json');"
+
+    def test_giving_existing_slot_when_ensure_replication_slot_then_does_nothing(self):
+        mock_conn = MagicMock()
+        mock_conn.run.return_value = [[1]]
+
+        assert ensure_replication_slot(mock_conn, "totes_ingest") is False
+        assert mock_conn.run.call_count == 1
+
+class TestPeekChanges:
+    def test_giving_tables_when_peek_changes_then_filters_and_decodes_changes(self):
+        mock_conn = MagicMock()
+        mock_conn.run.return_value = [["0/16B3748", json.dumps({"action": "B"})]]
+
+        changes = peek_changes(mock_conn, "totes_ingest", tables=["sales_order", "payment"], max_changes=50)
+
+        assert changes == [["0/16B3748", {"action": "B"}]]
+        query = mock_conn.run.call_args.args[0]
+        assert query == (
+            "SELECT lsn::text, data FROM pg_logical_slot_peek_changes('totes_ingest', NULL, 50, "
+            "'format-version', '2', 'include-type-oids', '1', 'add-tables', 'public.sales_order,public.payment');"
+        )
+
+    def test_giving_database_error_when_peek_changes_then_raises_exception(self):
+        mock_conn = MagicMock()
+        mock_conn.run.side_effect = Exception("replication slot does not exist")
+
+        with pytest.raises(Exception) as excinfo:
+            peek_changes(mock_conn)
+
+        assert "Error reading replication slot" in str(excinfo.value)
+
+    def test_giving_numeric_change_when_peek_changes_then_parses_it_as_decimal(self):
+        mock_conn = MagicMock()
+        mock_conn.run.return_value = [["0/2", '{"action": "I", "columns": [{"name": "payment_amount", "value": 1234567890.123456789}]}']]
+
+        changes = peek_changes(mock_conn)
+
+        assert changes[0][1]["columns"][0]["value"] == Decimal("1234567890.123456789")
+
+
+class TestAdvanceSlot:
+    def test_giving_lsn_when_advance_slot_then_advances_to_lsn(self):
+        mock_conn = MagicMock()
+
+        advance_slot(mock_conn, "0/16B3748", "totes_ingest")
+
+        assert mock_conn.run.call_args.args[0] == "SELECT * FROM pg_replication_slot_advance('totes_ingest', '0/16B3748'::pg_lsn);"
+
+class TestGroupChangesByTable:
+    def test_giving_repeated_updates_when_group_changes_by_table_then_keeps_latest_row_per_key(self):
+        changes = [
+            ["0/1", {"action": "B"}],
+            ["0/2", change("I", "staff", columns=[("staff_id", 23, 1), ("department_id", 23, 2)])],
+            ["0/3", change("I", "staff", columns=[("staff_id", 23, 2), ("department_id", 23, 2)])],
+            ["0/4", change("U", "staff", columns=[("staff_id", 23, 1), ("department_id", 23, 3)])],
+            ["0/5", {"action": "C"}],
+        ]
+
+        upserts, deletes = group_changes_by_table(changes)
+
+        assert upserts == {"staff": {"headers": ["staff_id", "department_id"], "body": [[1, 3], [2, 2]], "types": [23, 23], "type_modifiers": [None, None]}}
+        assert deletes == {}
+
+    def test_giving_delete_when_group_changes_by_table_then_row_only_in_deletes(self):
+        changes = [
+            ["0/2", change("I", "payment", columns=[("payment_id", 23, 7), ("amount", 1700, 10.5)])],
+            ["0/3", change("D", "payment", identity=[("payment_id", 23, 7)])],
+            ["0/4", change("D", "payment", identity=[("payment_id", 23, 8)])],
+        ]
+
+        upserts, deletes = group_changes_by_table(changes)
+
+        assert upserts == {}
+        assert deletes == {"payment": {"headers": ["payment_id"], "body": [[7], [8]], "types": [23], "type_modifiers": [None]}}
+
+    def test_giving_columns_in_different_order_when_group_changes_by_table_then_values_follow_their_headers(self):
+        changes = [
+            ["0/2", change("I", "staff", columns=[("staff_id", 23, 1), ("department_id", 23, 2)])],
+            ["0/3", change("I", "staff", columns=[("department_id", 23, 6), ("staff_id", 23, 2)])],
+        ]
+
+        upserts, _ = group_changes_by_table(changes)
+
+        assert upserts["staff"]["headers"] == ["staff_id", "department_id"]
+        assert upserts["staff"]["body"] == [[1, 2], [2, 6]]
+
+    def test_giving_update_without_unchanged_toast_column_when_group_changes_by_table_then_takes_it_from_earlier_image(self):
+        changes = [
+            ["0/2", change("I", "design", columns=[("design_id", 23, 1), ("file_name", 25, "a.json"), ("design_name", 25, "Wooden")])],
+            ["0/3", change("U", "design", columns=[("design_name", 25, "Steel"), ("design_id", 23, 1)])],
+        ]
+
+        upserts, _ = group_changes_by_table(changes)
+
+        assert upserts["design"]["body"] == [[1, "a.json", "Steel"]]
+
+    def test_giving_update_without_unchanged_toast_column_when_group_changes_by_table_then_takes_it_from_old_row_image(self):
+        changes = [
+            ["0/2", change("I", "design", columns=[("design_id", 23, 2), ("file_name", 25, "b.json"), ("design_name", 25, "Soft")])],
+            ["0/3", change("U", "design", columns=[("design_id", 23, 1), ("design_name", 25, "Steel")],
+                           identity=[("design_id", 23, 1), ("file_name", 25, "a.json"), ("design_name", 25, "Wooden")])],
+        ]
+
+        upserts, _ = group_changes_by_table(changes)
+
+        assert upserts["design"]["body"] == [[2, "b.json", "Soft"], [1, "a.json", "Steel"]]
+
+    def test_giving_update_without_toast_column_and_no_image_of_it_when_group_changes_by_table_then_raises(self):
+        changes = [
+            ["0/2", change("I", "design", columns=[("design_id", 23, 2), ("file_name", 25, "b.json"), ("design_name", 25, "Soft")])],
+            ["0/3", change("U", "design", columns=[("design_id", 23, 1), ("design_name", 25, "Steel")])],
+        ]
+
+        with pytest.raises(ValueError, match="design is missing columns file_name"):
+            group_changes_by_table(changes)
+
+    def test_giving_numeric_column_when_group_changes_by_table_then_records_its_precision_and_scale(self):
+        document = change("I", "payment", columns=[("payment_id", 23, 7), ("payment_amount", 1700, None)])
+        document["columns"][1]["type"] = "numeric(10,2)"
+
+        upserts, _ = group_changes_by_table([["0/2", document]])
+
+        assert upserts["payment"]["type_modifiers"] == [None, ((10 << 16) | 2) + 4]
+
+
+@pytest.mark.skipif("CDC_TEST_HOST" not in os.environ, reason="needs a local Postgres with wal_level=logical and wal2json")
+class TestChangeCaptureAgainstPostgres:
+    """Runs against a real database, e.g.
+
+    docker run -e POSTGRES_PASSWORD=postgres -p 5432:5432 debezium/postgres:16 -c wal_level=logical
+    CDC_TEST_HOST=localhost CDC_TEST_PASSWORD=postgres pytest test/test_ingestion_utils_cdc.py
+    """
+
+    @pytest.fixture
+    def conn(self):
+        conn = Connection(
+            os.environ.get("CDC_TEST_USER", "postgres"),
+            password=os.environ.get("CDC_TEST_PASSWORD", "postgres"),
+            host=os.environ["CDC_TEST_HOST"],
+            port=int(os.environ.get("CDC_TEST_PORT", "5432")),
+            database=os.environ.get("CDC_TEST_DBNAME", "postgres"),
+        )
+        conn.run("DROP TABLE IF EXISTS cdc_test;")
+        conn.run("CREATE TABLE cdc_test (cdc_test_id INT PRIMARY KEY, name TEXT);")
+        yield conn
+        conn.run("SELECT pg_drop_replication_slot('cdc_test_slot') FROM pg_replication_slots WHERE slot_name = 'cdc_test_slot';")
+        conn.run("DROP TABLE cdc_test;")
+        conn.close()
+
+    def test_giving_changes_when_read_and_advanced_then_batched_once(self, conn):
+        ensure_replication_slot(conn, "cdc_test_slot")
+        conn.run("INSERT INTO cdc_test VALUES (1, 'a'), (2, 'b');")
+        conn.run("UPDATE cdc_test SET name = 'c' WHERE cdc_test_id = 1;")
+        conn.run("DELETE FROM cdc_test WHERE cdc_test_id = 2;")
+
+        changes = peek_changes(conn, "cdc_test_slot", tables=["cdc_test"])
+        upserts, deletes = group_changes_by_table(changes)
+        advance_slot(conn, changes[-1][0], "cdc_test_slot")
+
+        assert upserts["cdc_test"]["body"] == [[1, "c"]]
+        assert deletes["cdc_test"]["body"] == [[2]]
+        assert peek_changes(conn, "cdc_test_slot", tables=["cdc_test"]) == []
@@ -2,7 +2,7 @@ import pytest
 import boto3
 import os
 from unittest.mock import MagicMock 
-from src.ingestion_utils.database_utils import create_connection, get_recent_additions, get_last_upload_date, put_last_upload_date
+from src.ingestion_utils.database_utils import ConnectionPool, is_connection_alive, create_connection, get_recent_additions, get_recent_additions_batched, get_recent_additions_keyset, has_recent_additions, select_list, get_last_upload_date, put_last_upload_date
 from src.ingestion_utils.file_utils import get_current_time
 from moto import mock_aws
 
@@ -40,6 +40,68 @@ class TestCreateConnection:
         del os.environ['PASSWORD']
         del os.environ['DBNAME']
 
+class TestConnectionPool:
+    def test_giving_sequential_acquires_when_pool_used_then_connection_is_reused(self):
+        factory = MagicMock(side_effect=lambda: MagicMock())
+        pool = ConnectionPool(max_size=2, connection_factory=factory)
+
+        with pool.acquire() as first:
+            pass
+        with pool.acquire() as second:
+            pass
+
+        assert first is second
+        factory.assert_called_once()
+
+    def test_giving_nested_acquires_when_pool_used_then_each_caller_gets_own_connection(self):
+        factory = MagicMock(side_effect=lambda: MagicMock())
+        pool = ConnectionPool(max_size=2, connection_factory=factory)
+
+        with pool.acquire() as first:
+            with pool.acquire() as second:
+                assert first is not second
+
+        assert factory.call_count == 2
+
+    def test_giving_error_while_connection_held_when_pool_used_then_connection_is_discarded(self):
+        factory = MagicMock(side_effect=lambda: MagicMock())
+        pool = ConnectionPool(max_size=1, connection_factory=factory)
+
+        with pytest.raises(RuntimeError):
+            with pool.acquire() as broken:
+                raise RuntimeError("query failed")
+        with pool.acquire() as fresh:
+            pass
+
+        broken.close.assert_called_once()
+        assert fresh is not broken
+
+    def test_giving_dropped_idle_connection_when_liveness_checked_then_reconnects(self):
+        factory = MagicMock(side_effect=lambda: MagicMock())
+        pool = ConnectionPool(max_size=1, connection_factory=factory, check_liveness=True)
+        with pool.acquire() as dropped:
+            pass
+        dropped.run.side_effect = Exception("connection reset")
+
+        with pool.acquire() as fresh:
+            pass
+
+        assert fresh is not dropped
+        dropped.close.assert_called_once()
+
+    def test_giving_idle_connections_when_close_all_then_closes_them(self):
+        pool = ConnectionPool(max_size=2, connection_factory=MagicMock)
+        with pool.acquire() as conn:
+            pass
+
+        pool.close_all()
+
+        conn.close.assert_called_once()
+
+    def test_giving_invalid_max_size_when_pool_created_then_raises_valueerror(self):
+        with pytest.raises(ValueError):
+            ConnectionPool(max_size=0)
+
 class TestGetRecentAdditions:
     def test_giving_valid_connection_table_updatedate_time_now_when_get_recent_additions_then_returns_data(self):
         mock_conn = MagicMock()
@@ -56,6 +118,7 @@ class TestGetRecentAdditions:
         assert 'body' in result
         assert result['headers'] == ['col1', 'col2']
         assert result['body'] == [['row1_col1', 'row1_col2'], ['row2_col1', 'row2_col2']]
+        assert result['types'] == [None, None]
         mock_conn.run.assert_called_once_with(f'SELECT * FROM {table_name} WHERE last_updated BETWEEN \'{update_date}\' AND \'{time_now}\';')
 
 
@@ -73,6 +136,131 @@ class TestGetRecentAdditions:
         assert "Error fetching recent additions" in str(excinfo.value)
         mock_conn.run.assert_called_once_with(f'SELECT * FROM {table_name} WHERE last_updated BETWEEN \'{update_date}\' AND \'{time_now}\';')
 
+class TestIsConnectionAlive:
+    def test_giving_failing_query_when_is_connection_alive_then_returns_false(self):
+        mock_conn = MagicMock()
+        mock_conn.run.side_effect = Exception("connection reset")
+
+        assert is_connection_alive(mock_conn) is False
+
+class TestSelectList:
+    def test_giving_no_columns_when_select_list_then_selects_all(self):
+        assert select_list() == '*'
+
+    def test_giving_columns_and_required_when_select_list_then_quotes_and_appends_missing(self):
+        assert select_list(['design_id', 'design_name'], required=('last_updated', 'design_id')) == '"design_id", "design_name", "last_updated"'
+
+    def test_giving_columns_when_get_recent_additions_then_selects_only_those_columns(self):
+        mock_conn = MagicMock()
+        mock_conn.run.return_value = []
+        mock_conn.columns = []
+
+        get_recent_additions(mock_conn, 'design', '2023-01-01 00:00:00', '2023-01-02 00:00:00', columns=['design_id', 'design_name'])
+
+        assert mock_conn.run.call_args.args[0].startswith('SELECT "design_id", "design_name" FROM "design" WHERE')
+
+class TestGetRecentAdditionsBatched:
+    def test_giving_rows_in_several_batches_when_get_recent_additions_batched_then_yields_each_batch(self):
+        mock_conn = MagicMock()
+        mock_conn.run.side_effect = [None, None, [['a', 1], ['b', 2]], [['c', 3]], [], None]
+        mock_conn.columns = [{'name': 'col1'}, {'name': 'col2'}]
+
+        batches = list(get_recent_additions_batched(mock_conn, 'test_table', '2023-01-01 00:00:00', '2023-01-02 00:00:00', batch_size=2))
+
+        assert batches == [
+            {'headers': ['col1', 'col2'], 'body': [['a', 1], ['b', 2]], 'types': [None, None], 'type_modifiers': [None, None]},
+            {'headers': ['col1', 'col2'], 'body': [['c', 3]], 'types': [None, None], 'type_modifiers': [None, None]},
+        ]
+        queries = [call.args[0] for call in mock_conn.run.call_args_list]
+        assert queries[0] == "BEGIN;"
+        assert queries[1] == 'DECLARE "test_table_cursor" NO SCROLL CURSOR FOR SELECT * FROM "test_table" WHERE last_updated BETWEEN \'2023-01-01 00:00:00\' AND \'2023-01-02 00:00:00\';'
+        assert queries[2:5] == ['FETCH FORWARD 2 FROM "test_table_cursor";'] * 3
+        assert queries[-1] == "COMMIT;"
+
+    def test_giving_generator_closed_early_when_get_recent_additions_batched_then_rolls_back(self):
+        mock_conn = MagicMock()
+        mock_conn.run.side_effect = [None, None, [['a', 1]], None]
+        mock_conn.columns = [{'name': 'col1'}, {'name': 'col2'}]
+
+        batches = get_recent_additions_batched(mock_conn, 'test_table', '2023-01-01 00:00:00', '2023-01-02 00:00:00', batch_size=1)
+        next(batches)
+        batches.close()
+
+        assert mock_conn.run.call_args_list[-1].args[0] == "ROLLBACK;"
+
+    def test_giving_fetch_error_when_get_recent_additions_batched_then_raises_exception_and_rolls_back(self):
+        mock_conn = MagicMock()
+        mock_conn.run.side_effect = [None, None, Exception("Database error"), None]
+
+        with pytest.raises(Exception) as excinfo:
+            list(get_recent_additions_batched(mock_conn, 'test_table', '2023-01-01 00:00:00', '2023-01-02 00:00:00'))
+
+        assert "Error fetching recent additions" in str(excinfo.value)
+        assert mock_conn.run.call_args_list[-1].args[0] == "ROLLBACK;"
+
+    def test_giving_broken_connection_when_get_recent_additions_batched_then_raises_fetch_error_not_rollback_error(self):
+        mock_conn = MagicMock()
+        mock_conn.run.side_effect = [None, None, Exception("connection reset"), Exception("connection closed")]
+
+        with pytest.raises(Exception) as excinfo:
+            list(get_recent_additions_batched(mock_conn, 'test_table', '2023-01-01 00:00:00', '2023-01-02 00:00:00'))
+
+        assert str(excinfo.value) == "Error fetching recent additions: connection reset"
+        assert mock_conn.run.call_args_list[-1].args[0] == "ROLLBACK;"
+
+    def test_giving_invalid_batch_size_when_get_recent_additions_batched_then_raises_valueerror(self):
+        with pytest.raises(ValueError):
+            list(get_recent_additions_batched(MagicMock(), 'test_table', '2023-01-01 00:00:00', '2023-01-02 00:00:00', batch_size=0))
+
+class TestGetRecentAdditionsKeyset:
+    def test_giving_full_chunks_when_get_recent_additions_keyset_then_each_query_starts_after_last_key(self):
+        mock_conn = MagicMock()
+        mock_conn.run.side_effect = [[[1, '2023-01-01 10:00:00'], [2, '2023-01-01 10:00:00']], [[3, '2023-01-01 11:00:00']]]
+        mock_conn.columns = [{'name': 'sales_order_id'}, {'name': 'last_updated'}]
+
+        chunks = list(get_recent_additions_keyset(mock_conn, 'sales_order', 'sales_order_id', '2023-01-01 00:00:00', '2023-01-02 00:00:00', chunk_size=2))
+
+        assert [chunk['body'] for chunk in chunks] == [[[1, '2023-01-01 10:00:00'], [2, '2023-01-01 10:00:00']], [[3, '2023-01-01 11:00:00']]]
+        assert [chunk['last_key'] for chunk in chunks] == [['2023-01-01 10:00:00', 2], ['2023-01-01 11:00:00', 3]]
+        queries = [call.args[0] for call in mock_conn.run.call_args_list]
+        assert queries == [
+            'SELECT * FROM "sales_order" WHERE last_updated BETWEEN \'2023-01-01 00:00:00\' AND \'2023-01-02 00:00:00\' ORDER BY last_updated, "sales_order_id" LIMIT 2;',
+            'SELECT * FROM "sales_order" WHERE last_updated <= \'2023-01-02 00:00:00\' AND (last_updated, "sales_order_id") > (\'2023-01-01 10:00:00\', 2) ORDER BY last_updated, "sales_order_id" LIMIT 2;',
+        ]
+
+    def test_giving_after_key_when_get_recent_additions_keyset_then_resumes_from_key(self):
+        mock_conn = MagicMock()
+        mock_conn.run.side_effect = [[]]
+        mock_conn.columns = [{'name': 'sales_order_id'}, {'name': 'last_updated'}]
+
+        chunks = list(get_recent_additions_keyset(mock_conn, 'sales_order', 'sales_order_id', '2023-01-01 00:00:00', '2023-01-02 00:00:00', after=['2023-01-01 10:00:00', 2]))
+
+        assert chunks == []
+        assert "> ('2023-01-01 10:00:00', 2)" in mock_conn.run.call_args.args[0]
+
+    def test_giving_query_error_when_get_recent_additions_keyset_then_raises_exception(self):
+        mock_conn = MagicMock()
+        mock_conn.run.side_effect = Exception("Database error")
+
+        with pytest.raises(Exception) as excinfo:
+            list(get_recent_additions_keyset(mock_conn, 'sales_order', 'sales_order_id', '2023-01-01 00:00:00', '2023-01-02 00:00:00'))
+
+        assert "Error fetching recent additions" in str(excinfo.value)
+
+class TestHasRecentAdditions:
+    def test_giving_updated_rows_when_has_recent_additions_then_returns_true(self):
+        mock_conn = MagicMock()
+        mock_conn.run.return_value = [[True]]
+
+        assert has_recent_additions(mock_conn, 'test_table', '2023-01-01 00:00:00', '2023-01-02 00:00:00') is True
+        mock_conn.run.assert_called_once_with('SELECT EXISTS (SELECT 1 FROM "test_table" WHERE last_updated BETWEEN \'2023-01-01 00:00:00\' AND \'2023-01-02 00:00:00\');')
+
+    def test_giving_no_updated_rows_when_has_recent_additions_then_returns_false(self):
+        mock_conn = MagicMock()
+        mock_conn.run.return_value = [[False]]
+
+        assert has_recent_additions(mock_conn, 'test_table', '2023-01-01 00:00:00', '2023-01-02 00:00:00') is False
+
 class TestGetLastUploadDate:
     def test_gets_last_date_if_exists(
         self, secrets_client
@@ -1,7 +1,13 @@
 import os
 import pytest
 import csv
-from src.ingestion_utils.file_utils import data_to_csv
+import io
+from datetime import datetime
+from decimal import Decimal
+import pyarrow as pa
+import pyarrow.parquet as pq
+import gzip
+from src.ingestion_utils.file_utils import data_to_csv, data_to_file, write_csv, write_csv_gzip, write_csv_zstd, write_parquet, write_arrow, schema_sidecar, record_schema
 
 class TestDataToCsv:
     def test_giving_valid_data_and_tablename_when_data_to_csv_then_csv_file_created_with_correct_content(self):
@@ -29,6 +35,31 @@ class TestDataToCsv:
 
         os.remove(csv_filename)
 
+    def test_giving_batch_iterator_when_data_to_csv_then_writes_all_batches_and_returns_row_count(self):
+        batches = iter([
+            {'headers': ['col1', 'col2'], 'body': [['a', 1], ['b', 2]]},
+            {'headers': ['col1', 'col2'], 'body': [['c', 3]]},
+        ])
+        table_name = 'test_batched_table'
+        csv_filename = f'/tmp/{table_name}.csv'
+
+        rows_written = data_to_csv(batches, table_name)
+
+        with open(csv_filename, 'r') as f:
+            rows = list(csv.reader(f))
+
+        assert rows_written == 3
+        assert rows == [['col1', 'col2'], ['a', '1'], ['b', '2'], ['c', '3']]
+
+        os.remove(csv_filename)
+
+    def test_giving_empty_batch_iterator_when_data_to_csv_then_returns_zero(self):
+        table_name = 'test_empty_batched_table'
+
+        assert data_to_csv(iter([]), table_name) == 0
+
+        os.remove(f'/tmp/{table_name}.csv')
+
     def test_giving_data_missing_headers_when_data_to_csv_then_raises_valueerror(self):
         test_data = {
             'body': [['row1_val1']]
@@ -100,4 +131,158 @@ class TestDataToCsv:
 
         assert "Error writing to CSV file" in str(excinfo.value)
 
-        # os.chmod(str(read_only_dir), 0o777)
\ No newline at end of file
+        # os.chmod(str(read_only_dir), 0o777)
+
+
+class TestWriteCsv:
+    def test_giving_batch_iterator_when_write_csv_then_encodes_csv_into_binary_stream(self):
+        batches = iter([
+            {'headers': ['col1', 'col2'], 'body': [['a', 1]]},
+            {'headers': ['col1', 'col2'], 'body': [['b, c', 2]]},
+        ])
+        buffer = io.BytesIO()
+
+        rows_written = write_csv(batches, buffer)
+
+        assert rows_written == 2
+        assert buffer.getvalue() == b'col1,col2\r\na,1\r\n"b, c",2\r\n'
+
+    def test_giving_non_dict_data_when_write_csv_then_raises_typeerror(self):
+        with pytest.raises(TypeError):
+            write_csv("not a dictionary", io.BytesIO())
+
+
+
+@pytest.fixture
+def typed_batches():
+    headers = ['sales_order_id', 'created_at', 'unit_price', 'agreed_payment_date']
+    types = [23, 1114, 1700, 1043]
+    # unit_price is numeric(10,2)
+    type_modifiers = [-1, -1, ((10 << 16) | 2) + 4, 24]
+    return [
+        {'headers': headers, 'types': types, 'type_modifiers': type_modifiers, 'body': [[1, datetime(2022, 11, 3, 14, 20, 52, 186000), Decimal('3.94'), '2022-11-08']]},
+        {'headers': headers, 'types': types, 'type_modifiers': type_modifiers, 'body': [[2, datetime(2022, 11, 4, 9, 0, 0), None, None]]},
+    ]
+
+class TestWriteCompressedCsv:
+    @pytest.fixture
+    def batches(self):
+        return [
+            {'headers': ['col1', 'col2'], 'body': [['a', 1]] * 500},
+            {'headers': ['col1', 'col2'], 'body': [['b', 2]] * 500},
+        ]
+
+    def test_giving_batches_when_write_csv_gzip_then_writes_gzip_csv_and_leaves_stream_open(self, batches):
+        buffer = io.BytesIO()
+
+        rows_written = write_csv_gzip(iter(batches), buffer)
+
+        assert rows_written == 1000
+        assert not buffer.closed
+        expected = b'col1,col2\r\n' + b'a,1\r\n' * 500 + b'b,2\r\n' * 500
+        assert gzip.decompress(buffer.getvalue()) == expected
+        assert len(buffer.getvalue()) < len(expected)
+
+    def test_giving_batches_when_write_csv_zstd_then_writes_zstd_csv_and_leaves_stream_open(self, batches):
+        buffer = io.BytesIO()
+
+        rows_written = write_csv_zstd(iter(batches), buffer)
+
+        assert rows_written == 1000
+        assert not buffer.closed
+        decompressed = pa.CompressedInputStream(pa.BufferReader(buffer.getvalue()), 'zstd').read()
+        assert decompressed == b'col1,col2\r\n' + b'a,1\r\n' * 500 + b'b,2\r\n' * 500
+
+class TestWriteParquet:
+    def test_giving_typed_batches_when_write_parquet_then_keeps_column_types_and_writes_row_group_per_batch(self, typed_batches):
+        buffer = io.BytesIO()
+
+        rows_written = write_parquet(iter(typed_batches), buffer)
+
+        parquet_file = pq.ParquetFile(io.BytesIO(buffer.getvalue()))
+        table = parquet_file.read()
+        assert rows_written == 2
+        assert parquet_file.num_row_groups == 2
+        assert table.schema.field('sales_order_id').type == pa.int64()
+        assert table.schema.field('created_at').type == pa.timestamp('us')
+        assert table.schema.field('unit_price').type == pa.decimal128(10, 2)
+        assert table.schema.field('agreed_payment_date').type == pa.string()
+        assert table.column('unit_price').to_pylist() == [Decimal('3.94'), None]
+
+    def test_giving_numeric_without_precision_when_write_parquet_then_keeps_it_as_text(self):
+        batch = {'headers': ['payment_amount'], 'types': [1700], 'type_modifiers': [-1],
+                 'body': [[Decimal('1234567890.123456789012')], [None]]}
+        buffer = io.BytesIO()
+
+        write_parquet(iter([batch]), buffer)
+
+        table = pq.read_table(io.BytesIO(buffer.getvalue()))
+        assert table.schema.field('payment_amount').type == pa.string()
+        assert table.column('payment_amount').to_pylist() == ['1234567890.123456789012', None]
+
+    def test_giving_change_capture_rows_with_temporal_text_when_write_parquet_then_parses_them(self):
+        batch = {
+            'headers': ['payment_id', 'last_updated', 'payment_date', 'paid_at', 'settled_at'],
+            'types': [23, 1114, 1082, 1083, 1184],
+            'body': [[5, '2022-11-03 14:20:52.186', '2022-11-08', '10:30:00', '2022-11-08 10:30:00+01'],
+                     [6, None, None, None, None]],
+        }
+        buffer = io.BytesIO()
+
+        write_parquet(iter([batch]), buffer)
+
+        table = pq.read_table(io.BytesIO(buffer.getvalue()))
+        assert table.schema.field('last_updated').type == pa.timestamp('us')
+        assert table.column('last_updated').to_pylist() == [datetime(2022, 11, 3, 14, 20, 52, 186000), None]
+        assert str(table.column('payment_date')[0]) == '2022-11-08'
+        assert str(table.column('paid_at')[0]) == '10:30:00'
+        assert table.column('settled_at')[0].value == pa.scalar(datetime(2022, 11, 8, 9, 30), pa.timestamp('us')).value
+
+    def test_giving_no_batches_when_write_parquet_then_writes_nothing(self):
+        buffer = io.BytesIO()
+
+        assert write_parquet(iter([]), buffer) == 0
+        assert buffer.getvalue() == b''
+
+class TestWriteArrow:
+    def test_giving_typed_batches_when_write_arrow_then_writes_arrow_ipc_file(self, typed_batches):
+        buffer = io.BytesIO()
+
+        rows_written = write_arrow(iter(typed_batches), buffer)
+
+        table = pa.ipc.open_file(pa.py_buffer(buffer.getvalue())).read_all()
+        assert rows_written == 2
+        assert table.column('sales_order_id').to_pylist() == [1, 2]
+        assert table.schema.field('created_at').type == pa.timestamp('us')
+
+class TestDataToFile:
+    def test_giving_parquet_format_when_data_to_file_then_writes_parquet_file(self, typed_batches):
+        rows_written = data_to_file(typed_batches[0], 'test_typed_table', 'parquet')
+
+        assert rows_written == 1
+        assert pq.read_table('/tmp/test_typed_table.parquet').num_rows == 1
+        os.remove('/tmp/test_typed_table.parquet')
+
+    def test_giving_unsupported_format_when_data_to_file_then_raises_valueerror(self, typed_batches):
+        with pytest.raises(ValueError) as excinfo:
+            data_to_file(typed_batches[0], 'test_typed_table', 'xlsx')
+
+        assert "Unsupported output format: xlsx" in str(excinfo.value)
+
+class TestSchemaSidecar:
+    def test_given_type_oids_maps_to_logical_types(self):
+        assert schema_sidecar(['id', 'created_at', 'phone'], [23, 1114, 9999]) == {"columns": [
+            {"name": "id", "type_oid": 23, "type": "int64"},
+            {"name": "created_at", "type_oid": 1114, "type": "timestamp"},
+            {"name": "phone", "type_oid": 9999, "type": "string"},
+        ]}
+
+    def test_given_batches_record_schema_passes_them_through_and_records_first(self):
+        batches = iter([
+            {'headers': ['id'], 'body': [[1]], 'types': [23]},
+            {'headers': ['id'], 'body': [[2]], 'types': [23]},
+        ])
+        schema = {}
+
+        assert [batch['body'] for batch in record_schema(batches, schema)] == [[[1]], [[2]]]
+        assert schema == {"columns": [{"name": "id", "type_oid": 23, "type": "int64"}]}
@@ -0,0 +1,94 @@
+import pytest
+import boto3
+import json
+import os
+from moto import mock_aws
+from src.ingestion_utils.watermark_utils import S3WatermarkStore, LocalWatermarkStore, WatermarkConflictError, DEFAULT_WATERMARK
+
+@pytest.fixture(scope="function", autouse=True)
+def aws_credentials():
+    """Mocked AWS Credentials for moto."""
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "eu-west-2"
+
+@pytest.fixture()
+def s3_client(aws_credentials):
+    with mock_aws():
+        s3_client = boto3.client("s3")
+        s3_client.create_bucket(Bucket="test-bucket", CreateBucketConfiguration={"LocationConstraint": "eu-west-2"})
+        yield s3_client
+
+class TestS3WatermarkStore:
+    def test_giving_no_state_object_when_get_then_returns_default(self, s3_client):
+        store = S3WatermarkStore(s3_client, "test-bucket")
+
+        assert store.get("sales_order") == DEFAULT_WATERMARK
+        assert store.get("sales_order", "2024-01-01 00:00:00") == "2024-01-01 00:00:00"
+
+    def test_giving_set_watermarks_when_read_by_new_store_then_returns_each_table_value(self, s3_client):
+        store = S3WatermarkStore(s3_client, "test-bucket")
+        store.set("sales_order", "2025-03-06 22:51:00")
+        store.set("staff", "2025-03-06 22:52:00")
+
+        reader = S3WatermarkStore(s3_client, "test-bucket")
+
+        assert reader.get("sales_order") == "2025-03-06 22:51:00"
+        assert reader.get("staff") == "2025-03-06 22:52:00"
+        body = s3_client.get_object(Bucket="test-bucket", Key="_state/watermarks.json")["Body"].read()
+        assert json.loads(body) == {"watermarks": {"sales_order": "2025-03-06 22:51:00", "staff": "2025-03-06 22:52:00"}, "checkpoints": {}}
+
+    def test_giving_concurrent_writers_when_set_then_neither_update_is_lost(self, s3_client):
+        first = S3WatermarkStore(s3_client, "test-bucket")
+        second = S3WatermarkStore(s3_client, "test-bucket")
+        first.load()
+        second.load()
+
+        first.set("sales_order", "2025-03-06 22:51:00")
+        second.set("payment", "2025-03-06 22:51:00")
+
+        assert S3WatermarkStore(s3_client, "test-bucket").load()["watermarks"] == {
+            "sales_order": "2025-03-06 22:51:00",
+            "payment": "2025-03-06 22:51:00",
+        }
+
+    def test_giving_checkpoint_when_watermark_advanced_then_checkpoint_cleared(self, s3_client):
+        store = S3WatermarkStore(s3_client, "test-bucket")
+        checkpoint = {"prefix": "2025/3/6/22/51/sales_order/", "part": 2, "last_key": ["2025-03-06 22:50:01", 42]}
+        store.set_checkpoint("sales_order", checkpoint)
+
+        assert S3WatermarkStore(s3_client, "test-bucket").get_checkpoint("sales_order") == checkpoint
+
+        store.set("sales_order", "2025-03-06 22:51:00")
+
+        assert S3WatermarkStore(s3_client, "test-bucket").get_checkpoint("sales_order") is None
+
+    def test_giving_stale_etag_when_write_then_raises_conflict(self, s3_client):
+        store = S3WatermarkStore(s3_client, "test-bucket")
+        store.set("sales_order", "2025-03-06 22:51:00")
+        _, stale_etag = store._read()
+        store.set("sales_order", "2025-03-06 22:56:00")
+
+        with pytest.raises(WatermarkConflictError):
+            store._write({"watermarks": {}}, stale_etag)
+
+class TestLocalWatermarkStore:
+    def test_giving_set_watermark_when_read_by_new_store_then_returns_value(self, tmp_path):
+        path = str(tmp_path / "watermarks.json")
+        LocalWatermarkStore(path).set("address", "2025-03-06 22:51:00")
+
+        store = LocalWatermarkStore(path)
+
+        assert store.get("address") == "2025-03-06 22:51:00"
+        assert store.get("design") == DEFAULT_WATERMARK
+
+    def test_giving_file_changed_since_read_when_write_then_raises_conflict(self, tmp_path):
+        path = str(tmp_path / "watermarks.json")
+        store = LocalWatermarkStore(path)
+        _, version = store._read()
+        LocalWatermarkStore(path).set("address", "2025-03-06 22:51:00")
+
+        with pytest.raises(WatermarkConflictError):
+            store._write({"watermarks": {}}, version)
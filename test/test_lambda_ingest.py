@@ -5,8 +5,16 @@ import logging
 from moto import mock_aws
 from unittest.mock import patch, mock_open, MagicMock
 from io import StringIO
+import csv
+import json
 import os
 
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-west-2")
+os.environ.setdefault("BUCKET_NAME", "test-ingestion-bucket")
+import src.lambda_ingest as lambda_ingest
+from src.ingestion_utils.database_utils import ConnectionPool
+from src.ingestion_utils.watermark_utils import S3WatermarkStore, DEFAULT_WATERMARK
+
 #from src.lambda_ingest import lambda_handler, fetch_credentials, export_db_creds_to_env, create_connection, get_last_upload_date, get_recent_additions, data_to_csv, close_db_connection
 
 # @pytest.fixture(scope="function",autouse=True)
@@ -26,3 +34,383 @@ import os
 # def s3_client(aws_credentials):
 #     s3_client = boto3.client("s3")
 #     yield s3_client
+
+@pytest.fixture(scope="function", autouse=True)
+def aws_credentials():
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "eu-west-2"
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        s3 = boto3.client("s3")
+        s3.create_bucket(Bucket=lambda_ingest.bucket_name, CreateBucketConfiguration={"LocationConstraint": "eu-west-2"})
+        yield s3
+
+TIMESTAMP = {"secret": "2025-03-06 22:51:00", "filepath": "2025/03/06/22/51"}
+
+class TestSaveTableToS3:
+    def test_giving_upload_failure_when_streaming_batches_then_closes_cursor_before_returning(self, s3):
+        closed = []
+        def batches():
+            try:
+                yield {"headers": ["staff_id"], "body": [[1]], "types": [23]}
+                yield {"headers": ["staff_id"], "body": [[2]], "types": [23]}
+            finally:
+                closed.append(True)
+
+        with patch.object(lambda_ingest, "get_recent_additions_batched", return_value=batches()), \
+             patch.object(lambda_ingest, "data_to_file", side_effect=lambda data, **kwargs: next(iter(data)) and 1 / 0):
+            with pytest.raises(ZeroDivisionError):
+                lambda_ingest.save_table_to_s3(MagicMock(), "staff", TIMESTAMP, s3_client=s3, batch_size=1)
+
+        assert closed == [True]
+
+class StubConnection:
+    """Answers the queries the ingestion lambda sends, from in-memory tables.
+
+    `tables` maps table names to rows of (<table>_id, last_updated); `changed`
+    lists the tables reported as having recent additions; fetching any table in
+    `failing` raises. Every query is recorded in `queries`.
+    """
+
+    def __init__(self, tables, changed=(), failing=()):
+        self.tables = tables
+        self.changed = changed
+        self.failing = failing
+        self.queries = []
+        self.columns = []
+        self._cursor_rows = []
+
+    def run(self, sql, **params):
+        self.queries.append(sql)
+        table = sql.split(' FROM "', 1)[-1].split('"', 1)[0]
+        if sql.startswith("SELECT EXISTS"):
+            return [[table in self.changed]]
+        if sql.startswith("DECLARE"):
+            if table in self.failing:
+                raise Exception(f"relation {table} is locked")
+            self.columns = [{"name": f"{table}_id", "type_oid": 23}, {"name": "last_updated", "type_oid": 1114}]
+            self._cursor_rows = list(self.tables.get(table, []))
+        elif sql.startswith("FETCH"):
+            rows, self._cursor_rows = self._cursor_rows, []
+            return rows
+        return None
+
+    def close(self):
+        pass
+
+def stub_pool(conn):
+    return ConnectionPool(max_size=1, connection_factory=lambda: conn)
+
+def run_handler(s3, conn, event, groups=(), last_run_date=None):
+    with patch.object(lambda_ingest, "s3_client", s3), \
+         patch.object(lambda_ingest, "connection_pool", stub_pool(conn)), \
+         patch.object(lambda_ingest, "join_groups", [list(group) for group in groups]), \
+         patch.object(lambda_ingest, "get_last_run_date", last_run_date or MagicMock(return_value=DEFAULT_WATERMARK)), \
+         patch.object(lambda_ingest.time, "gmtime", return_value=(2025, 3, 6, 22, 51, 1)):
+        return lambda_ingest.lambda_handler(event, None)
+
+def declared_start_dates(conn):
+    return {
+        query.split(' FROM "', 1)[1].split('"', 1)[0]: query.split("BETWEEN '", 1)[1].split("'", 1)[0]
+        for query in conn.queries if query.startswith("DECLARE")
+    }
+
+class TestPerTableWatermarks:
+    def test_giving_one_table_fails_when_handler_runs_then_only_other_tables_advance(self, s3):
+        store = S3WatermarkStore(s3, lambda_ingest.bucket_name)
+        store.set("sales_order", "2025-03-05 10:00:00")
+        store.set("payment", "2025-03-04 09:00:00")
+        conn = StubConnection({"sales_order": [[1, "2025-03-06 10:00:00"]], "payment": [[7, "2025-03-06 11:00:00"]]}, failing=["payment"])
+
+        result = run_handler(s3, conn, {"fact_tables": ["sales_order", "payment"], "dim_tables": []})
+
+        assert result["status_code"] == 207
+        assert result["failed_tables"] == ["payment"]
+        assert result["fact_tables"] == {"sales_order": "2025/3/6/22/51/sales_order.csv"}
+        assert declared_start_dates(conn) == {"sales_order": "2025-03-05 10:00:00", "payment": "2025-03-04 09:00:00"}
+        watermarks = S3WatermarkStore(s3, lambda_ingest.bucket_name)
+        assert watermarks.get("sales_order") == "2025-03-06 22:51:00"
+        assert watermarks.get("payment") == "2025-03-04 09:00:00"
+
+    def test_giving_every_table_has_watermark_when_handler_runs_then_last_run_date_is_not_read(self, s3):
+        S3WatermarkStore(s3, lambda_ingest.bucket_name).set("payment", "2025-03-04 09:00:00")
+        last_run_date = MagicMock(return_value="2025-03-01 00:00:00")
+
+        result = run_handler(s3, StubConnection({"payment": [[7, "2025-03-06 11:00:00"]]}), {"fact_tables": ["payment"], "dim_tables": []}, last_run_date=last_run_date)
+
+        assert result["status_code"] == 200
+        assert "failed_tables" not in result
+        last_run_date.assert_not_called()
+
+    def test_giving_table_without_watermark_when_handler_runs_then_starts_from_last_run_date(self, s3):
+        S3WatermarkStore(s3, lambda_ingest.bucket_name).set("payment", "2025-03-04 09:00:00")
+        last_run_date = MagicMock(return_value="2025-03-01 00:00:00")
+        conn = StubConnection({"payment": [[7, "2025-03-06 11:00:00"]], "sales_order": [[1, "2025-03-06 10:00:00"]]})
+
+        run_handler(s3, conn, {"fact_tables": ["payment", "sales_order"], "dim_tables": []}, last_run_date=last_run_date)
+
+        last_run_date.assert_called_once()
+        assert declared_start_dates(conn) == {"payment": "2025-03-04 09:00:00", "sales_order": "2025-03-01 00:00:00"}
+
+    def test_giving_failed_table_when_next_run_succeeds_then_extracts_from_old_watermark(self, s3):
+        S3WatermarkStore(s3, lambda_ingest.bucket_name).set("payment", "2025-03-04 09:00:00")
+        run_handler(s3, StubConnection({}, failing=["payment"]), {"fact_tables": ["payment"], "dim_tables": []})
+        conn = StubConnection({"payment": [[7, "2025-03-06 11:00:00"]]})
+
+        result = run_handler(s3, conn, {"fact_tables": ["payment"], "dim_tables": []})
+
+        assert result["fact_tables"] == {"payment": "2025/3/6/22/51/payment.csv"}
+        assert declared_start_dates(conn) == {"payment": "2025-03-04 09:00:00"}
+        assert S3WatermarkStore(s3, lambda_ingest.bucket_name).get("payment") == "2025-03-06 22:51:00"
+
+    def test_giving_table_in_group_changed_when_handler_runs_then_whole_group_extracted_in_full(self, s3):
+        store = S3WatermarkStore(s3, lambda_ingest.bucket_name)
+        store.set("staff", "2025-03-05 10:00:00")
+        store.set("department", "2025-03-01 10:00:00")
+        store.set("currency", "2025-03-05 10:00:00")
+        conn = StubConnection({"staff": [[1, "2025-03-06 10:00:00"]], "department": [[2, "2022-11-03 14:20:49"]]}, changed=["staff"])
+
+        result = run_handler(s3, conn, {"fact_tables": [], "dim_tables": ["staff", "department", "currency"]}, groups=[["staff", "department"]])
+
+        assert sorted(result["dim_tables"]) == ["department", "staff"]
+        assert sorted(result["full_tables"]) == ["department", "staff"]
+        assert declared_start_dates(conn) == {"staff": DEFAULT_WATERMARK, "department": DEFAULT_WATERMARK, "currency": "2025-03-05 10:00:00"}
+
+    def test_giving_no_table_in_group_changed_when_handler_runs_then_each_keeps_its_own_watermark(self, s3):
+        store = S3WatermarkStore(s3, lambda_ingest.bucket_name)
+        store.set("staff", "2025-03-05 10:00:00")
+        store.set("department", "2025-03-01 10:00:00")
+        conn = StubConnection({})
+
+        run_handler(s3, conn, {"fact_tables": [], "dim_tables": ["staff", "department"]}, groups=[["staff", "department"]])
+
+        assert declared_start_dates(conn) == {"staff": "2025-03-05 10:00:00", "department": "2025-03-01 10:00:00"}
+
+SALES_ORDER_ROWS = [[sales_order_id, f"2025-03-06 10:{sales_order_id // 2:02}:00"] for sales_order_id in range(1, 12)]
+
+def keyset_chunks(fail_after=None):
+    """A stand-in for get_recent_additions_keyset over SALES_ORDER_ROWS that
+    raises once `fail_after` chunks have been read. Each call is recorded."""
+    calls = []
+    def get_recent_additions_keyset(conn, tablename, primary_key, updatedate, time_now, chunk_size, after=None, columns=None):
+        calls.append(after)
+        rows = [row for row in SALES_ORDER_ROWS if after is None or (row[1], row[0]) > (after[0], after[1])]
+        for number, start in enumerate(range(0, len(rows), chunk_size)):
+            if number == fail_after:
+                raise Exception("connection reset")
+            chunk = rows[start:start + chunk_size]
+            yield {"headers": ["sales_order_id", "last_updated"], "body": chunk, "types": [23, 1114], "last_key": [chunk[-1][1], chunk[-1][0]]}
+    get_recent_additions_keyset.calls = calls
+    return get_recent_additions_keyset
+
+def saved_parts(s3, prefix):
+    keys = [item["Key"] for item in s3.list_objects_v2(Bucket=lambda_ingest.bucket_name, Prefix=prefix)["Contents"]]
+    parts = sorted(key for key in keys if key.endswith(".csv"))
+    rows = []
+    for key in parts:
+        body = s3.get_object(Bucket=lambda_ingest.bucket_name, Key=key)["Body"].read().decode()
+        rows += [[int(row[0]), row[1]] for row in list(csv.reader(StringIO(body)))[1:]]
+    return parts, rows
+
+class TestSaveTableInChunks:
+    def test_giving_failure_part_way_when_next_run_then_resumes_after_last_saved_part(self, s3):
+        store = S3WatermarkStore(s3, lambda_ingest.bucket_name)
+        first_run = keyset_chunks(fail_after=2)
+        with patch.object(lambda_ingest, "get_recent_additions_keyset", first_run):
+            with pytest.raises(Exception, match="connection reset"):
+                lambda_ingest.save_table_in_chunks(MagicMock(), "sales_order", TIMESTAMP, DEFAULT_WATERMARK, store, s3_client=s3, chunk_size=3)
+
+        checkpoint = S3WatermarkStore(s3, lambda_ingest.bucket_name).get_checkpoint("sales_order")
+        assert checkpoint == {"prefix": "2025/03/06/22/51/sales_order/", "part": 2, "last_key": ["2025-03-06 10:03:00", 6]}
+
+        second_run = keyset_chunks()
+        later = {"secret": "2025-03-06 23:00:00", "filepath": "2025/03/06/23/00"}
+        with patch.object(lambda_ingest, "get_recent_additions_keyset", second_run):
+            prefix = lambda_ingest.save_table_in_chunks(MagicMock(), "sales_order", later, DEFAULT_WATERMARK, S3WatermarkStore(s3, lambda_ingest.bucket_name), s3_client=s3, chunk_size=3)
+
+        assert prefix == "2025/03/06/22/51/sales_order/"
+        assert second_run.calls == [["2025-03-06 10:03:00", 6]]
+        parts, rows = saved_parts(s3, prefix)
+        assert parts == [f"{prefix}part-{part:05d}.csv" for part in range(1, 5)]
+        assert rows == SALES_ORDER_ROWS
+
+    def test_giving_chunked_table_fails_when_saved_concurrently_then_checkpoint_kept_until_resumed_run_completes(self, s3):
+        store = S3WatermarkStore(s3, lambda_ingest.bucket_name)
+        pool = stub_pool(MagicMock())
+        with patch.object(lambda_ingest, "get_recent_additions_keyset", keyset_chunks(fail_after=1)):
+            keys = lambda_ingest.save_data_to_s3_concurrently(pool, ["sales_order"], TIMESTAMP, DEFAULT_WATERMARK, s3_client=s3, watermark_store=store, chunk_size=4)
+
+        reader = S3WatermarkStore(s3, lambda_ingest.bucket_name)
+        assert keys == {}
+        assert reader.get("sales_order") == DEFAULT_WATERMARK
+        assert reader.get_checkpoint("sales_order")["part"] == 1
+
+        with patch.object(lambda_ingest, "get_recent_additions_keyset", keyset_chunks()):
+            keys = lambda_ingest.save_data_to_s3_concurrently(pool, ["sales_order"], TIMESTAMP, DEFAULT_WATERMARK, s3_client=s3, watermark_store=S3WatermarkStore(s3, lambda_ingest.bucket_name), chunk_size=4)
+
+        reader = S3WatermarkStore(s3, lambda_ingest.bucket_name)
+        assert keys == {"sales_order": "2025/03/06/22/51/sales_order/"}
+        assert reader.get("sales_order") == TIMESTAMP["secret"]
+        assert reader.get_checkpoint("sales_order") is None
+        assert saved_parts(s3, keys["sales_order"])[1] == SALES_ORDER_ROWS
+
+class StubReplicationConnection(StubConnection):
+    """A StubConnection that also serves a wal2json replication slot.
+
+    `transactions` is a list of transactions, each a list of wal2json change
+    documents. Peeking returns whole transactions, stopping at the first
+    commit after `upto_nchanges` rows as PostgreSQL does, and only changes
+    after the slot's position. Advancing the slot records the LSN in `advanced`.
+    """
+
+    def __init__(self, transactions, tables=None):
+        super().__init__(tables or {})
+        self.changes = []
+        for transaction in transactions:
+            for document in [{"action": "B"}, *transaction, {"action": "C"}]:
+                self.changes.append([f"0/{len(self.changes) + 1:X}", json.dumps(document)])
+        self.advanced = []
+
+    def run(self, sql, **params):
+        if "pg_replication_slots" in sql:
+            self.queries.append(sql)
+            return [[1]]
+        if "pg_logical_slot_peek_changes" in sql:
+            self.queries.append(sql)
+            upto = int(sql.split("NULL, ", 1)[1].split(",", 1)[0])
+            pending = [row for row in self.changes if not self.advanced or int(row[0][2:], 16) > int(self.advanced[-1][2:], 16)]
+            rows = []
+            for row in pending:
+                rows.append(row)
+                if len(rows) >= upto and json.loads(row[1])["action"] == "C":
+                    break
+            return rows
+        if "pg_replication_slot_advance" in sql:
+            self.queries.append(sql)
+            self.advanced.append(sql.split("', '", 1)[1].split("'", 1)[0])
+            return None
+        if sql.startswith("SELECT") and "BETWEEN" in sql:
+            self.queries.append(sql)
+            table = sql.split(' FROM "', 1)[1].split('"', 1)[0]
+            self.columns = [{"name": f"{table}_id", "type_oid": 23}, {"name": "last_updated", "type_oid": 1114}]
+            return list(self.tables.get(table, []))
+        return super().run(sql, **params)
+
+def row_change(action, table, row_id, last_updated="2025-03-06 10:00:00"):
+    columns = [{"name": f"{table}_id", "type": "integer", "typeoid": 23, "value": row_id},
+               {"name": "last_updated", "type": "timestamp without time zone", "typeoid": 1114, "value": last_updated}]
+    if action == "D":
+        return {"action": "D", "schema": "public", "table": table, "identity": columns[:1]}
+    return {"action": action, "schema": "public", "table": table, "columns": columns}
+
+def read_csv_rows(s3, key):
+    body = s3.get_object(Bucket=lambda_ingest.bucket_name, Key=key)["Body"].read().decode()
+    return list(csv.reader(StringIO(body)))[1:]
+
+class TestSaveChangesToS3:
+    def test_giving_changes_when_all_uploads_succeed_then_saves_latest_rows_ignores_deletes_and_advances_slot_to_last_commit(self, s3):
+        conn = StubReplicationConnection([
+            [row_change("I", "sales_order", 1), row_change("I", "sales_order", 2)],
+            [row_change("U", "sales_order", 1, "2025-03-06 11:00:00"), row_change("D", "payment", 5)],
+        ])
+
+        keys = lambda_ingest.save_changes_to_s3(conn, ["sales_order", "payment"], TIMESTAMP, s3_client=s3)
+
+        assert keys == {"sales_order": "2025/03/06/22/51/sales_order.csv"}
+        assert read_csv_rows(s3, keys["sales_order"]) == [["1", "2025-03-06 11:00:00"], ["2", "2025-03-06 10:00:00"]]
+        saved = [item["Key"] for item in s3.list_objects_v2(Bucket=lambda_ingest.bucket_name)["Contents"]]
+        assert not any("payment" in key for key in saved)
+        assert conn.advanced == [conn.changes[-1][0]]
+
+    def test_giving_upload_failure_when_saving_changes_then_slot_is_not_advanced_and_changes_are_read_again(self, s3):
+        conn = StubReplicationConnection([[row_change("I", "sales_order", 1), row_change("I", "payment", 5)]])
+
+        with patch.object(lambda_ingest, "save_schema_sidecar", side_effect=[None, Exception("SlowDown")]):
+            with pytest.raises(Exception, match="SlowDown"):
+                lambda_ingest.save_changes_to_s3(conn, ["sales_order", "payment"], TIMESTAMP, s3_client=s3)
+
+        assert conn.advanced == []
+        keys = lambda_ingest.save_changes_to_s3(conn, ["sales_order", "payment"], TIMESTAMP, s3_client=s3)
+        assert list(keys) == ["sales_order", "payment"]
+        assert conn.advanced == [conn.changes[-1][0]]
+
+    def test_giving_max_changes_when_saving_changes_then_stops_at_transaction_boundary_and_next_run_reads_the_rest(self, s3):
+        conn = StubReplicationConnection([
+            [row_change("I", "sales_order", 1), row_change("I", "sales_order", 2)],
+            [row_change("I", "sales_order", 3)],
+        ])
+
+        keys = lambda_ingest.save_changes_to_s3(conn, ["sales_order"], TIMESTAMP, s3_client=s3, max_changes=2)
+
+        assert [row[0] for row in read_csv_rows(s3, keys["sales_order"])] == ["1", "2"]
+        assert conn.advanced == [conn.changes[3][0]]
+        later = {"secret": "2025-03-06 23:00:00", "filepath": "2025/03/06/23/00"}
+        keys = lambda_ingest.save_changes_to_s3(conn, ["sales_order"], later, s3_client=s3, max_changes=2)
+        assert [row[0] for row in read_csv_rows(s3, keys["sales_order"])] == ["3"]
+        assert conn.advanced[-1] == conn.changes[-1][0]
+
+    def test_giving_change_to_one_table_in_group_when_saving_changes_then_whole_group_extracted_in_full(self, s3):
+        tables = {"staff": [[1, "2025-03-06 10:00:00"], [2, "2022-11-03 14:20:49"]], "department": [[3, "2022-11-03 14:20:49"]]}
+        conn = StubReplicationConnection([[row_change("U", "staff", 1)]], tables=tables)
+
+        keys = lambda_ingest.save_changes_to_s3(conn, ["staff", "department", "currency"], TIMESTAMP, s3_client=s3, groups=[["staff", "department"]])
+
+        assert sorted(keys) == ["department", "staff"]
+        assert [row[0] for row in read_csv_rows(s3, keys["staff"])] == ["1", "2"]
+        assert [row[0] for row in read_csv_rows(s3, keys["department"])] == ["3"]
+        full_extracts = [query for query in conn.queries if "BETWEEN" in query]
+        assert all(f"BETWEEN '{DEFAULT_WATERMARK}'" in query for query in full_extracts) and len(full_extracts) == 2
+
+    def test_giving_no_changes_when_saving_changes_then_writes_nothing_and_does_not_advance(self, s3):
+        conn = StubReplicationConnection([])
+
+        assert lambda_ingest.save_changes_to_s3(conn, ["sales_order"], TIMESTAMP, s3_client=s3) == {}
+        assert conn.advanced == []
+
+    def test_giving_cdc_mode_when_handler_runs_then_splits_keys_into_fact_and_dim_tables(self, s3):
+        conn = StubReplicationConnection([[row_change("I", "sales_order", 1), row_change("I", "currency", 2)]])
+
+        with patch.object(lambda_ingest, "ingest_mode", "cdc"):
+            result = run_handler(s3, conn, {"fact_tables": ["sales_order"], "dim_tables": ["currency"]})
+
+        assert result == {
+            "status_code": 200,
+            "fact_tables": {"sales_order": "2025/3/6/22/51/sales_order.csv"},
+            "dim_tables": {"currency": "2025/3/6/22/51/currency.csv"},
+            "full_tables": [],
+        }
+        assert conn.advanced == [conn.changes[-1][0]]
+
+    def test_giving_cdc_mode_with_incremental_joins_when_handler_runs_then_reports_no_full_tables(self, s3):
+        conn = StubReplicationConnection([[row_change("U", "staff", 1), row_change("U", "department", 3)]])
+
+        with patch.object(lambda_ingest, "ingest_mode", "cdc"):
+            result = run_handler(s3, conn, {"fact_tables": [], "dim_tables": ["staff", "department"]})
+
+        assert sorted(result["dim_tables"]) == ["department", "staff"]
+        assert result["full_tables"] == []
+
+    def test_giving_cdc_mode_with_join_groups_when_handler_runs_then_reports_groups_extracted_in_full(self, s3):
+        tables = {"staff": [[1, "2025-03-06 10:00:00"], [2, "2022-11-03 14:20:49"]], "department": [[3, "2022-11-03 14:20:49"]]}
+        conn = StubReplicationConnection([[row_change("U", "staff", 1), row_change("U", "currency", 4)]], tables=tables)
+
+        with patch.object(lambda_ingest, "ingest_mode", "cdc"):
+            result = run_handler(s3, conn, {"fact_tables": [], "dim_tables": ["staff", "department", "currency"]}, groups=[["staff", "department"]])
+
+        assert sorted(result["dim_tables"]) == ["currency", "department", "staff"]
+        assert result["full_tables"] == ["staff", "department"]
+
+    def test_giving_group_table_with_no_rows_to_extract_in_full_when_handler_runs_then_it_is_not_reported_full(self, s3):
+        tables = {"staff": [[1, "2025-03-06 10:00:00"]]}
+        conn = StubReplicationConnection([[row_change("U", "staff", 1), row_change("U", "department", 3)]], tables=tables)
+
+        with patch.object(lambda_ingest, "ingest_mode", "cdc"):
+            result = run_handler(s3, conn, {"fact_tables": [], "dim_tables": ["staff", "department"]}, groups=[["staff", "department"]])
+
+        assert sorted(result["dim_tables"]) == ["department", "staff"]
+        assert result["full_tables"] == ["staff"]
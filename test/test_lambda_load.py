@@ -1,3 +1,69 @@
+import os
+import json
+import boto3
+import pytest
+from moto import mock_aws
+from unittest.mock import patch, MagicMock
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-west-2")
+from src import lambda_load
+
+@pytest.fixture
+def load_tables():
+    """Stands in for the warehouse writes of process_tables, recording the tables each call loads."""
+    with patch(f"{lambda_load.process_tables.__module__}.load_tables_concurrently") as load, \
+            patch.object(lambda_load, "connection_pool", MagicMock()):
+        yield load
+
+class TestLambdaHandlerTables:
+    def test_giving_facts_only_event_when_handler_runs_then_loads_facts(self, load_tables):
+        event = {"fact_tables": {"fact_sales_order": "run/fact_sales_order.parquet"}, "dim_tables": {}}
+
+        response = lambda_load.lambda_handler(event, None)
+
+        assert response == {"status_code": 200, "body": "Data load completed"}
+        load_tables.assert_called_once()
+        assert load_tables.call_args.args[0] == {"fact_sales_order": "run/fact_sales_order.parquet"}
+        assert load_tables.call_args.args[3] is True
+
+@pytest.fixture(scope="function", autouse=True)
+def aws_credentials():
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "eu-west-2"
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        s3 = boto3.client("s3")
+        s3.create_bucket(Bucket="transformed-bucket", CreateBucketConfiguration={"LocationConstraint": "eu-west-2"})
+        with patch.object(lambda_load, "bucket_name", "transformed-bucket"):
+            yield s3
+
+def saved_dim_date_state(s3):
+    keys = [item["Key"] for item in s3.list_objects_v2(Bucket="transformed-bucket").get("Contents", [])]
+    if "_state/dim_date.json" not in keys:
+        return None
+    return json.loads(s3.get_object(Bucket="transformed-bucket", Key="_state/dim_date.json")["Body"].read())
+
+class TestDimDateAcknowledgement:
+    EVENT = {"fact_tables": {}, "dim_tables": {"dim_date": "run/dim_date.parquet"}, "dim_date_covered": ["2022-01-01", "2026-12-31"]}
+
+    def test_giving_dim_date_loaded_when_handler_runs_then_covered_range_is_saved(self, s3, load_tables):
+        lambda_load.lambda_handler(self.EVENT, None)
+
+        assert saved_dim_date_state(s3) == {"start": "2022-01-01", "end": "2026-12-31"}
+
+    def test_giving_dim_load_fails_when_handler_runs_then_covered_range_is_not_saved(self, s3, load_tables):
+        load_tables.side_effect = Exception("connection reset")
+
+        response = lambda_load.lambda_handler(self.EVENT, None)
+
+        assert response["status_code"] == 500
+        assert saved_dim_date_state(s3) is None
+
 # import pytest
 # from unittest.mock import patch, MagicMock
 # from src.lambda_load import lambda_handler
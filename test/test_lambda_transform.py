@@ -1,3 +1,18 @@
+import os
+import io
+import json
+import boto3
+import pytest
+import pandas as pd
+from moto import mock_aws
+from unittest.mock import patch, MagicMock
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-west-2")
+os.environ.setdefault("INGESTION_BUCKET_NAME", "test-ingestion-bucket")
+os.environ.setdefault("TRANSFORMED_BUCKET_NAME", "test-transformed-bucket")
+import src.lambda_transform as lambda_transform
+from src.transform_utils.dim_cache import DimDateState
+
 # from src.lambda_transform import lambda_handler, run_dim_utils, run_fact_utils
 # from src.transform_utils.file_utils import read_csv_from_s3
 # import os
@@ -115,3 +130,168 @@
 #             result = run_fact_utils(event, bucket_name)
 #             assert "fact_sales_order" not in result
 
+@pytest.fixture(scope="function", autouse=True)
+def aws_credentials():
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "eu-west-2"
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        s3 = boto3.client("s3")
+        for bucket in (lambda_transform.ingestion_bucket, lambda_transform.transformed_bucket):
+            s3.create_bucket(Bucket=bucket, CreateBucketConfiguration={"LocationConstraint": "eu-west-2"})
+        with patch.object(lambda_transform, "s3_client", s3):
+            yield s3
+
+def put_csv(s3, key, df):
+    s3.put_object(Bucket=lambda_transform.ingestion_bucket, Key=key, Body=df.to_csv(index=False))
+    return key
+
+CURRENCY = pd.DataFrame({"currency_id": [1, 2], "currency_code": ["GBP", "USD"],
+                         "created_at": ["2022-11-03 14:20:49.962"] * 2, "last_updated": ["2022-11-03 14:20:49.962"] * 2})
+
+def transformed_keys(s3):
+    return [item["Key"] for item in s3.list_objects_v2(Bucket=lambda_transform.transformed_bucket).get("Contents", [])]
+
+def failing_writes():
+    """Makes every parquet write in the transform fail while it serialises the table."""
+    return patch(f"{lambda_transform.write_parquet_to_s3.__module__}._write_parquet", side_effect=OSError("disk full"))
+
+class TestLambdaHandlerWrites:
+    def test_giving_tables_when_writes_succeed_then_returns_their_keys(self, s3):
+        event = {"fact_tables": {}, "dim_tables": {"currency": put_csv(s3, "run/currency.csv", CURRENCY)}}
+
+        result = lambda_transform.lambda_handler(event, None)
+
+        assert result["status_code"] == 200
+        assert sorted(result["dim_tables"]) == ["dim_currency", "dim_date"]
+        assert set(result["dim_tables"].values()) <= set(transformed_keys(s3))
+
+    def test_giving_failed_write_when_handler_runs_then_run_fails(self, s3):
+        event = {"fact_tables": {}, "dim_tables": {"currency": put_csv(s3, "run/currency.csv", CURRENCY)}}
+
+        with failing_writes():
+            result = lambda_transform.lambda_handler(event, None)
+
+        assert result["statusCode"] == 500
+        assert "disk full" in result["body"]
+        assert not any(key.endswith(".parquet") for key in transformed_keys(s3))
+
+class TestDimCacheCommit:
+    def test_giving_failed_write_when_handler_runs_then_cache_is_not_committed(self, s3):
+        event = {"fact_tables": {}, "dim_tables": {"currency": put_csv(s3, "run/currency.csv", CURRENCY)}}
+
+        with failing_writes():
+            lambda_transform.lambda_handler(event, None)
+
+        assert "_state/dim_cache.json" not in transformed_keys(s3)
+
+    def test_giving_failed_write_when_next_run_has_same_inputs_then_dim_is_rebuilt_not_reused(self, s3):
+        event = {"fact_tables": {}, "dim_tables": {"currency": put_csv(s3, "run/currency.csv", CURRENCY)}}
+        with failing_writes():
+            lambda_transform.lambda_handler(event, None)
+
+        result = lambda_transform.lambda_handler(event, None)
+
+        assert result["dim_tables"]["dim_currency"] in transformed_keys(s3)
+        cache = json.loads(s3.get_object(Bucket=lambda_transform.transformed_bucket, Key="_state/dim_cache.json")["Body"].read())
+        assert cache["dims"]["dim_currency"]["key"] == result["dim_tables"]["dim_currency"]
+
+class TestDimDateStateSave:
+    def test_giving_dim_date_write_fails_when_handler_runs_then_covered_range_is_not_saved(self, s3):
+        event = {"fact_tables": {}, "dim_tables": {"currency": put_csv(s3, "run/currency.csv", CURRENCY)}}
+        write = lambda_transform.write_parquet_to_s3
+        def write_all_but_dim_date(df, bucket, key, profile='default'):
+            if key.endswith("/dim_date.parquet"):
+                return "An error occurred: SlowDown"
+            return write(df, bucket, key, profile=profile)
+
+        with patch.object(lambda_transform, "write_parquet_to_s3", side_effect=write_all_but_dim_date):
+            result = lambda_transform.lambda_handler(event, None)
+
+        assert result["statusCode"] == 500
+        assert "_state/dim_date.json" not in transformed_keys(s3)
+
+    def test_giving_failed_run_when_next_run_succeeds_then_dim_date_is_built_in_full(self, s3):
+        event = {"fact_tables": {}, "dim_tables": {"currency": put_csv(s3, "run/currency.csv", CURRENCY)}}
+        with failing_writes():
+            lambda_transform.lambda_handler(event, None)
+
+        result = lambda_transform.lambda_handler(event, None)
+
+        body = s3.get_object(Bucket=lambda_transform.transformed_bucket, Key=result["dim_tables"]["dim_date"])["Body"].read()
+        dates = pd.read_parquet(io.BytesIO(body))["date_id"]
+        assert str(dates.min())[:10] == result["dim_date_covered"][0] == "2022-01-01"
+        assert str(dates.max())[:10] == result["dim_date_covered"][1]
+
+    def test_giving_dim_date_written_but_not_loaded_when_next_run_then_dim_date_is_emitted_again(self, s3):
+        event = {"fact_tables": {}, "dim_tables": {"currency": put_csv(s3, "run/currency.csv", CURRENCY)}}
+        first = lambda_transform.lambda_handler(event, None)
+
+        second = lambda_transform.lambda_handler(event, None)
+
+        assert "_state/dim_date.json" not in transformed_keys(s3)
+        assert "dim_date" in second["dim_tables"]
+        assert second["dim_date_covered"] == first["dim_date_covered"]
+
+    def test_giving_dim_date_loaded_when_next_run_then_dim_date_is_not_emitted(self, s3):
+        event = {"fact_tables": {}, "dim_tables": {"currency": put_csv(s3, "run/currency.csv", CURRENCY)}}
+        first = lambda_transform.lambda_handler(event, None)
+        DimDateState(s3, lambda_transform.transformed_bucket).save(first["dim_date_covered"])
+
+        second = lambda_transform.lambda_handler(event, None)
+
+        assert "dim_date" not in second["dim_tables"]
+        assert "dim_date_covered" not in second
+
+STAFF = pd.DataFrame({"staff_id": [1, 2], "first_name": ["Jeremie", "Deron"], "last_name": ["Franey", "Beier"],
+                      "email_address": ["jeremie.franey@terrifictotes.com", "deron.beier@terrifictotes.com"], "department_id": [2, 6]})
+DEPARTMENT = pd.DataFrame({"department_id": [2, 6], "department_name": ["Purchasing", "Facilities"], "location": ["Manchester", "Manchester"]})
+
+def staff_snapshot(s3):
+    body = s3.get_object(Bucket=lambda_transform.transformed_bucket, Key="_state/join_snapshots/dim_staff/staff.parquet")["Body"].read()
+    return pd.read_parquet(io.BytesIO(body))
+
+class TestJoinSnapshotsCommit:
+    def test_giving_failed_write_when_handler_runs_then_snapshots_are_not_committed(self, s3):
+        event = {"fact_tables": {}, "dim_tables": {"staff": put_csv(s3, "run/staff.csv", STAFF),
+                                                    "department": put_csv(s3, "run/department.csv", DEPARTMENT)},
+                 "full_tables": ["staff", "department"]}
+
+        with patch.object(lambda_transform, "incremental_joins", True), failing_writes():
+            result = lambda_transform.lambda_handler(event, None)
+
+        assert result["statusCode"] == 500
+        assert not any(key.startswith("_state/join_snapshots/") for key in transformed_keys(s3))
+
+    def test_giving_failed_write_of_changed_rows_when_handler_runs_then_snapshot_keeps_previous_rows(self, s3):
+        full = {"fact_tables": {}, "dim_tables": {"staff": put_csv(s3, "run/staff.csv", STAFF),
+                                                   "department": put_csv(s3, "run/department.csv", DEPARTMENT)},
+                "full_tables": ["staff", "department"]}
+        changed = {"fact_tables": {}, "dim_tables": {"staff": put_csv(s3, "next/staff.csv", STAFF[STAFF["staff_id"] == 2].assign(department_id=2))}}
+
+        with patch.object(lambda_transform, "incremental_joins", True):
+            lambda_transform.lambda_handler(full, None)
+            with failing_writes():
+                lambda_transform.lambda_handler(changed, None)
+            result = lambda_transform.lambda_handler(changed, None)
+
+        assert staff_snapshot(s3).sort_values("staff_id")["department_id"].tolist() == [2, 2]
+        assert "dim_staff" in result["dim_tables"]
+
+    def test_giving_failing_dim_util_when_handler_runs_then_its_snapshots_are_not_committed(self, s3):
+        event = {"fact_tables": {}, "dim_tables": {"staff": put_csv(s3, "run/staff.csv", STAFF),
+                                                    "department": put_csv(s3, "run/department.csv", DEPARTMENT)},
+                 "full_tables": ["staff", "department"]}
+
+        with patch.object(lambda_transform, "incremental_joins", True), \
+                patch.dict(lambda_transform.TRANSFORM_UTILS["pandas"], {"dim_staff": MagicMock(side_effect=KeyError("department_name"))}):
+            result = lambda_transform.lambda_handler(event, None)
+
+        assert result["status_code"] == 200
+        assert "dim_staff" not in result["dim_tables"]
+        assert not any(key.startswith("_state/join_snapshots/dim_staff/") for key in transformed_keys(s3))
@@ -0,0 +1,113 @@
+import io
+import os
+import boto3
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from unittest import mock
+from botocore.exceptions import ClientError
+from moto import mock_aws
+from src.load_utils.parquet_stream import S3RangeReader, open_parquet_file, iter_row_groups, prefetch
+
+@pytest.fixture(scope="function", autouse=True)
+def aws_credentials():
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "eu-west-2"
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket='transformed-bucket', CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'})
+        yield s3
+
+def put_parquet(s3, key, df, row_group_size=None, index=False):
+    buffer = io.BytesIO()
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=index), buffer, row_group_size=row_group_size)
+    s3.put_object(Bucket='transformed-bucket', Key=key, Body=buffer.getvalue())
+    return buffer.getvalue()
+
+class TestS3RangeReader:
+    def test_reads_and_seeks_within_object(self, s3):
+        s3.put_object(Bucket='transformed-bucket', Key='file.bin', Body=b'0123456789')
+        reader = S3RangeReader(s3, 'transformed-bucket', 'file.bin', 10)
+
+        assert reader.read(4) == b'0123'
+        reader.seek(-3, io.SEEK_END)
+        assert reader.read() == b'789'
+        assert reader.read(1) == b''
+        reader.seek(2)
+        reader.seek(3, io.SEEK_CUR)
+        assert (reader.tell(), reader.read(2)) == (5, b'56')
+
+class TestOpenParquetFile:
+    @pytest.fixture
+    def df(self):
+        return pd.DataFrame({"sales_record_id": range(10), "units_sold": [i * 10 for i in range(10)]})
+
+    def test_small_file_is_read_in_one_request(self, s3, df):
+        put_parquet(s3, 'fact.parquet', df, row_group_size=4)
+
+        with mock.patch.object(s3, 'get_object', wraps=s3.get_object) as get_object:
+            parquet_file = open_parquet_file(s3, 'transformed-bucket', 'fact.parquet')
+            batches = list(iter_row_groups(parquet_file))
+
+        assert parquet_file.num_row_groups == 3
+        assert pa.Table.from_batches(batches).to_pandas().equals(df)
+        get_object.assert_called_once_with(Bucket='transformed-bucket', Key='fact.parquet')
+
+    def test_large_file_is_read_with_ranged_requests(self, s3, df):
+        put_parquet(s3, 'fact.parquet', df, row_group_size=4)
+
+        with mock.patch.object(s3, 'get_object', wraps=s3.get_object) as get_object:
+            parquet_file = open_parquet_file(s3, 'transformed-bucket', 'fact.parquet', range_read_min_bytes=1)
+            batches = list(iter_row_groups(parquet_file))
+
+        assert [batch.num_rows for batch in batches] == [4, 4, 2]
+        assert pa.Table.from_batches(batches).to_pandas().equals(df)
+        assert get_object.call_args_list and all("Range" in call.kwargs for call in get_object.call_args_list)
+
+    def test_missing_file_raises_no_such_key(self, s3):
+        with pytest.raises(ClientError) as excinfo:
+            open_parquet_file(s3, 'transformed-bucket', 'missing.parquet')
+
+        assert excinfo.value.response["Error"]["Code"] == "NoSuchKey"
+
+    def test_pandas_index_is_not_yielded_as_column(self, s3, df):
+        put_parquet(s3, 'dim.parquet', df.set_index("sales_record_id", drop=False).rename_axis("index"), index=True)
+
+        batches = list(iter_row_groups(open_parquet_file(s3, 'transformed-bucket', 'dim.parquet')))
+
+        assert batches[0].schema.names == ["sales_record_id", "units_sold"]
+
+class TestPrefetch:
+    def test_yields_items_in_order(self):
+        assert list(prefetch(iter(range(5)))) == [0, 1, 2, 3, 4]
+
+    def test_raises_error_from_iterable(self):
+        def failing():
+            yield 1
+            raise ValueError("corrupt row group")
+
+        items = prefetch(failing())
+
+        assert next(items) == 1
+        with pytest.raises(ValueError, match="corrupt row group"):
+            next(items)
+
+    def test_stops_producing_when_consumer_stops(self):
+        produced = []
+        def counting():
+            for i in range(1000):
+                produced.append(i)
+                yield i
+
+        items = prefetch(counting(), depth=1)
+        assert next(items) == 0
+        items.close()
+
+        assert len(produced) <= 3
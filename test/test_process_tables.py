@@ -2,6 +2,8 @@ import pytest
 from unittest import mock
 from src.load_utils.write_dataframe_to_dw import process_tables  # Assuming process_tables is in src/task_name.py
 import logging
+import threading
+from src.ingestion_utils.database_utils import ConnectionPool
 
 class TestProcessTables:
 
@@ -30,10 +32,10 @@ class TestProcessTables:
             process_tables(tables="not_a_dict", s3_client=mock_s3_client, db_conn=mock_db_conn)
         assert str(excinfo.value) == "fact_tables must be a dictionary"
 
-    def test_giving_empty_dim_tables_when_is_fact_false_then_raise_value_error(self, mock_s3_client, mock_db_conn):
-        with pytest.raises(ValueError) as excinfo:
-            process_tables(tables={}, s3_client=mock_s3_client, db_conn=mock_db_conn, is_fact=False)
-        assert str(excinfo.value) == "dim_tables cannot be empty"
+    def test_giving_empty_dim_tables_when_is_fact_false_then_no_error_and_log_info(self, mock_s3_client, mock_db_conn, caplog):
+        caplog.set_level(logging.INFO)
+        process_tables(tables={}, s3_client=mock_s3_client, db_conn=mock_db_conn, is_fact=False)
+        assert "dim_tables is empty, there is no update" in caplog.text
 
     def test_giving_empty_fact_tables_when_is_fact_true_then_no_error_and_log_info(self, mock_s3_client, mock_db_conn, caplog):
         caplog.set_level(logging.INFO)
@@ -89,4 +91,84 @@ class TestProcessTables:
 
         process_tables(tables=tables_input, s3_client=mock_s3_client, db_conn=mock_db_conn)
 
-        assert tables_input == tables_original
\ No newline at end of file
+        assert tables_input == tables_original
+
+class TestProcessTablesWithPool:
+
+    @pytest.fixture
+    def pool(self):
+        return ConnectionPool(max_size=2, connection_factory=mock.MagicMock)
+
+    @pytest.fixture
+    def mock_read_parquet_from_s3(self):
+        with mock.patch("src.load_utils.write_dataframe_to_dw.read_parquet_from_s3") as mock_read:
+            mock_read.side_effect = lambda s3_client, s3_key: f"df from {s3_key}"
+            yield mock_read
+
+    @pytest.fixture
+    def mock_write_dataframe_to_db(self):
+        with mock.patch("src.load_utils.write_dataframe_to_dw.write_dataframe_to_db") as mock_write:
+            yield mock_write
+
+    def test_giving_pool_when_process_tables_then_writes_tables_at_the_same_time_on_separate_connections(self, pool, mock_read_parquet_from_s3, mock_write_dataframe_to_db):
+        both_writing = threading.Barrier(2, timeout=5)
+        connections = {}
+        def write(df, conn, table_name, insert_mode):
+            connections[table_name] = conn
+            both_writing.wait()
+        mock_write_dataframe_to_db.side_effect = write
+
+        process_tables({"dim_staff": "dim_staff.parquet", "dim_date": "dim_date.parquet"}, mock.MagicMock(), None, is_fact=False, pool=pool)
+
+        assert connections["dim_staff"] is not connections["dim_date"]
+        mock_write_dataframe_to_db.assert_any_call("df from dim_staff.parquet", connections["dim_staff"], "dim_staff", insert_mode=False)
+
+    def test_giving_pool_when_more_tables_than_connections_then_opens_at_most_pool_size(self, mock_read_parquet_from_s3, mock_write_dataframe_to_db):
+        factory = mock.MagicMock()
+        pool = ConnectionPool(max_size=2, connection_factory=factory)
+        tables = {f"fact_{i}": f"fact_{i}.parquet" for i in range(6)}
+
+        process_tables(tables, mock.MagicMock(), None, pool=pool)
+
+        assert mock_write_dataframe_to_db.call_count == 6
+        assert factory.call_count <= 2
+
+    def test_giving_pool_when_a_table_fails_then_other_tables_still_load_and_error_names_table(self, pool, mock_read_parquet_from_s3, mock_write_dataframe_to_db):
+        def write(df, conn, table_name, insert_mode):
+            if table_name == "fact_payment":
+                raise Exception("DB write error")
+        mock_write_dataframe_to_db.side_effect = write
+
+        with pytest.raises(Exception) as excinfo:
+            process_tables({"fact_sales_order": "a.parquet", "fact_payment": "b.parquet", "fact_purchase_order": "c.parquet"}, mock.MagicMock(), None, pool=pool)
+
+        assert str(excinfo.value) == "Error processing table 'fact_payment': DB write error"
+        assert mock_write_dataframe_to_db.call_count == 3
+
+class TestProcessTablesStreamingRowGroups:
+
+    @pytest.fixture(autouse=True)
+    def stream_row_groups(self):
+        with mock.patch("src.load_utils.write_dataframe_to_dw.STREAM_ROW_GROUPS", True):
+            yield
+
+    @pytest.fixture
+    def mock_load_table_in_row_groups(self):
+        with mock.patch("src.load_utils.write_dataframe_to_dw.load_table_in_row_groups") as mock_load:
+            yield mock_load
+
+    def test_giving_stream_row_groups_when_process_tables_then_streams_each_table_instead_of_reading_it_whole(self, mock_load_table_in_row_groups):
+        s3_client, db_conn = mock.MagicMock(), mock.MagicMock()
+        with mock.patch("src.load_utils.write_dataframe_to_dw.read_parquet_from_s3") as mock_read:
+            process_tables({"dim_staff": "dim_staff.parquet"}, s3_client, db_conn, is_fact=False)
+
+        mock_read.assert_not_called()
+        mock_load_table_in_row_groups.assert_called_once_with(s3_client, "dim_staff.parquet", db_conn, "dim_staff", False)
+
+    def test_giving_stream_row_groups_and_pool_when_process_tables_then_streams_on_pooled_connection(self, mock_load_table_in_row_groups):
+        factory = mock.MagicMock()
+        s3_client = mock.MagicMock()
+
+        process_tables({"fact_payment": "fact_payment.parquet"}, s3_client, None, pool=ConnectionPool(max_size=2, connection_factory=factory))
+
+        mock_load_table_in_row_groups.assert_called_once_with(s3_client, "fact_payment.parquet", factory.return_value, "fact_payment", True)
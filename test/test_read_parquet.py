@@ -180,3 +180,27 @@ class TestReadParquetFromS3:
             read_parquet_from_s3(s3_client, s3_key)
         assert "BUCKET_NAME environment variable not set" in str(excinfo.value)
         os.environ["BUCKET_NAME"] = "test-bucket"
+
+    def test_giving_dataset_prefix_when_read_parquet_from_s3_then_return_every_partition_in_key_order(
+        self, aws_setup
+    ):
+        s3_client, bucket_name = aws_setup
+        for key, ids in (("fact_sales_order/year=2022/month=11/day=04/part-00000.parquet", [3]),
+                         ("fact_sales_order/year=2022/month=11/day=03/part-00000.parquet", [1, 2]),
+                         ("fact_sales_order_extra.parquet", [9])):
+            buffer = BytesIO()
+            pd.DataFrame({"sales_order_id": ids}).to_parquet(buffer)
+            s3_client.put_object(Bucket=bucket_name, Key=key, Body=buffer.getvalue())
+
+        result_df = read_parquet_from_s3(s3_client, "fact_sales_order/")
+
+        pd.testing.assert_frame_equal(result_df, pd.DataFrame({"sales_order_id": [1, 2, 3]}))
+
+    def test_giving_empty_dataset_prefix_when_read_parquet_from_s3_then_raise_no_such_key(
+        self, aws_setup
+    ):
+        s3_client, _ = aws_setup
+
+        with pytest.raises(ClientError) as excinfo:
+            read_parquet_from_s3(s3_client, "fact_sales_order/")
+        assert excinfo.value.response["Error"]["Code"] == "NoSuchKey"
@@ -0,0 +1,85 @@
+import io
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from src.transform_utils import arrow_engine
+from src.transform_utils.fact_sales_order import util_fact_sales_order
+from src.transform_utils.streaming import transform_batches_to_parquet
+
+def sales_orders(ids, units_sold=None):
+    rows = len(ids)
+    return pa.table({
+        "sales_order_id": pa.array(ids, pa.int64()),
+        "created_at": pa.array([pd.Timestamp('2022-11-03 14:20:52.186')] * rows, pa.timestamp('us')),
+        "last_updated": pa.array([pd.Timestamp('2022-11-04 09:00:00')] * rows, pa.timestamp('us')),
+        "staff_id": pa.array([19] * rows, pa.int64()),
+        "counterparty_id": pa.array([8] * rows, pa.int64()),
+        "units_sold": pa.array(units_sold or [42972] * rows, pa.int64()),
+        "unit_price": pa.array([3.94] * rows, pa.float64()),
+        "currency_id": pa.array([2] * rows, pa.int64()),
+        "design_id": pa.array([3] * rows, pa.int64()),
+        "agreed_payment_date": pa.array(['2022-11-08'] * (rows - 1) + ['2023-01-02'], pa.string()),
+        "agreed_delivery_date": pa.array(['2022-11-07'] * rows, pa.string()),
+        "agreed_delivery_location_id": pa.array([8] * rows, pa.int64()),
+    })
+
+@pytest.fixture
+def batches():
+    return sales_orders([1, 2, 3, 4, 5]).to_batches(max_chunksize=2)
+
+@pytest.mark.parametrize("util, as_arrow", [
+    (util_fact_sales_order, False),
+    (arrow_engine.arrow_fact_sales_order, True),
+])
+class TestTransformBatchesToParquet:
+
+    def test_writes_one_row_group_per_batch(self, util, as_arrow, batches):
+        sink = io.BytesIO()
+
+        summary = transform_batches_to_parquet(util, batches, sink, as_arrow)
+
+        parquet_file = pq.ParquetFile(io.BytesIO(sink.getvalue()))
+        assert parquet_file.num_row_groups == 3
+        assert summary["rows"] == 5
+        assert parquet_file.read()["sales_order_id"].to_pylist() == [1, 2, 3, 4, 5]
+
+    def test_output_has_same_values_as_whole_table_transform(self, util, as_arrow, batches):
+        sink = io.BytesIO()
+        whole = sales_orders([1, 2, 3, 4, 5])
+
+        transform_batches_to_parquet(util, batches, sink, as_arrow)
+
+        expected = util(whole if as_arrow else whole.to_pandas())
+        if isinstance(expected, pd.DataFrame):
+            expected = pa.Table.from_pandas(expected, preserve_index=False)
+        assert pq.read_table(io.BytesIO(sink.getvalue())).to_pylist() == expected.to_pylist()
+
+    def test_returns_date_bounds_of_all_batches(self, util, as_arrow, batches):
+        summary = transform_batches_to_parquet(util, batches, io.BytesIO(), as_arrow)
+
+        assert summary["dates"] == (pd.Timestamp('2022-11-03'), pd.Timestamp('2023-01-02'))
+
+    def test_integer_column_keeps_type_when_a_batch_has_nulls(self, util, as_arrow):
+        sink = io.BytesIO()
+        batches = sales_orders([1, 2, 3, 4], units_sold=[10, 20, None, 40]).to_batches(max_chunksize=2)
+
+        transform_batches_to_parquet(util, batches, sink, as_arrow)
+
+        result = pq.read_table(io.BytesIO(sink.getvalue()))
+        assert result.schema.field("units_sold").type == pa.int64()
+        assert result["units_sold"].to_pylist() == [10, 20, None, 40]
+
+    def test_writes_nothing_without_rows(self, util, as_arrow):
+        sink = io.BytesIO()
+
+        summary = transform_batches_to_parquet(util, sales_orders([1]).slice(0, 0).to_batches(), sink, as_arrow)
+
+        assert summary == {"rows": 0, "dates": None}
+        assert sink.getvalue() == b""
+
+    def test_raises_util_message(self, util, as_arrow):
+        batches = sales_orders([1, 2]).drop_columns(["staff_id"]).to_batches()
+
+        with pytest.raises(ValueError):
+            transform_batches_to_parquet(util, batches, io.BytesIO(), as_arrow)
@@ -0,0 +1,41 @@
+import datetime
+import pandas as pd
+import pyarrow as pa
+import pytest
+from src.transform_utils.temporal import parse_timestamps, split_timestamp, to_dates
+
+class TestParseTimestamps:
+    def test_parses_iso_timestamps_with_and_without_fractions(self):
+        result = parse_timestamps(pd.Series(['2022-11-03 14:20:52.186', '2022-11-03 14:20:52']))
+
+        assert result.tolist() == [pd.Timestamp('2022-11-03 14:20:52.186'), pd.Timestamp('2022-11-03 14:20:52')]
+
+    def test_falls_back_to_mixed_formats(self):
+        result = parse_timestamps(pd.Series(['2022-11-03 14:20:52', '4 Nov 2022 09:00']))
+
+        assert result.tolist() == [pd.Timestamp('2022-11-03 14:20:52'), pd.Timestamp('2022-11-04 09:00')]
+
+    def test_returns_datetime_columns_unchanged(self):
+        values = pd.Series(pd.to_datetime(['2022-11-03 14:20:52']))
+
+        assert parse_timestamps(values) is values
+
+    def test_raises_for_invalid_values(self):
+        with pytest.raises(ValueError):
+            parse_timestamps(pd.Series(['date string']))
+
+class TestSplitTimestamp:
+    def test_returns_arrow_date_and_time_columns(self):
+        values = pd.Series(['2022-11-03 14:20:52.186', None], index=[5, 6])
+
+        dates, times = split_timestamp(values)
+
+        assert dates.dtype == pd.ArrowDtype(pa.date32())
+        assert times.dtype == pd.ArrowDtype(pa.time64('us'))
+        assert dates.index.tolist() == [5, 6]
+        assert dates.iloc[0] == datetime.date(2022, 11, 3)
+        assert times.iloc[0] == datetime.time(14, 20, 52, 186000)
+        assert pd.isna(dates.iloc[1]) and pd.isna(times.iloc[1])
+
+    def test_to_dates_parses_date_strings(self):
+        assert to_dates(pd.Series(['2022-11-07'])).iloc[0] == datetime.date(2022, 11, 7)
@@ -6,7 +6,13 @@ import os
 from botocore.exceptions import ClientError, BotoCoreError, NoCredentialsError, PartialCredentialsError
 from unittest.mock import patch
 
-from src.transform_utils.file_utils import read_csv_from_s3, write_parquet_to_s3
+import io
+import datetime
+import gzip
+import json
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.transform_utils.file_utils import read_csv_from_s3, read_table_from_s3, write_parquet_to_s3, read_csv_batches_from_s3, write_partitioned_parquet_to_s3
 
 @pytest.fixture(scope="function",autouse=True)
 def aws_credentials():
@@ -150,4 +156,224 @@ class TestWriteParquetToCsv:
                 df = pd.DataFrame({'col1': [1, 2, 3], 'col2': ['a', 'b', 'c']})
                 result = write_parquet_to_s3(df, 'test-bucket', 'test.parquet')
 
-                assert "An AWS error occurred" in result
\ No newline at end of file
+                assert "An AWS error occurred" in result
+
+
+class TestParquetProfiles:
+
+    @pytest.fixture
+    def s3_with_bucket(self):
+        with mock_aws():
+            s3 = boto3.client('s3')
+            s3.create_bucket(Bucket='test-bucket', CreateBucketConfiguration={
+            'LocationConstraint': 'eu-west-2'})
+            yield s3
+
+    def read_metadata(self, s3, key):
+        return pq.ParquetFile(io.BytesIO(s3.get_object(Bucket='test-bucket', Key=key)['Body'].read())).metadata
+
+    def test_default_profile_writes_snappy(self, s3_with_bucket):
+        write_parquet_to_s3(pd.DataFrame({'col1': [1, 2, 3]}), 'test-bucket', 'test.parquet')
+
+        assert self.read_metadata(s3_with_bucket, 'test.parquet').row_group(0).column(0).compression == 'SNAPPY'
+
+    @pytest.mark.parametrize("as_table", [False, True])
+    def test_profile_settings_are_applied(self, s3_with_bucket, as_table):
+        df = pd.DataFrame({'created_date': ['2022-11-04', '2022-11-03', '2022-11-05'], 'sales_order_id': [1, 2, 3]})
+        profile = {'compression': 'zstd', 'compression_level': 3, 'row_group_size': 2, 'write_statistics': True, 'sort_by': ['created_date', 'missing']}
+
+        write_parquet_to_s3(pa.Table.from_pandas(df) if as_table else df, 'test-bucket', 'test.parquet', profile=profile)
+
+        metadata = self.read_metadata(s3_with_bucket, 'test.parquet')
+        first_group = metadata.row_group(0)
+        assert metadata.num_row_groups == 2
+        assert first_group.column(0).compression == 'ZSTD'
+        assert first_group.column(0).statistics.min == '2022-11-03'
+        assert [column.column_index for column in first_group.sorting_columns] == [0]
+        result = pd.read_parquet(io.BytesIO(s3_with_bucket.get_object(Bucket='test-bucket', Key='test.parquet')['Body'].read()))
+        assert result['sales_order_id'].tolist() == [2, 1, 3]
+
+    def test_returns_message_for_unknown_profile(self, s3_with_bucket):
+        result = write_parquet_to_s3(pd.DataFrame({'col1': [1]}), 'test-bucket', 'test.parquet', profile='tiny')
+
+        assert result.startswith("An error occurred: Unknown parquet profile 'tiny'")
+
+    @pytest.mark.parametrize("as_table", [False, True])
+    def test_partitioned_write_splits_rows_by_created_date(self, s3_with_bucket, as_table):
+        df = pd.DataFrame({
+            'sales_order_id': [1, 2, 3, 4],
+            'created_date': pd.array([datetime.date(2022, 11, 3), datetime.date(2023, 1, 1), None, datetime.date(2022, 11, 3)], dtype=pd.ArrowDtype(pa.date32())),
+        })
+
+        result = write_partitioned_parquet_to_s3(pa.Table.from_pandas(df) if as_table else df, 'test-bucket', 'run/fact_sales_order/', profile='fast')
+
+        keys = [item['Key'] for item in s3_with_bucket.list_objects_v2(Bucket='test-bucket')['Contents']]
+        assert result == "Dataset successfully uploaded to s3://test-bucket/run/fact_sales_order/"
+        assert keys == [
+            'run/fact_sales_order/year=2022/month=11/day=03/part-00000.parquet',
+            'run/fact_sales_order/year=2023/month=01/day=01/part-00000.parquet',
+            'run/fact_sales_order/year=__HIVE_DEFAULT_PARTITION__/part-00000.parquet',
+        ]
+        first = pd.read_parquet(io.BytesIO(s3_with_bucket.get_object(Bucket='test-bucket', Key=keys[0])['Body'].read()))
+        assert list(first.columns) == ['sales_order_id', 'created_date']
+        assert first['sales_order_id'].tolist() == [1, 4]
+
+class TestReadTableFromS3:
+
+    @pytest.fixture
+    def s3_with_bucket(self):
+        with mock_aws():
+            s3 = boto3.client('s3')
+            s3.create_bucket(Bucket='test-bucket', CreateBucketConfiguration={
+            'LocationConstraint': 'eu-west-2'})
+            yield s3
+
+    @pytest.fixture
+    def typed_table(self):
+        return pa.table({
+            'sales_order_id': pa.array([1, 2], type=pa.int64()),
+            'created_at': pa.array([pd.Timestamp('2022-11-03 14:20:52.186'), pd.Timestamp('2022-11-04 09:00:00')], type=pa.timestamp('us')),
+            'unit_price': pa.array([3.94, None], type=pa.float64()),
+        })
+
+    def test_reads_parquet_with_types(self, s3_with_bucket, typed_table):
+        buffer = io.BytesIO()
+        pq.write_table(typed_table, buffer)
+        s3_with_bucket.put_object(Bucket='test-bucket', Key='2025/3/6/22/51/sales_order.parquet', Body=buffer.getvalue())
+
+        result = read_table_from_s3('test-bucket', '2025/3/6/22/51/sales_order.parquet')
+
+        assert isinstance(result, pd.DataFrame)
+        assert pd.api.types.is_datetime64_any_dtype(result['created_at'])
+        assert result['sales_order_id'].tolist() == [1, 2]
+
+    def test_reads_arrow_ipc_with_types(self, s3_with_bucket, typed_table):
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_file(sink, typed_table.schema) as writer:
+            writer.write_table(typed_table)
+        s3_with_bucket.put_object(Bucket='test-bucket', Key='sales_order.arrow', Body=sink.getvalue().to_pybytes())
+
+        result = read_table_from_s3('test-bucket', 'sales_order.arrow')
+
+        assert pd.api.types.is_datetime64_any_dtype(result['created_at'])
+        assert result['unit_price'].iloc[0] == 3.94
+
+    def test_reads_csv_for_other_keys(self, s3_with_bucket):
+        s3_with_bucket.put_object(Bucket='test-bucket', Key='currency.csv', Body="currency_id,currency_code\n1,GBP\n")
+
+        result = read_table_from_s3('test-bucket', 'currency.csv')
+
+        assert result['currency_code'].tolist() == ['GBP']
+
+    def test_reads_gzip_csv(self, s3_with_bucket):
+        s3_with_bucket.put_object(Bucket='test-bucket', Key='currency.csv.gz', Body=gzip.compress(b"currency_id,currency_code\n1,GBP\n2,USD\n"))
+
+        result = read_table_from_s3('test-bucket', 'currency.csv.gz')
+
+        assert result['currency_code'].tolist() == ['GBP', 'USD']
+
+    def test_reads_zstd_csv(self, s3_with_bucket):
+        sink = pa.BufferOutputStream()
+        with pa.CompressedOutputStream(sink, 'zstd') as compressed:
+            compressed.write(b"currency_id,currency_code\n1,GBP\n2,USD\n")
+        s3_with_bucket.put_object(Bucket='test-bucket', Key='currency.csv.zst', Body=sink.getvalue().to_pybytes())
+
+        result = read_table_from_s3('test-bucket', 'currency.csv.zst')
+
+        assert result['currency_id'].tolist() == [1, 2]
+
+    def test_returns_message_for_missing_key(self, s3_with_bucket):
+        result = read_table_from_s3('test-bucket', 'missing.parquet')
+
+        assert result == "The file 'missing.parquet' does not exist in the bucket 'test-bucket'."
+
+    def test_reads_csv_with_schema_sidecar_types(self, s3_with_bucket):
+        s3_with_bucket.put_object(Bucket='test-bucket', Key='address.csv.gz', Body=gzip.compress(
+            b"address_id,postal_code,created_at,last_updated\n1,01234,2022-11-03 14:20:52.186000,2022-11-03 14:20:52.186000\n2,,2022-11-04 09:00:00,2022-11-04 09:00:00\n"))
+        s3_with_bucket.put_object(Bucket='test-bucket', Key='address.csv.gz.schema.json', Body=json.dumps({"columns": [
+            {"name": "address_id", "type_oid": 23, "type": "int64"},
+            {"name": "postal_code", "type_oid": 1043, "type": "string"},
+            {"name": "created_at", "type_oid": 1114, "type": "timestamp"},
+            {"name": "last_updated", "type_oid": 1114, "type": "timestamp"},
+        ]}))
+
+        result = read_table_from_s3('test-bucket', 'address.csv.gz', ['address_id', 'postal_code', 'created_at'])
+
+        assert list(result.columns) == ['address_id', 'postal_code', 'created_at']
+        assert result['postal_code'].tolist()[0] == '01234'
+        assert pd.isna(result['postal_code'].tolist()[1])
+        assert pd.api.types.is_integer_dtype(result['address_id'])
+        assert pd.api.types.is_datetime64_any_dtype(result['created_at'])
+
+    def test_reads_and_concatenates_parts_under_prefix(self, s3_with_bucket):
+        s3_with_bucket.put_object(Bucket='test-bucket', Key='2025/3/6/22/51/sales_order/part-00002.csv', Body="sales_order_id\n3\n")
+        s3_with_bucket.put_object(Bucket='test-bucket', Key='2025/3/6/22/51/sales_order/part-00001.csv', Body="sales_order_id\n1\n2\n")
+        s3_with_bucket.put_object(Bucket='test-bucket', Key='2025/3/6/22/51/sales_order/part-00001.csv.schema.json', Body='{"columns": [{"name": "sales_order_id", "type_oid": 23, "type": "int64"}]}')
+
+        result = read_table_from_s3('test-bucket', '2025/3/6/22/51/sales_order/')
+
+        assert result['sales_order_id'].tolist() == [1, 2, 3]
+
+    def test_returns_message_for_empty_prefix(self, s3_with_bucket):
+        result = read_table_from_s3('test-bucket', 'sales_order/')
+
+        assert result == "No parts found under 'sales_order/' in the bucket 'test-bucket'."
+
+    def test_reads_parts_as_arrow_table(self, s3_with_bucket):
+        s3_with_bucket.put_object(Bucket='test-bucket', Key='sales_order/part-00001.csv', Body="sales_order_id,unit_price\n1,2\n")
+        s3_with_bucket.put_object(Bucket='test-bucket', Key='sales_order/part-00002.csv', Body="sales_order_id,unit_price\n2,3.5\n")
+
+        result = read_table_from_s3('test-bucket', 'sales_order/', as_arrow=True)
+
+        assert isinstance(result, pa.Table)
+        assert result['unit_price'].to_pylist() == [2.0, 3.5]
+
+    def test_arrow_table_round_trips_through_parquet(self, s3_with_bucket, typed_table):
+        write_parquet_to_s3(typed_table, 'test-bucket', 'fact_sales_order.parquet')
+
+        result = read_table_from_s3('test-bucket', 'fact_sales_order.parquet', as_arrow=True)
+
+        assert result.equals(typed_table)
+
+class TestReadCsvBatchesFromS3:
+
+    @pytest.fixture
+    def s3_with_bucket(self):
+        with mock_aws():
+            s3 = boto3.client('s3')
+            s3.create_bucket(Bucket='test-bucket', CreateBucketConfiguration={
+            'LocationConstraint': 'eu-west-2'})
+            yield s3
+
+    def put_extract(self, s3, key, rows):
+        body = "sales_order_id,units_sold\n" + "".join(f"{i},{'' if i % 3 == 0 else i * 10}\n" for i in rows)
+        s3.put_object(Bucket='test-bucket', Key=key, Body=gzip.compress(body.encode()))
+        s3.put_object(Bucket='test-bucket', Key=f"{key}.schema.json", Body=json.dumps({"columns": [
+            {"name": "sales_order_id", "type_oid": 23, "type": "int64"},
+            {"name": "units_sold", "type_oid": 23, "type": "int64"},
+        ]}))
+
+    def test_streams_typed_batches_of_about_block_size(self, s3_with_bucket):
+        self.put_extract(s3_with_bucket, 'sales_order.csv.gz', range(1, 1001))
+
+        batches = list(read_csv_batches_from_s3('test-bucket', 'sales_order.csv.gz', block_size=1024))
+
+        assert len(batches) > 1
+        assert all(batch.schema.field('units_sold').type == pa.int64() for batch in batches)
+        assert pa.Table.from_batches(batches)['sales_order_id'].to_pylist() == list(range(1, 1001))
+
+    def test_streams_parts_under_prefix_in_order(self, s3_with_bucket):
+        self.put_extract(s3_with_bucket, 'sales_order/part-00002.csv.gz', [3])
+        self.put_extract(s3_with_bucket, 'sales_order/part-00001.csv.gz', [1, 2])
+
+        batches = read_csv_batches_from_s3('test-bucket', 'sales_order/', ['sales_order_id'])
+
+        assert pa.Table.from_batches(list(batches)).to_pydict() == {'sales_order_id': [1, 2, 3]}
+
+    def test_returns_none_without_schema_sidecar(self, s3_with_bucket):
+        s3_with_bucket.put_object(Bucket='test-bucket', Key='sales_order.csv', Body="sales_order_id\n1\n")
+
+        assert read_csv_batches_from_s3('test-bucket', 'sales_order.csv') is None
+
+    def test_returns_none_for_parquet(self, s3_with_bucket):
+        assert read_csv_batches_from_s3('test-bucket', 'sales_order.parquet') is None
@@ -1,9 +1,11 @@
 import pytest
 import pandas as pd
-from src.load_utils.write_dataframe_to_dw import construct_sql
+import datetime
+import pyarrow as pa
+from src.load_utils.write_dataframe_to_dw import construct_sql, construct_sql_batches
 import pg8000
 from unittest import mock
-from src.load_utils.write_dataframe_to_dw import write_dataframe_to_db
+from src.load_utils.write_dataframe_to_dw import write_dataframe_to_db, encode_csv_chunks, write_batches_to_db
 class TestConstructSQL:
     @pytest.fixture
     def sample_dataframe(self):
@@ -63,7 +65,8 @@ class TestConstructSQL:
     def test_giving_dataframe_and_table_name_when_upsert_is_true_then_return_upsert_sql(self, sample_dataframe):
         table_name = "test_table"
         expected_sql = """INSERT INTO test_table (col1, col2, col3) VALUES (1, 'a', 1.1), (2, 'b', 2.2), (3, 'c', 3.3)
-ON CONFLICT (col1) DO UPDATE SET col2=excluded.col2, col3=excluded.col3;"""
+ON CONFLICT (col1) DO UPDATE SET col2=excluded.col2, col3=excluded.col3
+WHERE (test_table.col2, test_table.col3) IS DISTINCT FROM (excluded.col2, excluded.col3);"""
         actual_sql = construct_sql(sample_dataframe, table_name, upsert=True)
         assert actual_sql == expected_sql
 
@@ -85,6 +88,60 @@ ON CONFLICT (col1) DO UPDATE SET col2=excluded.col2, col3=excluded.col3;"""
         actual_sql = construct_sql(dataframe_with_date, table_name, upsert=False)
         assert excepted_sql == actual_sql
 
+    def test_giving_mixed_dtypes_with_nulls_when_construct_sql_then_renders_each_value_as_a_literal(self):
+        dataframe = pd.DataFrame({
+            "id": [1, 2, 3],
+            "name": ["O'Brien", None, ""],
+            "amount": [1.5, float("nan"), 1e20],
+            "paid": pd.array([True, None, False], dtype="boolean"),
+            "created_date": pd.array([datetime.date(2022, 11, 3), None, datetime.date(2023, 1, 1)], dtype=pd.ArrowDtype(pa.date32())),
+            "created_at": pd.to_datetime(["2022-11-03 14:20:52", None, "2023-01-01 00:00:00"]),
+            "mixed": [1, "a", None],
+        })
+
+        actual_sql = construct_sql(dataframe, "mixed_table", upsert=False)
+
+        assert actual_sql == (
+            "INSERT INTO mixed_table (id, name, amount, paid, created_date, created_at, mixed) VALUES "
+            "(1, 'O''Brien', 1.5, TRUE, '2022-11-03', '2022-11-03', 1), "
+            "(2, NULL, NULL, NULL, NULL, NULL, 'a'), "
+            "(3, '', 1e+20, FALSE, '2023-01-01', '2023-01-01', NULL);"
+        )
+
+class TestConstructSQLBatches:
+    @pytest.fixture
+    def dataframe(self):
+        return pd.DataFrame({"col1": range(5), "col2": list("abcde")})
+
+    def test_giving_max_rows_then_yields_statements_of_at_most_max_rows(self, dataframe):
+        statements = list(construct_sql_batches(dataframe, "test_table", upsert=False, max_rows=2))
+
+        assert statements == [
+            "INSERT INTO test_table (col1, col2) VALUES (0, 'a'), (1, 'b');",
+            "INSERT INTO test_table (col1, col2) VALUES (2, 'c'), (3, 'd');",
+            "INSERT INTO test_table (col1, col2) VALUES (4, 'e');",
+        ]
+
+    def test_giving_max_bytes_then_packs_rows_up_to_max_bytes(self, dataframe):
+        statements = list(construct_sql_batches(dataframe, "test_table", upsert=True, max_bytes=20))
+
+        assert len(statements) == 3
+        assert statements[0] == (
+            "INSERT INTO test_table (col1, col2) VALUES (0, 'a'), (1, 'b')\n"
+            "ON CONFLICT (col1) DO UPDATE SET col2=excluded.col2\nWHERE (test_table.col2) IS DISTINCT FROM (excluded.col2);"
+        )
+
+    def test_giving_single_batch_then_matches_construct_sql(self, dataframe):
+        assert list(construct_sql_batches(dataframe, "test_table")) == [construct_sql(dataframe, "test_table")]
+
+    def test_giving_empty_dataframe_then_yields_nothing(self):
+        assert list(construct_sql_batches(pd.DataFrame({"col1": []}), "test_table")) == []
+
+    def test_giving_key_column_only_when_upserting_then_inserts_new_keys_only(self):
+        statements = list(construct_sql_batches(pd.DataFrame({"date_id": ["2022-11-03"]}), "dim_date"))
+
+        assert statements == ["INSERT INTO dim_date (date_id) VALUES ('2022-11-03')\nON CONFLICT (date_id) DO NOTHING;"]
+
 
 @pytest.fixture
 def mock_dataframe():
@@ -102,14 +159,14 @@ def mock_conn():
 
 @pytest.fixture
 def mock_construct_sql():
-    with mock.patch("src.load_utils.write_dataframe_to_dw.construct_sql", autospec=True) as mock_sql: # Assuming construct_sql is in the same module
+    with mock.patch("src.load_utils.write_dataframe_to_dw.construct_sql_batches", autospec=True) as mock_sql: # Assuming construct_sql_batches is in the same module
         yield mock_sql
 
 class TestWriteDataframeToDb:
     def test_giving_valid_dataframe_and_connection_when_insert_mode_is_true_then_returns_true_and_calls_conn_run(
         self, mock_dataframe, mock_conn, mock_construct_sql
     ):
-        mock_construct_sql.return_value = "INSERT SQL QUERY"
+        mock_construct_sql.return_value = iter(["INSERT SQL QUERY"])
         result = write_dataframe_to_db(mock_dataframe, mock_conn, "test_table")
         assert result is True
         mock_conn.run.assert_called_once_with(sql="INSERT SQL QUERY")
@@ -118,7 +175,7 @@ class TestWriteDataframeToDb:
     def test_giving_valid_dataframe_and_connection_when_insert_mode_is_false_then_returns_true_and_calls_conn_run_with_replace_sql(
         self, mock_dataframe, mock_conn, mock_construct_sql
     ):
-        mock_construct_sql.return_value = "REPLACE SQL QUERY"
+        mock_construct_sql.return_value = iter(["REPLACE SQL QUERY"])
         result = write_dataframe_to_db(mock_dataframe, mock_conn, "test_table", insert_mode=False)
         assert result is True
         mock_conn.run.assert_called_once_with(sql="REPLACE SQL QUERY")
@@ -151,11 +208,178 @@ class TestWriteDataframeToDb:
         write_dataframe_to_db(mock_dataframe, mock_conn, "test_table")
         pd.testing.assert_frame_equal(mock_dataframe, original_dataframe)
 
+    def test_giving_several_statements_then_runs_them_in_one_transaction(
+        self, mock_dataframe, mock_conn, mock_construct_sql
+    ):
+        mock_construct_sql.return_value = iter(["SQL 1", "SQL 2", "SQL 3"])
+
+        write_dataframe_to_db(mock_dataframe, mock_conn, "test_table")
+
+        assert mock_conn.run.call_args_list == [
+            mock.call("START TRANSACTION"), mock.call(sql="SQL 1"), mock.call(sql="SQL 2"),
+            mock.call(sql="SQL 3"), mock.call("COMMIT"),
+        ]
+
+    def test_giving_failing_batch_then_rolls_back_and_raises_pg8000_error(
+        self, mock_dataframe, mock_conn, mock_construct_sql
+    ):
+        mock_construct_sql.return_value = iter(["SQL 1", "SQL 2"])
+        def run(*args, sql=None):
+            if sql == "SQL 2":
+                raise pg8000.Error("bad row")
+        mock_conn.run.side_effect = run
+
+        with pytest.raises(pg8000.Error):
+            write_dataframe_to_db(mock_dataframe, mock_conn, "test_table")
+        assert mock_conn.run.call_args == mock.call("ROLLBACK")
+
     def test_giving_db_error_when_conn_run_fails_then_raises_pg8000_error(
         self, mock_dataframe, mock_conn, mock_construct_sql
     ):
         mock_conn.run.side_effect = pg8000.Error("Database connection failed")
-        mock_construct_sql.return_value = "SQL QUERY"
+        mock_construct_sql.return_value = iter(["SQL QUERY"])
         with pytest.raises(pg8000.Error) as excinfo:
             write_dataframe_to_db(mock_dataframe, mock_conn, "test_table")
         assert str(excinfo.value) == "Database connection failed"
+
+def run_consuming_stream(copied):
+    def run(sql, stream=None, **params):
+        if stream is not None:
+            copied.append(b"".join(stream))
+    return run
+
+class TestCopyDataframeToDb:
+    def test_giving_copy_engine_when_insert_mode_is_true_then_copies_rows_into_table(self, mock_dataframe, mock_conn):
+        copied = []
+        mock_conn.run.side_effect = run_consuming_stream(copied)
+
+        result = write_dataframe_to_db(mock_dataframe, mock_conn, "test_table", engine="copy")
+
+        assert result is True
+        assert mock_conn.run.call_args.args == ("COPY test_table (col1, col2) FROM STDIN WITH (FORMAT csv)",)
+        assert copied == [b'1,"a"\n2,"b"\n']
+
+    def test_giving_copy_engine_when_insert_mode_is_false_then_merges_staging_table_in_transaction(self, mock_dataframe, mock_conn):
+        copied = []
+        mock_conn.run.side_effect = run_consuming_stream(copied)
+
+        write_dataframe_to_db(mock_dataframe, mock_conn, "dim_table", insert_mode=False, engine="copy")
+
+        statements = [call.args[0] for call in mock_conn.run.call_args_list]
+        assert statements == [
+            "START TRANSACTION",
+            "CREATE TEMPORARY TABLE staging_dim_table ON COMMIT DROP AS SELECT col1, col2 FROM dim_table WITH NO DATA",
+            "COPY staging_dim_table (col1, col2) FROM STDIN WITH (FORMAT csv)",
+            "INSERT INTO dim_table (col1, col2) SELECT col1, col2 FROM staging_dim_table\n"
+            "ON CONFLICT (col1) DO UPDATE SET col2=excluded.col2\nWHERE (dim_table.col2) IS DISTINCT FROM (excluded.col2)",
+            "COMMIT",
+        ]
+        assert copied == [b'1,"a"\n2,"b"\n']
+
+    def test_giving_several_value_columns_when_upserting_then_updates_only_rows_that_differ(self, mock_conn):
+        dataframe = pd.DataFrame({"staff_id": [1], "first_name": ["Jeremie"], "location": [None]})
+
+        write_dataframe_to_db(dataframe, mock_conn, "dim_staff", insert_mode=False, engine="copy")
+
+        assert mock_conn.run.call_args_list[3].args == (
+            "INSERT INTO dim_staff (staff_id, first_name, location) SELECT staff_id, first_name, location FROM staging_dim_staff\n"
+            "ON CONFLICT (staff_id) DO UPDATE SET first_name=excluded.first_name, location=excluded.location\n"
+            "WHERE (dim_staff.first_name, dim_staff.location) IS DISTINCT FROM (excluded.first_name, excluded.location)",
+        )
+
+    def test_giving_key_column_only_when_upserting_then_inserts_new_keys_only(self, mock_conn):
+        write_dataframe_to_db(pd.DataFrame({"date_id": ["2022-11-03"]}), mock_conn, "dim_date", insert_mode=False, engine="copy")
+
+        assert mock_conn.run.call_args_list[3].args == (
+            "INSERT INTO dim_date (date_id) SELECT date_id FROM staging_dim_date\nON CONFLICT (date_id) DO NOTHING",
+        )
+
+    def test_giving_same_upsert_then_insert_and_copy_engines_use_the_same_conflict_clause(self, mock_dataframe, mock_conn):
+        write_dataframe_to_db(mock_dataframe, mock_conn, "dim_table", insert_mode=False, engine="copy")
+        copied = mock_conn.run.call_args_list[3].args[0]
+        mock_conn.reset_mock()
+
+        write_dataframe_to_db(mock_dataframe, mock_conn, "dim_table", insert_mode=False, engine="insert")
+        inserted = mock_conn.run.call_args.kwargs["sql"]
+
+        assert copied[copied.index("ON CONFLICT"):] == inserted[inserted.index("ON CONFLICT"):].rstrip(";")
+
+    def test_giving_copy_failure_when_upserting_then_rolls_back_and_raises(self, mock_dataframe, mock_conn):
+        def run(sql, stream=None, **params):
+            if sql.startswith("COPY"):
+                raise pg8000.Error("bad row")
+        mock_conn.run.side_effect = run
+
+        with pytest.raises(pg8000.Error):
+            write_dataframe_to_db(mock_dataframe, mock_conn, "dim_table", insert_mode=False, engine="copy")
+        assert mock_conn.run.call_args.args == ("ROLLBACK",)
+
+    def test_giving_unknown_engine_then_raises_value_error(self, mock_dataframe, mock_conn):
+        with pytest.raises(ValueError) as excinfo:
+            write_dataframe_to_db(mock_dataframe, mock_conn, "test_table", engine="bulk")
+        assert str(excinfo.value) == "Unknown load engine 'bulk', expected 'insert' or 'copy'"
+
+    def test_giving_nulls_and_empty_strings_when_encoding_then_only_nulls_are_unquoted(self):
+        dataframe = pd.DataFrame({"id": [1, 2], "name": ["", None], "paid": [True, None], "amount": [1.5, None]})
+
+        chunks = list(encode_csv_chunks(dataframe, chunk_rows=10))
+
+        assert chunks == [b'1,"",true,1.5\n2,,,\n']
+
+    def test_giving_chunk_rows_when_encoding_then_yields_bounded_chunks(self):
+        dataframe = pd.DataFrame({"id": range(5), "name": list("abcde")})
+
+        chunks = list(encode_csv_chunks(dataframe, chunk_rows=2))
+
+        assert chunks == [b'0,"a"\n1,"b"\n', b'2,"c"\n3,"d"\n', b'4,"e"\n']
+
+class TestWriteBatchesToDb:
+    @pytest.fixture
+    def batches(self):
+        return [
+            pa.record_batch({"col1": [1, 2], "col2": ["a", None]}),
+            pa.record_batch({"col1": pa.array([], pa.int64()), "col2": pa.array([], pa.string())}),
+            pa.record_batch({"col1": [3], "col2": ["c"]}),
+        ]
+
+    def test_giving_copy_engine_then_streams_every_batch_through_one_copy(self, batches, mock_conn):
+        copied = []
+        mock_conn.run.side_effect = run_consuming_stream(copied)
+
+        result = write_batches_to_db(iter(batches), mock_conn, "fact_table", engine="copy")
+
+        assert result is True
+        assert mock_conn.run.call_count == 1
+        assert mock_conn.run.call_args.args == ("COPY fact_table (col1, col2) FROM STDIN WITH (FORMAT csv)",)
+        assert copied == [b'1,"a"\n2,\n3,"c"\n']
+
+    def test_giving_insert_engine_then_inserts_every_batch_in_one_transaction(self, batches, mock_conn):
+        write_batches_to_db(iter(batches), mock_conn, "fact_table", engine="insert")
+
+        statements = [call.kwargs.get("sql", call.args[0] if call.args else None) for call in mock_conn.run.call_args_list]
+        assert statements[0] == "START TRANSACTION"
+        assert statements[-1] == "COMMIT"
+        assert len(statements) == 4
+
+    def test_giving_insert_failure_then_rolls_back_and_raises(self, batches, mock_conn):
+        def run(sql, **params):
+            if sql.startswith("INSERT"):
+                raise pg8000.Error("bad row")
+        mock_conn.run.side_effect = run
+
+        with pytest.raises(pg8000.Error):
+            write_batches_to_db(iter(batches), mock_conn, "fact_table", engine="insert")
+        assert mock_conn.run.call_args.args == ("ROLLBACK",)
+
+    def test_giving_no_rows_then_raises_value_error(self, batches, mock_conn):
+        with pytest.raises(ValueError) as excinfo:
+            write_batches_to_db(iter(batches[1:2]), mock_conn, "fact_table", engine="copy")
+        assert str(excinfo.value) == "No rows to load into fact_table"
+        mock_conn.run.assert_not_called()
+
+    def test_giving_arrow_table_when_encoding_then_matches_dataframe_encoding(self):
+        dataframe = pd.DataFrame({"id": range(5), "name": ["a", "", None, "d", "e"]})
+
+        chunks = list(encode_csv_chunks(pa.Table.from_pandas(dataframe, preserve_index=False), chunk_rows=2))
+
+        assert chunks == list(encode_csv_chunks(dataframe, chunk_rows=2))